@@ -1,6 +1,7 @@
 import argparse
 import sys
 
+import teuthology.dispatcher.pool
 import teuthology.dispatcher.supervisor
 
 
@@ -31,13 +32,24 @@ def parse_args(argv):
         "--job-config",
         type=str,
         help="file descriptor of job's config file",
-        required=True,
     )
-    return parser.parse_args(argv)
+    parser.add_argument(
+        "--pool",
+        action="store_true",
+        help="read job config paths from stdin, one per line, and fork a "
+             "supervisor for each; normally only used by the dispatcher",
+    )
+    args = parser.parse_args(argv)
+    if not (args.pool or args.job_config):
+        parser.error("one of --job-config or --pool is required")
+    return args
 
 
 def main():
-    sys.exit(teuthology.dispatcher.supervisor.main(parse_args(sys.argv[1:])))
+    args = parse_args(sys.argv[1:])
+    if args.pool:
+        sys.exit(teuthology.dispatcher.pool.serve(args))
+    sys.exit(teuthology.dispatcher.supervisor.main(args))
 
 
 if __name__ == "__main__":
@@ -37,6 +37,7 @@ class TestDispatcher(object):
         m_teuth_config.teuthology_path = None
         got_config, teuth_bin_path = dispatcher.prep_job(config)
         assert got_config['teuthology_branch'] == 'main'
+        assert got_config['teuthology_sha1'] == 'teuth_hash'
         m_fetch_teuthology.assert_called_once_with(branch='main', commit='teuth_hash')
         assert teuth_bin_path == '/teuth/path/.venv/bin'
         m_fetch_qa_suite.assert_called_once_with('main', 'suite_hash')
@@ -77,6 +78,7 @@ class TestDispatcher(object):
         m_try_push_job_info, m_ls_remote, m_find_dispatcher_processes,
                        ):
         m_find_dispatcher_processes.return_value = {}
+        m_ls_remote.return_value = 'teuth_hash'
         m_connection = Mock()
         jobs = self.build_fake_jobs(
             m_connection,
@@ -118,6 +120,7 @@ class TestDispatcher(object):
         m_try_push_job_info, m_ls_remote, m_find_dispatcher_processes,
                        ):
         m_find_dispatcher_processes.return_value = {}
+        m_ls_remote.return_value = 'teuth_hash'
         m_connection = Mock()
         jobs = self.build_fake_jobs(
             m_connection,
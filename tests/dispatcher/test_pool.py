@@ -0,0 +1,162 @@
+import os
+import stat
+import sys
+import time
+
+import yaml
+
+from pytest import raises
+
+from teuthology import dispatcher
+from teuthology.dispatcher import pool
+
+
+# Speaks the pool protocol; each "supervisor" exits with the number of
+# characters in its job config path
+FAKE_POOL = """#!/bin/sh
+echo ready
+while read path; do
+    sh -c "exit ${#path}" &
+    pid=$!
+    echo started $pid
+    wait $pid
+    echo exited $pid $?
+done
+"""
+
+# Runs the real pool.serve(), with a supervisor.main() which exits with the
+# job's 'exit_code', or raises if it has none
+REAL_POOL = """#!{python}
+import argparse
+import sys
+
+import yaml
+
+from teuthology.dispatcher import pool, supervisor
+
+
+def main(args):
+    with open(args.job_config) as f:
+        return yaml.safe_load(f)['exit_code']
+
+
+supervisor.main = main
+sys.exit(pool.serve(argparse.Namespace(
+    verbose=False, archive_dir='.', bin_path='.')))
+"""
+
+NO_POOL = """#!/bin/sh
+echo "unrecognized arguments: --pool" >&2
+exit 2
+"""
+
+
+def make_bin(tmp_path, script):
+    bin_path = tmp_path / 'bin'
+    bin_path.mkdir()
+    supervisor = bin_path / 'teuthology-supervisor'
+    supervisor.write_text(script)
+    os.chmod(supervisor, stat.S_IRWXU)
+    return str(bin_path)
+
+
+def wait_for(proc, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            return proc.returncode
+        time.sleep(0.05)
+
+
+class TestSupervisorPool(object):
+    def test_submit(self, tmp_path):
+        bin_path = make_bin(tmp_path, FAKE_POOL)
+        the_pool = pool.SupervisorPool(bin_path, str(tmp_path), sha1='abc')
+        job_a = the_pool.submit('a/orig.config.yaml')
+        job_b = the_pool.submit('bb/orig.config.yaml')
+        assert job_a.pid != job_b.pid
+        assert wait_for(job_a) == len('a/orig.config.yaml')
+        assert wait_for(job_b) == len('bb/orig.config.yaml')
+        the_pool.close()
+        assert the_pool.proc.wait(timeout=10) == 0
+
+    def test_serve(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('PYTHONPATH', os.getcwd())
+        bin_path = make_bin(
+            tmp_path, REAL_POOL.format(python=sys.executable))
+        the_pool = pool.SupervisorPool(bin_path, str(tmp_path))
+        job_config = dict(archive_path=str(tmp_path), job_id=1)
+        good = tmp_path / 'good.yaml'
+        good.write_text(yaml.safe_dump(dict(job_config, exit_code=3)))
+        bad = tmp_path / 'bad.yaml'
+        bad.write_text(yaml.safe_dump(job_config))
+        good_job = the_pool.submit(str(good))
+        bad_job = the_pool.submit(str(bad))
+        assert wait_for(good_job) == 3
+        assert wait_for(bad_job) == 1
+        # The supervisor's traceback is in the job's log
+        log_text = (tmp_path / 'supervisor.1.log').read_text()
+        assert 'Supervisor for %s failed' % bad in log_text
+        assert "KeyError: 'exit_code'" in log_text
+        the_pool.close()
+        assert the_pool.proc.wait(timeout=10) == 0
+
+    def test_stderr_to_log(self, tmp_path):
+        bin_path = make_bin(tmp_path, "#!/bin/sh\necho oops >&2\n")
+        log_path = tmp_path / 'dispatcher.log'
+        with raises(pool.PoolError):
+            pool.SupervisorPool(bin_path, str(tmp_path), log_path=log_path)
+        assert log_path.read_text() == 'oops\n'
+
+    def test_lost_returncode(self, tmp_path):
+        bin_path = make_bin(tmp_path, FAKE_POOL)
+        the_pool = pool.SupervisorPool(bin_path, str(tmp_path))
+        job = the_pool.submit('config.yaml')
+        the_pool.proc.kill()
+        assert wait_for(job) == pool.LOST_RETURNCODE
+
+    def test_submit_to_pool(self, tmp_path):
+        bin_path = make_bin(tmp_path, FAKE_POOL)
+        pools = dict()
+        job = dispatcher.submit_to_pool(
+            pools, 'config.yaml', bin_path, str(tmp_path), 'abc')
+        assert wait_for(job) == len('config.yaml')
+        first_pool = pools[(bin_path, 'abc')]
+        dispatcher.submit_to_pool(
+            pools, 'config.yaml', bin_path, str(tmp_path), 'abc')
+        assert pools[(bin_path, 'abc')] is first_pool
+        # Another sha1 gets its own pool, and the first one is kept
+        dispatcher.submit_to_pool(
+            pools, 'config.yaml', bin_path, str(tmp_path), 'def')
+        assert pools[(bin_path, 'def')] is not first_pool
+        assert first_pool.alive
+        dispatcher.submit_to_pool(
+            pools, 'config.yaml', bin_path, str(tmp_path), 'abc')
+        assert pools[(bin_path, 'abc')] is first_pool
+        for the_pool in pools.values():
+            the_pool.close()
+            assert the_pool.proc.wait(timeout=10) == 0
+
+    def test_prune_pools(self, tmp_path):
+        bin_path = make_bin(tmp_path, FAKE_POOL)
+        pools = dict()
+        job = dispatcher.submit_to_pool(
+            pools, 'config.yaml', bin_path, str(tmp_path), 'abc')
+        the_pool = pools[(bin_path, 'abc')]
+        dispatcher.prune_pools(pools, idle_timeout=3600)
+        assert not the_pool.closed
+        wait_for(job)
+        dispatcher.prune_pools(pools, idle_timeout=0)
+        assert the_pool.closed
+        the_pool.proc.wait(timeout=10)
+        dispatcher.prune_pools(pools, idle_timeout=0)
+        assert pools == dict()
+
+    def test_submit_to_pool_unsupported(self, tmp_path):
+        bin_path = make_bin(tmp_path, NO_POOL)
+        pools = dict()
+        assert dispatcher.submit_to_pool(
+            pools, 'config.yaml', bin_path, str(tmp_path), 'abc') is None
+        assert pools[(bin_path, 'abc')] is None
+        assert dispatcher.submit_to_pool(
+            pools, 'config.yaml', bin_path, str(tmp_path), 'abc') is None
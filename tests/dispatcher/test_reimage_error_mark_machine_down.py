@@ -19,7 +19,7 @@ class TestCheckReImageFailureMarkDown(object):
 
     @patch('teuthology.dispatcher.supervisor.shortname')
     @patch('teuthology.lock.ops.update_lock')
-    @patch('teuthology.dispatcher.supervisor.requests')
+    @patch('teuthology.dispatcher.supervisor.http')
     @patch('teuthology.dispatcher.supervisor.urljoin')
     @patch('teuthology.dispatcher.supervisor.teuth_config')
     def test_one_machine_ten_reimage_failed_jobs(
@@ -39,7 +39,7 @@ class TestCheckReImageFailureMarkDown(object):
 
     @patch('teuthology.dispatcher.supervisor.shortname')
     @patch('teuthology.lock.ops.update_lock')
-    @patch('teuthology.dispatcher.supervisor.requests')
+    @patch('teuthology.dispatcher.supervisor.http')
     @patch('teuthology.dispatcher.supervisor.urljoin')
     @patch('teuthology.dispatcher.supervisor.teuth_config')
     def test_one_machine_seven_reimage_failed_jobs(
@@ -59,7 +59,7 @@ class TestCheckReImageFailureMarkDown(object):
 
     @patch('teuthology.dispatcher.supervisor.shortname')
     @patch('teuthology.lock.ops.update_lock')
-    @patch('teuthology.dispatcher.supervisor.requests')
+    @patch('teuthology.dispatcher.supervisor.http')
     @patch('teuthology.dispatcher.supervisor.urljoin')
     @patch('teuthology.dispatcher.supervisor.teuth_config')
     def test_two_machine_all_reimage_failed_jobs(
@@ -81,7 +81,7 @@ class TestCheckReImageFailureMarkDown(object):
 
     @patch('teuthology.dispatcher.supervisor.shortname')
     @patch('teuthology.lock.ops.update_lock')
-    @patch('teuthology.dispatcher.supervisor.requests')
+    @patch('teuthology.dispatcher.supervisor.http')
     @patch('teuthology.dispatcher.supervisor.urljoin')
     @patch('teuthology.dispatcher.supervisor.teuth_config')
     def test_two_machine_one_healthy_one_reimage_failure(
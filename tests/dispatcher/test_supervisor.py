@@ -1,7 +1,10 @@
+import gevent
+
 from subprocess import DEVNULL
 from unittest.mock import patch, Mock, MagicMock
 
 from teuthology.dispatcher import supervisor
+from teuthology.orchestra.cluster import Cluster
 
 
 class TestSuperviser(object):
@@ -85,8 +88,8 @@ class TestSuperviser(object):
         supervisor.run_job(config, config_path, "teuth/bin/path", "archive/dir", verbose=False)
 
     @patch("teuthology.dispatcher.supervisor.report.try_push_job_info")
-    @patch("time.sleep")
-    def test_run_with_watchdog_no_reporting(self, m_sleep, m_try_push):
+    @patch("teuthology.dispatcher.supervisor.wait_for_exit")
+    def test_run_with_watchdog_no_reporting(self, m_wait, m_try_push):
         config = {
             "name": "the_name",
             "job_id": "1",
@@ -103,9 +106,9 @@ class TestSuperviser(object):
         )
 
     @patch("subprocess.Popen")
-    @patch("time.sleep")
+    @patch("teuthology.dispatcher.supervisor.wait_for_exit")
     @patch("teuthology.dispatcher.supervisor.report.try_push_job_info")
-    def test_run_with_watchdog_with_reporting(self, m_tpji, m_sleep, m_popen):
+    def test_run_with_watchdog_with_reporting(self, m_tpji, m_wait, m_popen):
         config = {
             "name": "the_name",
             "job_id": "1",
@@ -119,3 +122,73 @@ class TestSuperviser(object):
         m_proc.poll.return_value = "not None"
         m_popen.return_value = m_proc
         supervisor.run_with_watchdog(process, config)
+
+    @patch("teuthology.dispatcher.supervisor.lock_ops.unlock_safe")
+    @patch("teuthology.dispatcher.supervisor.archive_logs")
+    @patch("teuthology.dispatcher.supervisor.compress_logs")
+    @patch("teuthology.dispatcher.supervisor.internal.add_remotes")
+    @patch("teuthology.dispatcher.supervisor.report.ResultsSerializer")
+    def test_transfer_archives_unlocks_per_node(
+            self, m_serializer, m_add_remotes, m_compress, m_archive,
+            m_unlock):
+        config = {
+            "name": "the_name",
+            "job_id": "1",
+            "archive_path": "archive/path",
+            "machine_type": "smithi",
+            "owner": "the_owner",
+        }
+        m_serializer.return_value.job_info.return_value = dict(
+            archive=dict(init='/var/log/init', log='/var/log/ceph'))
+        fast = Mock(shortname='fast')
+        slow = Mock(shortname='slow')
+
+        def add_remotes(ctx, job_config):
+            ctx.cluster = Cluster(remotes=[(slow, ['a']), (fast, ['b'])])
+        m_add_remotes.side_effect = add_remotes
+
+        def archive_logs(ctx, log_path, log_type):
+            remote, = ctx.cluster.remotes.keys()
+            if remote is slow:
+                gevent.sleep(0.1)
+            events.append((remote.shortname, log_type))
+            return 1024
+        m_archive.side_effect = archive_logs
+        events = []
+        m_unlock.side_effect = lambda names, *args: events.append(names)
+        supervisor.transfer_archives(
+            "the_name", "1", "archive/base", config, owner="the_owner")
+        assert events == [
+            ('fast', ''), ('fast', 'log'), ['fast'],
+            ('slow', ''), ('slow', 'log'), ['slow'],
+        ]
+        m_unlock.assert_called_with(['slow'], 'the_owner', 'the_name', '1')
+        assert m_compress.call_count == 4
+
+    @patch("teuthology.dispatcher.supervisor.lock_ops.unlock_safe")
+    @patch("teuthology.dispatcher.supervisor.archive_logs")
+    @patch("teuthology.dispatcher.supervisor.compress_logs")
+    @patch("teuthology.dispatcher.supervisor.create_fake_context")
+    def test_transfer_node_archives_kills_compression(
+            self, m_create_ctx, m_compress, m_archive, m_unlock):
+        node = Mock(shortname='node')
+        ctx = Mock()
+        ctx.cluster = Cluster(remotes=[(node, ['a'])])
+        finished = []
+
+        def compress_logs(ctx, log_path):
+            if log_path == '/var/log/init':
+                raise RuntimeError('no space left')
+            gevent.sleep(0.2)
+            finished.append(log_path)
+        m_compress.side_effect = compress_logs
+        supervisor.transfer_node_archives(
+            ctx, node,
+            dict(init='/var/log/init', log='/var/log/ceph'),
+            dict(name='the_name', job_id='1'), owner='the_owner',
+        )
+        m_archive.assert_not_called()
+        m_unlock.assert_called_once_with(
+            ['node'], 'the_owner', 'the_name', '1')
+        gevent.sleep(0.3)
+        assert finished == []
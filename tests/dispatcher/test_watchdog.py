@@ -0,0 +1,167 @@
+import os
+import subprocess
+import time
+
+from unittest.mock import patch, Mock
+
+from teuthology.dispatcher import watchdog
+
+
+class TestWaitForExit(object):
+    def test_exits_early(self):
+        proc = subprocess.Popen(['sleep', '0.1'])
+        before = time.monotonic()
+        assert watchdog.wait_for_exit(proc, 30) == 0
+        assert time.monotonic() - before < 10
+
+    def test_timeout(self):
+        proc = subprocess.Popen(['sleep', '30'])
+        try:
+            assert watchdog.wait_for_exit(proc, 0.1) is None
+        finally:
+            proc.kill()
+            proc.wait()
+
+    @patch("teuthology.dispatcher.watchdog.pidfd_open")
+    def test_no_pidfd(self, m_pidfd_open):
+        m_pidfd_open.return_value = None
+        proc = subprocess.Popen(['sleep', '30'])
+        try:
+            assert watchdog.wait_for_exit(proc, 0.1) is None
+        finally:
+            proc.kill()
+            proc.wait()
+
+
+class TestHeartbeatIsExternal(object):
+    def test_not_set(self, monkeypatch):
+        monkeypatch.delenv(watchdog.HEARTBEAT_ENV, raising=False)
+        assert not watchdog.heartbeat_is_external()
+
+    def test_alive(self, monkeypatch, tmp_path):
+        heartbeat_file = tmp_path / 'heartbeat'
+        heartbeat_file.touch()
+        monkeypatch.setenv(
+            watchdog.HEARTBEAT_ENV, watchdog.process_id(os.getpid()))
+        monkeypatch.setenv(watchdog.HEARTBEAT_FILE_ENV, str(heartbeat_file))
+        assert watchdog.heartbeat_is_external(max_age=60)
+
+    def test_behind(self, monkeypatch, tmp_path):
+        # The dispatcher is alive, but hasn't posted heartbeats lately
+        heartbeat_file = tmp_path / 'heartbeat'
+        heartbeat_file.touch()
+        last_post = time.time() - 120
+        os.utime(heartbeat_file, (last_post, last_post))
+        monkeypatch.setenv(
+            watchdog.HEARTBEAT_ENV, watchdog.process_id(os.getpid()))
+        monkeypatch.setenv(watchdog.HEARTBEAT_FILE_ENV, str(heartbeat_file))
+        assert not watchdog.heartbeat_is_external(max_age=60)
+        monkeypatch.delenv(watchdog.HEARTBEAT_FILE_ENV)
+        assert not watchdog.heartbeat_is_external(max_age=60)
+
+    def test_dead(self, monkeypatch):
+        proc = subprocess.Popen(['true'])
+        value = watchdog.process_id(proc.pid)
+        proc.wait()
+        monkeypatch.setenv(watchdog.HEARTBEAT_ENV, value)
+        assert not watchdog.heartbeat_is_external()
+
+    def test_pid_reused(self, monkeypatch):
+        # Same PID, but a process created at another time
+        monkeypatch.setenv(
+            watchdog.HEARTBEAT_ENV, '{0}:1.00'.format(os.getpid()))
+        assert not watchdog.heartbeat_is_external()
+
+    def test_set_by_watcher(self, monkeypatch):
+        monkeypatch.delenv(watchdog.HEARTBEAT_ENV, raising=False)
+        watcher = watchdog.JobWatcher()
+        watcher.start(interval=60)
+        try:
+            assert watchdog.heartbeat_is_external(max_age=60)
+            heartbeat_path = os.environ[watchdog.HEARTBEAT_FILE_ENV]
+        finally:
+            watcher.stop()
+        assert watchdog.HEARTBEAT_ENV not in os.environ
+        assert watchdog.HEARTBEAT_FILE_ENV not in os.environ
+        assert not os.path.exists(heartbeat_path)
+
+
+class TestJobWatcher(object):
+    def test_reap(self):
+        watcher = watchdog.JobWatcher()
+        fast = subprocess.Popen(['sh', '-c', 'exit 3'])
+        slow = subprocess.Popen(['sleep', '30'])
+        watcher.add(fast, dict(name='run', job_id='1'))
+        watcher.add(slow, dict(name='run', job_id='2'))
+        try:
+            fast.wait()
+            assert watcher.reap() == [(fast, 3)]
+            assert len(watcher) == 1
+            assert watcher.reap() == []
+        finally:
+            slow.kill()
+            slow.wait()
+        assert watcher.reap() == [(slow, -9)]
+        assert len(watcher) == 0
+
+    def test_reap_no_pidfd(self):
+        watcher = watchdog.JobWatcher()
+        proc = Mock(pid=-1)
+        proc.poll.return_value = None
+        watcher.add(proc, dict(name='run', job_id='1'))
+        assert watcher.reap() == []
+        proc.poll.return_value = 0
+        assert watcher.reap() == [(proc, 0)]
+
+    @patch("teuthology.dispatcher.watchdog.report.ResultsReporter")
+    def test_heartbeat(self, m_reporter_cls):
+        m_reporter = m_reporter_cls.return_value
+        m_reporter.base_uri = 'http://paddles'
+        watcher = watchdog.JobWatcher()
+        for job_id in ('1', '2'):
+            proc = Mock(pid=-1)
+            proc.poll.return_value = None
+            watcher.add(proc, dict(name='run', job_id=job_id, foo='bar'))
+        watcher.heartbeat()
+        watcher.heartbeat()
+        # one reporter, and so one HTTP session, is shared by all the jobs
+        m_reporter_cls.assert_called_once_with()
+        assert m_reporter.report_job.call_count == 4
+        m_reporter.report_job.assert_called_with(
+            'run', '2', dict(name='run', job_id='2'))
+
+    @patch("teuthology.dispatcher.watchdog.report.ResultsReporter")
+    def test_heartbeat_skips_exited(self, m_reporter_cls):
+        m_reporter = m_reporter_cls.return_value
+        m_reporter.base_uri = 'http://paddles'
+        watcher = watchdog.JobWatcher()
+        running = Mock(pid=-1)
+        running.poll.return_value = None
+        done = Mock(pid=-1)
+        done.poll.return_value = 0
+        watcher.add(running, dict(name='run', job_id='1'))
+        watcher.add(done, dict(name='run', job_id='2'))
+        watcher.heartbeat()
+        m_reporter.report_job.assert_called_once_with(
+            'run', '1', dict(name='run', job_id='1'))
+        # The exit code is kept for the dispatcher
+        assert watcher.reap() == [(done, 0)]
+        assert watcher.reap() == []
+
+    @patch("teuthology.dispatcher.watchdog.report.ResultsReporter")
+    def test_heartbeat_file(self, m_reporter_cls, tmp_path):
+        m_reporter = m_reporter_cls.return_value
+        m_reporter.base_uri = 'http://paddles'
+        watcher = watchdog.JobWatcher()
+        watcher._heartbeat_path = str(tmp_path / 'heartbeat')
+        (tmp_path / 'heartbeat').touch()
+        os.utime(watcher._heartbeat_path, (0, 0))
+        proc = Mock(pid=-1)
+        proc.poll.return_value = None
+        watcher.add(proc, dict(name='run', job_id='1'))
+        m_reporter.report_job.side_effect = watchdog.MaxWhileTries()
+        watcher.heartbeat()
+        assert os.stat(watcher._heartbeat_path).st_mtime == 0
+        m_reporter.report_job.side_effect = None
+        watcher.heartbeat()
+        assert os.stat(watcher._heartbeat_path).st_mtime > 0
@@ -0,0 +1,108 @@
+import json
+import time
+
+from unittest.mock import patch
+
+from teuthology.config import config
+from teuthology.lock import cache
+
+
+class TestCache(object):
+    def setup_method(self):
+        self.nodes = [
+            dict(name='node1', machine_type='smithi', up=True, locked=False),
+            dict(name='node2', machine_type='smithi', up=True, locked=True),
+            dict(name='node3', machine_type='mira', up=True, locked=False),
+            dict(name='node4', machine_type='smithi', up=False, locked=False),
+        ]
+        self.patcher = patch('teuthology.lock.cache.query.list_locks')
+        self.m_list_locks = self.patcher.start()
+        self.m_list_locks.return_value = self.nodes
+
+    def teardown_method(self):
+        self.patcher.stop()
+        config.load()
+
+    def use_path(self, tmp_path):
+        config.lock_cache_path = str(tmp_path / 'cache' / 'nodes.json')
+        return tmp_path / 'cache' / 'nodes.json'
+
+    def test_shared_snapshot(self, tmp_path):
+        path = self.use_path(tmp_path)
+        assert cache.get_nodes(max_age=60) == self.nodes
+        assert cache.get_nodes(max_age=60) == self.nodes
+        self.m_list_locks.assert_called_once_with(tries=10)
+        assert json.loads(path.read_text())['nodes'] == self.nodes
+
+    def test_expired(self, tmp_path):
+        path = self.use_path(tmp_path)
+        cache.get_nodes(max_age=60)
+        snapshot = json.loads(path.read_text())
+        snapshot['updated'] = time.time() - 120
+        path.write_text(json.dumps(snapshot))
+        cache.get_nodes(max_age=60)
+        assert self.m_list_locks.call_count == 2
+
+    def test_other_lock_server(self, tmp_path):
+        self.use_path(tmp_path)
+        cache.get_nodes(max_age=60)
+        config.lock_server = 'http://other.example.com/'
+        cache.get_nodes(max_age=60)
+        assert self.m_list_locks.call_count == 2
+
+    def test_refresh_failed(self, tmp_path):
+        self.use_path(tmp_path)
+        self.m_list_locks.return_value = dict()
+        assert cache.get_nodes(max_age=60) is None
+        assert cache.list_locks(max_age=60, machine_type='smithi') is None
+
+    def test_refresh_failed_stale_snapshot(self, tmp_path):
+        path = self.use_path(tmp_path)
+        cache.get_nodes(max_age=60)
+        snapshot = json.loads(path.read_text())
+        snapshot['updated'] = time.time() - 120
+        path.write_text(json.dumps(snapshot))
+        self.m_list_locks.return_value = dict()
+        assert cache.get_nodes(max_age=60) == self.nodes
+
+    def test_expand_user(self, tmp_path, monkeypatch):
+        monkeypatch.setenv('HOME', str(tmp_path))
+        config.lock_cache_path = '~/cache/nodes.json'
+        cache.get_nodes(max_age=60)
+        assert (tmp_path / 'cache' / 'nodes.json').exists()
+
+    def test_refresh_in_progress(self, tmp_path):
+        path = self.use_path(tmp_path)
+        cache.get_nodes(max_age=60)
+        snapshot = json.loads(path.read_text())
+        snapshot['updated'] = time.time() - 120
+        path.write_text(json.dumps(snapshot))
+        with patch('teuthology.lock.cache.FileLock.acquire') as m_acquire:
+            m_acquire.return_value = False
+            assert cache.get_nodes(max_age=60) == self.nodes
+        # The other process' refresh is not waited for nor repeated
+        assert self.m_list_locks.call_count == 1
+
+    def test_refresh_in_progress_no_snapshot(self, tmp_path):
+        self.use_path(tmp_path)
+        with patch('teuthology.lock.cache.FileLock.acquire') as m_acquire:
+            m_acquire.return_value = False
+            assert cache.get_nodes(max_age=60) == self.nodes
+        self.m_list_locks.assert_called_once_with(tries=10)
+
+    def test_disabled(self, tmp_path):
+        path = self.use_path(tmp_path)
+        cache.get_nodes(max_age=0)
+        cache.get_nodes(max_age=0)
+        assert self.m_list_locks.call_count == 2
+        assert not path.exists()
+
+    def test_list_locks(self, tmp_path):
+        self.use_path(tmp_path)
+        got = cache.list_locks(max_age=60, machine_type='smithi,mira',
+                               up=True, locked=False)
+        assert [node['name'] for node in got] == ['node1', 'node3']
+        got = cache.list_locks(max_age=60, machine_type='smithi', up=True,
+                               locked=False, count=1)
+        assert [node['name'] for node in got] == ['node1']
+        self.m_list_locks.assert_called_once_with(tries=10)
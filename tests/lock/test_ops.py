@@ -0,0 +1,184 @@
+import argparse
+import gevent
+
+from unittest.mock import patch
+
+from teuthology.config import config
+from teuthology.lock import ops
+
+
+class TestReimageMachines(object):
+    def setup_method(self):
+        self.patchers = dict(
+            get_reimage_types=patch(
+                'teuthology.provision.get_reimage_types',
+                return_value=['smithi']),
+            reimage=patch('teuthology.provision.reimage'),
+            console_log=patch('teuthology.lock.ops.console_log'),
+            list_locks=patch('teuthology.lock.ops.query.list_locks'),
+            ssh_keyscan=patch('teuthology.lock.ops.misc.ssh_keyscan'),
+            update_lock=patch('teuthology.lock.ops.update_lock'),
+            update_nodes=patch('teuthology.lock.ops.update_nodes'),
+        )
+        self.mocks = {
+            name: patcher.start() for name, patcher in self.patchers.items()
+        }
+        self.mocks['list_locks'].return_value = {
+            'fast.front.sepia.ceph.com': dict(ssh_pub_key='old'),
+            'slow.front.sepia.ceph.com': dict(ssh_pub_key='old'),
+        }
+        self.mocks['ssh_keyscan'].side_effect = lambda names: {
+            names[0].split('@')[-1]: 'new-' + names[0]}
+        self.events = list()
+
+        def reimage(ctx, machine, machine_type):
+            gevent.sleep(0.2 if machine.startswith('ubuntu@slow') else 0)
+            self.events.append(('reimaged', machine))
+        self.mocks['reimage'].side_effect = reimage
+
+        def update_lock(name, ssh_pub_key):
+            self.events.append(('key', name))
+            return True
+        self.mocks['update_lock'].side_effect = update_lock
+
+    def teardown_method(self):
+        for patcher in self.patchers.values():
+            patcher.stop()
+
+    def test_pipeline(self):
+        machines = {
+            'ubuntu@fast.front.sepia.ceph.com': 'old',
+            'ubuntu@slow.front.sepia.ceph.com': 'old',
+        }
+        result = ops.reimage_machines(None, machines, 'smithi')
+        assert result == {
+            'fast.front.sepia.ceph.com':
+                'new-ubuntu@fast.front.sepia.ceph.com',
+            'slow.front.sepia.ceph.com':
+                'new-ubuntu@slow.front.sepia.ceph.com',
+        }
+        # The fast node's key is published before the slow node is done
+        assert self.events == [
+            ('reimaged', 'ubuntu@fast.front.sepia.ceph.com'),
+            ('key', 'fast.front.sepia.ceph.com'),
+            ('reimaged', 'ubuntu@slow.front.sepia.ceph.com'),
+            ('key', 'slow.front.sepia.ceph.com'),
+        ]
+        # The lock server is only asked for the current keys once
+        self.mocks['list_locks'].assert_called_once_with(keyed_by_name=True)
+
+    def test_skip(self):
+        machines = {'ubuntu@fast.front.sepia.ceph.com': 'old'}
+        assert ops.reimage_machines(None, machines, 'vps') == machines
+        self.mocks['reimage'].assert_not_called()
+
+
+class TestBlockAndLockMachines(object):
+    def setup_method(self):
+        self.patchers = dict(
+            list_locks=patch('teuthology.lock.ops.cache.list_locks'),
+            lock_many=patch('teuthology.lock.ops.lock_many'),
+            unlock_one=patch('teuthology.lock.ops.unlock_one'),
+            report=patch('teuthology.lock.ops.report'),
+            sleep=patch('teuthology.lock.ops.time.sleep'),
+            get_status_many=patch(
+                'teuthology.lock.ops.query.get_status_many',
+                return_value=dict()),
+        )
+        self.mocks = {
+            name: patcher.start() for name, patcher in self.patchers.items()
+        }
+        self.mocks['list_locks'].return_value = [dict()] * 10
+        self.ctx = argparse.Namespace(
+            config=dict(), block=True, owner='scheduled_me',
+            archive='/archive/run/1',
+        )
+
+    def teardown_method(self):
+        for patcher in self.patchers.values():
+            patcher.stop()
+        config.load()
+
+    def test_release_partial(self):
+        config.partial_lock_timeout = 0
+        self.mocks['lock_many'].side_effect = [
+            {'ubuntu@node1': 'key1'},
+            {'ubuntu@node2': 'key2', 'ubuntu@node3': 'key3'},
+        ]
+        status = dict(name='node1', locked=True)
+        self.mocks['get_status_many'].return_value = {'ubuntu@node1': status}
+        ops.block_and_lock_machines(self.ctx, 2, 'smithi', reimage=False)
+        self.mocks['unlock_one'].assert_called_once_with(
+            'ubuntu@node1', 'scheduled_me', status=status)
+        # After releasing node1 we asked for both nodes again
+        assert [c[0][1] for c in self.mocks['lock_many'].call_args_list] == \
+            [2, 2]
+        assert self.ctx.config['targets'] == {
+            'ubuntu@node2': 'key2', 'ubuntu@node3': 'key3'}
+
+    def test_keep_partial(self):
+        self.mocks['lock_many'].side_effect = [
+            {'ubuntu@node1': 'key1'},
+            {'ubuntu@node2': 'key2'},
+        ]
+        ops.block_and_lock_machines(self.ctx, 2, 'smithi', reimage=False)
+        self.mocks['unlock_one'].assert_not_called()
+        assert [c[0][1] for c in self.mocks['lock_many'].call_args_list] == \
+            [2, 1]
+        assert self.ctx.config['targets'] == {
+            'ubuntu@node1': 'key1', 'ubuntu@node2': 'key2'}
+
+
+class TestUnlockSafe(object):
+    def setup_method(self):
+        self.statuses = {
+            'node1': dict(name='node1', locked=True,
+                          description='/archive/run1/1'),
+            'node2': dict(name='node2', locked=True,
+                          description='/archive/run1/1'),
+        }
+        self.patchers = dict(
+            get_status_many=patch(
+                'teuthology.lock.ops.query.get_status_many'),
+            get_run_jobs=patch('teuthology.lock.ops.query.get_run_jobs'),
+            unlock_one=patch('teuthology.lock.ops.unlock_one'),
+        )
+        self.mocks = {
+            name: patcher.start() for name, patcher in self.patchers.items()
+        }
+        self.mocks['get_run_jobs'].return_value = {
+            '1': dict(job_id=1, status='fail', updated=None),
+        }
+        self.mocks['unlock_one'].return_value = True
+
+    def teardown_method(self):
+        for patcher in self.patchers.values():
+            patcher.stop()
+
+    def test_given_statuses(self):
+        assert ops.unlock_safe(['node1', 'node2'], 'me', 'run1', '1',
+                               statuses=self.statuses)
+        self.mocks['get_status_many'].assert_not_called()
+        # Both nodes' job is only fetched once
+        self.mocks['get_run_jobs'].assert_called_once_with('run1')
+        assert self.mocks['unlock_one'].call_count == 2
+
+    def test_single_node(self):
+        self.mocks['get_status_many'].return_value = {
+            'node1': self.statuses['node1']}
+        with patch('teuthology.lock.ops.query.node_active_job') as m_active:
+            m_active.return_value = None
+            assert ops.unlock_safe(['node1'], 'me', 'run1', '1')
+            m_active.assert_called_once_with(
+                'node1', self.statuses['node1'], run_jobs=None)
+        self.mocks['get_run_jobs'].assert_not_called()
+
+    def test_active_job(self):
+        self.mocks['get_status_many'].return_value = self.statuses
+        self.mocks['get_run_jobs'].return_value = {
+            '1': dict(job_id=1, status='running', updated=None),
+        }
+        assert not ops.unlock_safe(['node1', 'node2'], 'me')
+        self.mocks['get_status_many'].assert_called_once_with(
+            ['node1', 'node2'])
+        self.mocks['unlock_one'].assert_not_called()
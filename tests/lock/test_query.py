@@ -0,0 +1,124 @@
+from unittest.mock import Mock, patch
+
+from teuthology.lock import query
+
+
+class TestGetStatusMany(object):
+    def setup_method(self):
+        self.nodes = {
+            'node1.front.sepia.ceph.com': dict(
+                name='node1.front.sepia.ceph.com', locked=True),
+            'node2.front.sepia.ceph.com': dict(
+                name='node2.front.sepia.ceph.com', locked=False),
+        }
+
+    def get_status(self, name):
+        return self.nodes.get(name.split('@')[-1], dict())
+
+    @patch('teuthology.lock.query.BULK_STATUS_MIN', 3)
+    @patch('teuthology.lock.query.get_status')
+    @patch('teuthology.lock.query.list_locks')
+    def test_one_request(self, m_list_locks, m_get_status):
+        m_list_locks.return_value = self.nodes
+        got = query.get_status_many([
+            'ubuntu@node1.front.sepia.ceph.com',
+            'node2.front.sepia.ceph.com',
+            'node3.front.sepia.ceph.com',
+        ], machine_type='smithi')
+        assert got == {
+            'ubuntu@node1.front.sepia.ceph.com':
+                self.nodes['node1.front.sepia.ceph.com'],
+            'node2.front.sepia.ceph.com':
+                self.nodes['node2.front.sepia.ceph.com'],
+        }
+        m_list_locks.assert_called_once_with(
+            keyed_by_name=True, machine_type='smithi')
+        m_get_status.assert_not_called()
+
+    @patch('teuthology.lock.query.get_status')
+    @patch('teuthology.lock.query.list_locks')
+    def test_few_nodes(self, m_list_locks, m_get_status):
+        m_get_status.side_effect = self.get_status
+        got = query.get_status_many([
+            'ubuntu@node1.front.sepia.ceph.com',
+            'node3.front.sepia.ceph.com',
+        ])
+        assert got == {
+            'ubuntu@node1.front.sepia.ceph.com':
+                self.nodes['node1.front.sepia.ceph.com'],
+        }
+        assert m_get_status.call_count == 2
+        m_list_locks.assert_not_called()
+
+    @patch('teuthology.lock.query.get_status')
+    def test_get_statuses(self, m_get_status):
+        m_get_status.side_effect = self.get_status
+        got = query.get_statuses([
+            'node2.front.sepia.ceph.com',
+            'node3.front.sepia.ceph.com',
+            'node1.front.sepia.ceph.com',
+        ])
+        assert got == [
+            self.nodes['node2.front.sepia.ceph.com'],
+            self.nodes['node1.front.sepia.ceph.com'],
+        ]
+
+
+class TestFindStaleLocks(object):
+    def setup_method(self):
+        self.nodes = [
+            dict(name='node1', locked=True, locked_by='scheduled_me',
+                 description='/archive/run1/1'),
+            dict(name='node2', locked=True, locked_by='scheduled_me',
+                 description='/archive/run1/2'),
+            dict(name='node3', locked=True, locked_by='scheduled_me',
+                 description='/archive/run2/3'),
+            dict(name='node4', locked=True, locked_by='me',
+                 description='debugging'),
+        ]
+        self.jobs = {
+            'run1': [
+                dict(job_id=1, status='pass', updated='2000-01-01T00:00:00'),
+                dict(job_id=2, status='running',
+                     updated='2000-01-01T00:00:00'),
+            ],
+            'run2': [
+                dict(job_id=3, status='dead', updated='2000-01-01T00:00:00'),
+            ],
+        }
+
+    def get(self, url):
+        run_name = url.split('/runs/')[1].split('/')[0]
+        assert url.endswith('/jobs/?fields=job_id,status,updated')
+        resp = Mock(ok=True)
+        resp.json.return_value = self.jobs[run_name]
+        return resp
+
+    @patch('teuthology.lock.query.http.get')
+    @patch('teuthology.lock.query.list_locks')
+    def test_find_stale_locks(self, m_list_locks, m_get):
+        m_list_locks.return_value = self.nodes
+        m_get.side_effect = self.get
+        got = query.find_stale_locks()
+        assert [node['name'] for node in got] == ['node1', 'node3']
+        # One request per run, rather than one per node
+        assert m_get.call_count == 2
+
+    @patch('teuthology.lock.query.http.get')
+    @patch('teuthology.lock.query.list_locks')
+    def test_missing_job(self, m_list_locks, m_get):
+        m_list_locks.return_value = self.nodes[:1]
+        self.jobs['run1'] = []
+        m_get.side_effect = self.get
+        assert query.find_stale_locks() == []
+
+    @patch('teuthology.lock.query.parallel_map', wraps=query.parallel_map)
+    @patch('teuthology.lock.query.http.get')
+    @patch('teuthology.lock.query.list_locks')
+    def test_bounded_concurrency(self, m_list_locks, m_get, m_parallel_map):
+        m_list_locks.return_value = self.nodes
+        m_get.side_effect = self.get
+        query.find_stale_locks()
+        assert m_parallel_map.call_count == 2
+        for call in m_parallel_map.call_args_list:
+            assert call.kwargs['concurrency'] == query.http.POOL_SIZE
@@ -200,6 +200,23 @@ class TestCluster(object):
             r1: ['foo']
         }
 
+    def test_run_batch(self):
+        r1 = Mock(_name='r1')
+        r2 = Mock(_name='r2')
+        c = cluster.Cluster(remotes=[
+                (r1, ['foo']),
+                (r2, ['bar']),
+            ])
+        got = c.run_batch(['true', 'false'], check_status=False)
+        assert got == {
+            r1: r1.run_batch.return_value,
+            r2: r2.run_batch.return_value,
+        }
+        r1.run_batch.assert_called_once_with(
+            ['true', 'false'], check_status=False)
+        r2.run_batch.assert_called_once_with(
+            ['true', 'false'], check_status=False)
+
 
 class TestWriteFile(object):
     """ Tests for cluster.write_file """
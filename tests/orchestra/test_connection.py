@@ -1,3 +1,5 @@
+import os
+
 from mock import patch, Mock
 
 from teuthology import config
@@ -118,3 +120,131 @@ class TestConnection(object):
         )
         m_transport.set_keepalive.assert_called_once_with(False)
         assert got is m_ssh_instance
+
+    def clear_clients(self):
+        connection._clients.clear()
+        connection._client_refs.clear()
+        connection._client_locks.clear()
+
+    def live_transport(self):
+        m_transport = Mock()
+        m_transport.is_active.return_value = True
+        m_channel = m_transport.open_session.return_value
+        m_channel.status_event.wait.return_value = True
+        m_channel.recv_exit_status.return_value = 0
+        return m_transport
+
+    def test_connect_reuse(self):
+        self.clear_config()
+        self.clear_clients()
+        m_transport = self.live_transport()
+        self.m_ssh.return_value.get_transport.return_value = m_transport
+        first = connection.connect(
+            'jdoe@orchestra.test.newdream.net.invalid',
+            _SSHClient=self.m_ssh,
+            reuse=True,
+        )
+        second = connection.connect(
+            'jdoe@orchestra.test.newdream.net.invalid',
+            _SSHClient=self.m_ssh,
+            reuse=True,
+        )
+        assert second is first
+        self.m_ssh.assert_called_once()
+        m_transport.open_session.return_value.exec_command.\
+            assert_called_once_with('true')
+        assert connection.is_shared(first)
+        connection.forget(first)
+        assert not connection.is_shared(first)
+        assert connection._client_locks == dict()
+
+    def test_connect_reuse_dead(self):
+        self.clear_config()
+        self.clear_clients()
+        dead = Mock()
+        dead.get_transport.return_value.is_active.return_value = False
+        live = Mock()
+        self.m_ssh.side_effect = [dead, live]
+        first = connection.connect(
+            'jdoe@orchestra.test.newdream.net.invalid',
+            _SSHClient=self.m_ssh,
+            reuse=True,
+        )
+        second = connection.connect(
+            'jdoe@orchestra.test.newdream.net.invalid',
+            _SSHClient=self.m_ssh,
+            reuse=True,
+        )
+        assert first is dead
+        assert second is live
+        dead.close.assert_called_once_with()
+        assert not connection.is_shared(dead)
+        self.clear_clients()
+
+    def test_connect_reuse_unresponsive(self):
+        self.clear_config()
+        self.clear_clients()
+        hung = Mock()
+        hung.get_transport.return_value = self.live_transport()
+        m_channel = hung.get_transport.return_value.open_session.return_value
+        m_channel.status_event.wait.return_value = False
+        live = Mock()
+        self.m_ssh.side_effect = [hung, live]
+        first = connection.connect(
+            'jdoe@orchestra.test.newdream.net.invalid',
+            _SSHClient=self.m_ssh,
+            reuse=True,
+            timeout=5,
+        )
+        second = connection.connect(
+            'jdoe@orchestra.test.newdream.net.invalid',
+            _SSHClient=self.m_ssh,
+            reuse=True,
+            timeout=5,
+        )
+        assert first is hung
+        assert second is live
+        m_channel.status_event.wait.assert_called_once_with(5)
+        hung.close.assert_called_once_with()
+        self.clear_clients()
+
+    def test_release(self):
+        self.clear_config()
+        self.clear_clients()
+        self.m_ssh.return_value.get_transport.return_value = \
+            self.live_transport()
+        clients = [
+            connection.connect(
+                'jdoe@orchestra.test.newdream.net.invalid',
+                _SSHClient=self.m_ssh,
+                reuse=True,
+            )
+            for _ in range(2)
+        ]
+        client = clients[0]
+        connection.release(client)
+        client.close.assert_not_called()
+        assert connection.is_shared(client)
+        connection.release(client)
+        client.close.assert_called_once_with()
+        assert not connection.is_shared(client)
+        assert connection._client_refs == dict()
+        assert connection._client_locks == dict()
+
+    def test_release_unshared(self):
+        client = Mock()
+        connection.release(client)
+        client.close.assert_called_once_with()
+
+    def test_get_ssh_config(self, tmp_path):
+        path = tmp_path / 'config'
+        path.write_text('Host foo\n  User bar\n')
+        first = connection.get_ssh_config(str(path))
+        assert first.lookup('foo')['user'] == 'bar'
+        assert connection.get_ssh_config(str(path)) is first
+        path.write_text('Host foo\n  User baz\n')
+        os.utime(path, ns=(0, 0))
+        second = connection.get_ssh_config(str(path))
+        assert second is not first
+        assert second.lookup('foo')['user'] == 'baz'
+        assert connection.get_ssh_config(str(tmp_path / 'missing')) is None
@@ -1,14 +1,53 @@
 from mock import patch, Mock, MagicMock
 from pytest import raises
 
+import subprocess
+
 from io import BytesIO
 
 from teuthology.orchestra import remote
 from teuthology.orchestra import opsys
+from teuthology.orchestra import run
 from teuthology.orchestra.run import RemoteProcess
 from teuthology.exceptions import CommandFailedError, UnitTestError
 
 
+class LocalShell(remote.RemoteShell):
+    """
+    Runs commands on this host, to exercise RemoteShell's helpers
+    """
+    shortname = 'localhost'
+
+    def run(self, args, stdout=None, **kwargs):
+        proc = subprocess.run(
+            run.quote(args), shell=True, stdout=subprocess.PIPE)
+        stdout.write(proc.stdout)
+        return Mock(stdout=stdout, returncode=proc.returncode)
+
+
+class TestRemoteShell(object):
+    def test_run_batch(self):
+        results = LocalShell().run_batch(
+            ['echo one; echo two >&2', ['printf', '%s', 'a b'], 'exit 3',
+             'printf "no newline"'],
+            check_status=False,
+        )
+        assert [r.returncode for r in results] == [0, 0, 3, 0]
+        assert results[0].stdout == 'one\n'
+        assert results[0].stderr == 'two\n'
+        assert results[1].stdout == 'a b'
+        assert results[1].args == ['printf', '%s', 'a b']
+        assert results[2].stdout == ''
+        assert results[3].stdout == 'no newline'
+
+    def test_run_batch_check_status(self):
+        with raises(CommandFailedError) as exc:
+            LocalShell().run_batch(['true', 'exit 3', 'exit 4'])
+        assert exc.value.exitstatus == 3
+        assert exc.value.command == 'exit 3'
+        assert exc.value.node == 'localhost'
+
+
 class TestRemote(object):
 
     def setup_method(self):
@@ -193,6 +232,69 @@ class TestRemote(object):
             rem = remote.Remote(name='jdoe@xyzzy.example.com', ssh=self.m_ssh)
             assert rem._sftp_get_size('/fake/file') == 42
 
+    def test_sftp_reused(self):
+        m_sftp = self.m_ssh.open_sftp.return_value
+        m_sftp.sock.closed = False
+        rem = remote.Remote(name='jdoe@xyzzy.example.com', ssh=self.m_ssh)
+        rem._sftp_put_file('/local/a', '/remote/a')
+        rem._sftp_put_file('/local/b', '/remote/b')
+        rem._sftp_open_file('/remote/c')
+        self.m_ssh.open_sftp.assert_called_once_with()
+        assert m_sftp.put.call_count == 2
+
+    def test_sftp_reopened(self):
+        m_sftp = self.m_ssh.open_sftp.return_value
+        m_sftp.sock.closed = False
+        rem = remote.Remote(name='jdoe@xyzzy.example.com', ssh=self.m_ssh)
+        assert rem.sftp is m_sftp
+        m_sftp.sock.closed = True
+        rem.sftp
+        m_sftp.close.assert_called_once_with()
+        assert self.m_ssh.open_sftp.call_count == 2
+        m_new_ssh = MagicMock()
+        rem.ssh = m_new_ssh
+        assert rem.sftp is m_new_ssh.open_sftp.return_value
+
+    def test_sftp_get_file(self, tmp_path):
+        m_file = MagicMock()
+        m_file.stat.return_value.st_size = 3
+        m_file.read.side_effect = [b'abc', b'']
+        m_sftp = self.m_ssh.open_sftp.return_value
+        m_sftp.sock.closed = False
+        m_sftp.open.return_value.__enter__.return_value = m_file
+        rem = remote.Remote(name='jdoe@xyzzy.example.com', ssh=self.m_ssh)
+        local_path = str(tmp_path / 'file')
+        assert rem._sftp_get_file('/remote/file', local_path) == local_path
+        m_sftp.open.assert_called_once_with('/remote/file', 'rb')
+        m_file.prefetch.assert_called_once_with(3)
+        with open(local_path, 'rb') as f:
+            assert f.read() == b'abc'
+        self.m_ssh.open_sftp.assert_called_once_with()
+
+    def test_gather_facts(self):
+        os_release = ('NAME="Ubuntu"\nVERSION_ID="22.04"\nID=ubuntu\n'
+                      'VERSION_CODENAME=jammy\n')
+        batch = [
+            remote.BatchResult(None, 0, os_release, ''),
+            remote.BatchResult(None, 0, 'x86_64\n', ''),
+            remote.BatchResult(None, 0, '5.15.0-91-generic\n', ''),
+            remote.BatchResult(None, 1, '', ''),
+            remote.BatchResult(None, 0, '/usr/bin/systemctl\n', ''),
+            remote.BatchResult(None, 0, '', ''),
+        ]
+        rem = remote.Remote(name='jdoe@xyzzy.example.com', ssh=self.m_ssh)
+        with patch.object(remote.Remote, 'run_batch', return_value=batch), \
+                patch.object(remote.Remote, 'run') as m_run:
+            facts = rem.gather_facts()
+            assert facts['kernel'] == '5.15.0-91-generic'
+            assert rem.os.name == 'ubuntu'
+            assert rem.os.version == '22.04'
+            assert rem.arch == 'x86_64'
+            assert rem.is_container is False
+            assert rem.init_system == 'systemd'
+            assert rem.is_uefi is True
+            assert not m_run.called
+
     def test_format_size(self):
         assert remote.Remote._format_size(1023).strip() == '1023B'
         assert remote.Remote._format_size(1024).strip() == '1KB'
@@ -257,3 +359,35 @@ class TestRemote(object):
 
         remote.Remote.write_file(rem, file, contents, sync=True)
         m_run.assert_called_with(args=f"set -ex\ndd of={file} conv=sync", stdin=contents, quiet=True)
+
+    @patch("teuthology.orchestra.remote.connection.release")
+    @patch("teuthology.orchestra.remote.connection.connect")
+    def test_connect_releases_previous(self, m_connect, m_release):
+        rem = remote.Remote(name='jdoe@xyzzy.example.com', ssh=self.m_ssh)
+        new_ssh = m_connect.return_value
+        assert rem.connect() is new_ssh
+        # Other tests' Remotes may be garbage-collected meanwhile
+        m_release.assert_any_call(self.m_ssh)
+        rem.close()
+        m_release.assert_any_call(new_ssh)
+        assert rem.ssh is None
+
+    @patch("teuthology.orchestra.remote.connection.is_alive")
+    @patch("teuthology.orchestra.remote.Remote.run")
+    def test_reconnect_probe_timeout(self, m_run, m_is_alive):
+        m_is_alive.return_value = True
+        rem = remote.Remote(name='jdoe@xyzzy.example.com', ssh=self.m_ssh)
+        assert rem.reconnect(timeout=5) is True
+        m_run.assert_called_once_with(args="true", timeout=5)
+
+    @patch("teuthology.orchestra.remote.Remote._reconnect")
+    @patch("teuthology.orchestra.remote.connection.is_alive")
+    @patch("teuthology.orchestra.remote.Remote.run")
+    def test_reconnect_probe_hangs(self, m_run, m_is_alive, m_reconnect):
+        m_is_alive.return_value = True
+        m_run.side_effect = TimeoutError()
+        m_reconnect.return_value = True
+        rem = remote.Remote(name='jdoe@xyzzy.example.com', ssh=self.m_ssh)
+        assert rem.reconnect(timeout=0) is True
+        m_run.assert_called_once_with(args="true", timeout=10)
+        m_reconnect.assert_called_once_with(timeout=None)
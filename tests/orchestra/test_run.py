@@ -1,4 +1,8 @@
-from io import BytesIO
+import gevent
+import logging
+import time
+
+from io import BytesIO, StringIO
 
 import paramiko
 import socket
@@ -8,7 +12,7 @@ from pytest import raises
 
 from teuthology.orchestra import run
 from teuthology.exceptions import (CommandCrashedError, CommandFailedError,
-                                   ConnectionLostError)
+                                   ConnectionLostError, MaxWhileTries)
 
 def set_buffer_contents(buf, contents):
     buf.seek(0)
@@ -124,6 +128,21 @@ class TestRun(object):
         assert proc.stderr.read().decode() == output
         assert proc.stderr.getvalue().decode() == output
 
+    def test_raw_output(self):
+        set_buffer_contents(self.m_stdout_buf, 'foo\n')
+        set_buffer_contents(self.m_stderr_buf, 'bar\n')
+        self.m_stdout_buf.channel.recv_exit_status.return_value = 0
+        raw = BytesIO()
+        run.run(
+            client=self.m_ssh,
+            args=['foo'],
+            stdout=run.PIPE,
+            wait=False,
+            raw_output=raw,
+        ).wait()
+        # stdout is the caller's to read, so only stderr is copied
+        assert raw.getvalue() == b'bar\n'
+
     def test_status_bad(self):
         self.m_stdout_buf.channel.recv_exit_status.return_value = 42
         with raises(CommandFailedError) as exc:
@@ -264,6 +283,123 @@ class TestRun(object):
         run.copy_and_close(b'', MagicMock())
 
 
+class FakeProcess(object):
+    def __init__(self, delay, exc=None):
+        self.delay = delay
+        self.exc = exc
+        self.waited = False
+
+    def wait(self):
+        gevent.sleep(self.delay)
+        self.waited = True
+        if self.exc:
+            raise self.exc
+        return 0
+
+
+class TestWait(object):
+    def test_all_succeed(self):
+        procs = [FakeProcess(0.02), FakeProcess(0)]
+        run.wait(procs)
+        assert all(p.waited for p in procs)
+
+    def test_first_failure_raised_after_all_exit(self):
+        procs = [
+            FakeProcess(0.05, CommandFailedError('a', 1)),
+            FakeProcess(0, CommandFailedError('b', 2)),
+            FakeProcess(0.1),
+        ]
+        with raises(CommandFailedError) as exc:
+            run.wait(procs)
+        assert exc.value.command == 'a'
+        assert procs[2].waited
+
+    def test_fail_fast(self):
+        procs = [FakeProcess(1), FakeProcess(0, CommandFailedError('b', 2))]
+        start = time.monotonic()
+        with raises(CommandFailedError) as exc:
+            run.wait(procs, fail_fast=True)
+        assert exc.value.command == 'b'
+        assert time.monotonic() - start < 0.5
+        assert not procs[0].waited
+        # The other process' waiter was stopped rather than left running
+        gevent.sleep(1.1)
+        assert not procs[0].waited
+
+    def test_timeout(self):
+        procs = [FakeProcess(0), FakeProcess(0.3)]
+        start = time.monotonic()
+        with raises(MaxWhileTries):
+            run.wait(procs, timeout=0.1)
+        assert time.monotonic() - start < 1
+        gevent.sleep(0.4)
+        assert not procs[1].waited
+
+
+class FakeChannel(object):
+    """
+    Hands out data in the given pieces, as paramiko.Channel.recv() would
+    """
+    def __init__(self, pieces):
+        self.pieces = list(pieces)
+
+    def recv(self, size):
+        if not self.pieces:
+            return b''
+        return self.pieces.pop(0)
+
+    recv_stderr = recv
+
+
+class TestCopyToLog(object):
+    def setup_method(self):
+        self.logger = logging.getLogger('test_copy_to_log')
+        self.logger.setLevel(logging.DEBUG)
+
+    def channelfile(self, pieces):
+        return paramiko.ChannelFile(FakeChannel(pieces), 'rb')
+
+    def test_lines_split_across_chunks(self, caplog):
+        src = self.channelfile([b'one\ntw', b'o\r\n\nthr', b'ee'])
+        with caplog.at_level(logging.INFO, logger=self.logger.name):
+            run.copy_to_log(src, self.logger)
+        assert [r.getMessage() for r in caplog.records] == \
+            ['one', 'two', '', 'three']
+
+    def test_capture(self):
+        snowman = '\u2603'.encode()
+        pieces = [b'a\n' + snowman[:1], snowman[1:] + b'\n']
+        text = StringIO()
+        run.copy_to_log(self.channelfile(pieces), self.logger, capture=text,
+                        quiet=True)
+        assert text.getvalue() == 'a\n\u2603\n'
+        binary = BytesIO()
+        raw = BytesIO()
+        run.copy_to_log(self.channelfile(pieces), self.logger,
+                        capture=binary, raw=raw, quiet=True)
+        assert binary.getvalue() == raw.getvalue() == 'a\n\u2603\n'.encode()
+
+    def test_stderr(self):
+        src = paramiko.channel.ChannelStderrFile(
+            FakeChannel([b'a\n', b'b\n']), 'rb')
+        raw = BytesIO()
+        run.copy_to_log(src, self.logger, raw=raw, quiet=True)
+        assert raw.getvalue() == b'a\nb\n'
+
+    def test_quiet(self, caplog):
+        with caplog.at_level(logging.INFO, logger=self.logger.name):
+            run.copy_to_log(self.channelfile([b'a\n']), self.logger,
+                            quiet=True)
+        assert caplog.records == []
+
+    def test_text_stream(self, caplog):
+        raw = BytesIO()
+        with caplog.at_level(logging.INFO, logger=self.logger.name):
+            run.copy_to_log(StringIO('a\nb\n'), self.logger, raw=raw)
+        assert [r.getMessage() for r in caplog.records] == ['a', 'b']
+        assert raw.getvalue() == b'a\nb\n'
+
+
 class TestQuote(object):
     def test_quote_simple(self):
         got = run.quote(['a b', ' c', 'd e '])
@@ -1,10 +1,17 @@
 import argparse
+import gc
 import os
+import time
 
 from logging import debug
+from mock import Mock
+from pytest import raises
+
 from teuthology import misc
+from teuthology.exceptions import CommandFailedError
 from teuthology.orchestra import cluster
 from teuthology.orchestra.run import quote
+from teuthology.orchestra.daemon import systemd
 from teuthology.orchestra.daemon.group import DaemonGroup
 import subprocess
 
@@ -52,3 +59,136 @@ def test_pid():
             pid = daemon.pid
             debug(pid)
             assert pid
+
+
+class TestGroupOps(object):
+    def setup_method(self):
+        self.group = DaemonGroup(use_systemd=True)
+        self.remotes = []
+        for name, roles in (('host1', ['osd.0', 'osd.1']),
+                            ('host2', ['osd.2', 'mon.a'])):
+            remote = Mock()
+            remote.shortname = name
+            remote.init_system = 'systemd'
+            self.remotes.append(remote)
+            for role in roles:
+                type_, id_ = role.split('.')
+                self.group.register_daemon(remote, type_, id_)
+
+    def test_stop_all(self):
+        self.group.stop_all('osd')
+        self.remotes[0].run.assert_called_once_with(
+            args=['sudo', 'systemctl', 'stop', '--',
+                  'ceph-osd@0', 'ceph-osd@1'])
+        self.remotes[1].run.assert_called_once_with(
+            args=['sudo', 'systemctl', 'stop', '--', 'ceph-osd@2'])
+
+    def test_stop_all_error(self):
+        self.remotes[0].run.side_effect = CommandFailedError('stop', 1)
+        with raises(CommandFailedError):
+            self.group.stop_all()
+        self.remotes[1].run.assert_called_once_with(
+            args=['sudo', 'systemctl', 'stop', '--', 'ceph-osd@2',
+                  'ceph-mon@a'])
+
+    def test_status_all(self):
+        self.remotes[0].sh.return_value = (
+            'ActiveState=active\nSubState=running\nMainPID=1234\n'
+            'ExecMainStatus=0\n\n'
+            'ActiveState=failed\nSubState=failed\nMainPID=0\n'
+            'ExecMainStatus=1\n'
+        )
+        self.remotes[1].sh.return_value = (
+            'ActiveState=active\nSubState=running\nMainPID=42\n'
+            'ExecMainStatus=0\n'
+        )
+        got = self.group.status_all('osd')
+        assert {d.id_: pid for d, pid in got.items()} == \
+            {'0': 1234, '1': None, '2': 42}
+        self.remotes[0].sh.assert_called_once_with(
+            ['sudo', 'systemctl', 'show',
+             '--property=ActiveState,SubState,MainPID,ExecMainStatus', '--',
+             'ceph-osd@0', 'ceph-osd@1'])
+
+    def test_restart_all_failed(self):
+        self.remotes[1].sh.return_value = (
+            'ActiveState=failed\nSubState=failed\nMainPID=0\n'
+            'ExecMainStatus=1\n'
+        )
+        with raises(CommandFailedError):
+            self.group.restart_all('mon')
+        self.remotes[1].run.assert_called_once_with(
+            args=['sudo', 'systemctl', 'restart', '--', 'ceph-mon@a'])
+        assert not self.remotes[0].run.called
+
+
+class TestUnitStatusCache(object):
+    def setup_method(self):
+        self.remote = Mock()
+        self.remote.shortname = 'host1'
+        self.remote.init_system = 'systemd'
+        self.remote.sh.return_value = (
+            'ActiveState=active\nSubState=running\nMainPID=1234\n'
+            'ExecMainStatus=0\n\n'
+            'ActiveState=failed\nSubState=failed\nMainPID=0\n'
+            'ExecMainStatus=1\n'
+        )
+        self.group = DaemonGroup(use_systemd=True)
+        self.group.register_daemon(self.remote, 'osd', '0')
+        self.group.register_daemon(self.remote, 'osd', '1')
+        self.osd0 = self.group.get_daemon('osd', '0')
+        self.osd1 = self.group.get_daemon('osd', '1')
+        # make sure both units are known before the first query
+        self.osd0.status_cache.add(self.osd1.unit)
+
+    def teardown_method(self):
+        systemd._status_caches.pop(self.remote, None)
+
+    def test_released_with_remote(self):
+        count = len(systemd._status_caches)
+        remote = Mock()
+        systemd.get_status_cache(remote)
+        assert len(systemd._status_caches) == count + 1
+        del remote
+        gc.collect()
+        assert len(systemd._status_caches) == count
+
+    def test_one_query_per_host(self):
+        assert self.osd0.running() == 1234
+        assert self.osd1.running() is None
+        self.remote.sh.assert_called_once_with(
+            ['sudo', 'systemctl', 'show',
+             '--property=ActiveState,SubState,MainPID,ExecMainStatus', '--',
+             'ceph-osd@0', 'ceph-osd@1'])
+
+    def test_check_status(self):
+        assert self.osd0.check_status() is None
+        with raises(CommandFailedError):
+            self.osd1.check_status()
+        assert self.remote.sh.call_count == 1
+
+    def test_stale(self):
+        self.osd0.status_cache.max_age = 0
+        self.osd0.running()
+        time.sleep(0.01)
+        self.osd1.running()
+        assert self.remote.sh.call_count == 2
+
+    def test_invalidated_by_stop(self):
+        self.osd0.stop()
+        self.remote.run.assert_called_once()
+        self.osd0.running()
+        assert self.remote.sh.call_count == 2
+
+    def test_stop_checks_current_state(self):
+        # osd.1 is cached as failed, but systemd has since restarted it
+        assert self.osd1.running() is None
+        self.remote.sh.return_value = (
+            'ActiveState=active\nSubState=running\nMainPID=1234\n'
+            'ExecMainStatus=0\n\n'
+            'ActiveState=active\nSubState=running\nMainPID=5678\n'
+            'ExecMainStatus=0\n'
+        )
+        self.osd1.stop()
+        self.remote.run.assert_called_once()
+        assert self.remote.sh.call_count == 2
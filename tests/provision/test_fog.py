@@ -26,6 +26,7 @@ class TestFOG(object):
     def setup_method(self):
         config.load()
         config.update(deepcopy(test_config))
+        fog._image_cache.clear()
         self.start_patchers()
 
     def start_patchers(self):
@@ -178,6 +179,29 @@ class TestFOG(object):
         assert req.body == '{"name": "type1_windows_xp"}'
         assert result == img_objs[0]
 
+    def test_get_image_data_cached(self):
+        resp_obj = dict(count=1, images=[dict(id=1)])
+        self.mocks['m_requests_Session_send']\
+            .return_value.json.return_value = resp_obj
+        self.mocks['m_Remote_machine_type'].return_value = 'type1'
+        for name in ('name1.fqdn', 'name2.fqdn'):
+            obj = self.klass(name, 'windows', 'xp')
+            assert obj.get_image_data() == dict(id=1)
+        assert len(self.mocks['m_requests_Session_send'].call_args_list) == 1
+        obj = self.klass('name3.fqdn', 'windows', '10')
+        obj.get_image_data()
+        assert len(self.mocks['m_requests_Session_send'].call_args_list) == 2
+
+    def test_get_image_data_cache_disabled(self):
+        config.image_cache_ttl = 0
+        resp_obj = dict(count=1, images=[dict(id=1)])
+        self.mocks['m_requests_Session_send']\
+            .return_value.json.return_value = resp_obj
+        self.mocks['m_Remote_machine_type'].return_value = 'type1'
+        for name in ('name1.fqdn', 'name2.fqdn'):
+            self.klass(name, 'windows', 'xp').get_image_data()
+        assert len(self.mocks['m_requests_Session_send'].call_args_list) == 2
+
     @mark.parametrize(
         'images,expected_name,expected_resolved',
         [
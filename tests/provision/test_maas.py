@@ -24,6 +24,7 @@ class TestMaas(object):
     def setup_method(self):
         config.load()
         config.update(deepcopy(test_config))
+        maas._image_cache.clear()
         self.start_patchers()
 
     def start_patchers(self):
@@ -139,6 +140,31 @@ class TestMaas(object):
                 "architecture": "amd64/generic",
             }
 
+    def test_get_image_data_cached(self):
+        with patch.multiple(
+            "teuthology.provision.maas.MAAS",
+            do_request=DEFAULT,
+            get_machines_data=DEFAULT,
+        ) as local_mocks:
+            local_mocks["do_request"].return_value = self._get_mock_response(
+                content=b'[{"name": "ubuntu/jammy", "architecture": "amd64/generic"},'
+                        b' {"name": "ubuntu/noble", "architecture": "amd64/generic"}]'
+            )
+            local_mocks["get_machines_data"].return_value = {
+                "status_name": "ready",
+                "architecture": "amd64/generic",
+            }
+            for name, os_version, codename in (
+                ("name1.fqdn", "22.04", "jammy"),
+                ("name2.fqdn", "22.04", "jammy"),
+                ("name3.fqdn", "24.04", "noble"),
+            ):
+                obj = self.klass(
+                    name=name, os_type="ubuntu", os_version=os_version
+                )
+                assert obj.get_image_data()["name"] == f"ubuntu/{codename}"
+            local_mocks["do_request"].assert_called_once_with("/boot-resources/")
+
     def test_lock_machine(self):
         with patch.multiple(
             "teuthology.provision.maas.MAAS",
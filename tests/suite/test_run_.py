@@ -130,7 +130,7 @@ class TestRun(object):
             assert obj.base_config['expire']
 
     @patch('teuthology.suite.run.util.fetch_repos')
-    @patch('requests.head')
+    @patch('teuthology.util.http.head')
     @patch('teuthology.suite.run.util.git_branch_exists')
     @patch('teuthology.suite.run.util.package_version_for_hash')
     @patch('teuthology.suite.run.util.git_ls_remote')
@@ -156,7 +156,7 @@ class TestRun(object):
         assert run.base_config.branch == 'ceph_branch'
 
     @patch('teuthology.suite.run.util.git_ls_remote')
-    @patch('requests.head')
+    @patch('teuthology.util.http.head')
     @patch('teuthology.suite.util.git_branch_exists')
     @patch('teuthology.suite.util.package_version_for_hash')
     def test_sha1_nonexistent(
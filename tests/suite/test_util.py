@@ -87,7 +87,7 @@ Branch 'no-branch' not found in repo: https://github.com/ceph/ceph-ci.git!"
 Branch 'no-branch' not found in repo: https://github.com/ceph/ceph-ci.git!"
         m_smtp.assert_not_called()
 
-    @patch('requests.get')
+    @patch('teuthology.util.http.get')
     def test_get_branch_info(self, m_get):
         mock_resp = Mock()
         mock_resp.ok = True
@@ -147,7 +147,7 @@ Branch 'no-branch' not found in repo: https://github.com/ceph/ceph-ci.git!"
         assert util.git_ls_remote('ceph', 'nobranch') is None
         assert util.git_ls_remote('ceph', 'main') is not None
 
-    @patch('teuthology.suite.util.requests.get')
+    @patch('teuthology.suite.util.http.get')
     def test_find_git_parents(self, m_requests_get):
         history_resp = Mock(ok=True)
         history_resp.json.return_value = {'sha1s': ['sha1', 'sha1_p']}
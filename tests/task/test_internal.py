@@ -1,4 +1,7 @@
+from unittest.mock import patch, Mock
+
 from teuthology.config import FakeNamespace
+from teuthology.orchestra.cluster import Cluster
 from teuthology.task import internal
 
 
@@ -55,3 +58,28 @@ class TestInternal(object):
         assert internal.buildpackages_prep(self.ctx,
                                            self.ctx.config) == internal.BUILDPACKAGES_REMOVED
         assert self.ctx.config == {'tasks': []}
+
+    @patch("teuthology.task.internal.teuthology.lock.ops.update_inventory")
+    @patch("teuthology.task.internal.teuth_config")
+    def test_push_inventory(self, m_config, m_update_inventory):
+        m_config.lock_server = 'http://lock.example.com'
+        good = Mock(inventory_info=dict(name='good'))
+        bad = Mock()
+        type(bad).inventory_info = property(
+            Mock(side_effect=RuntimeError('unreachable')))
+        also_good = Mock(inventory_info=dict(name='also_good'))
+        self.ctx.cluster = Cluster(
+            remotes=[(good, ['a']), (bad, ['b']), (also_good, ['c'])])
+        internal.push_inventory(self.ctx, None)
+        pushed = [c.args[0] for c in m_update_inventory.call_args_list]
+        assert sorted(i['name'] for i in pushed) == ['also_good', 'good']
+
+    def test_connect_gathers_facts(self):
+        good = Mock()
+        bad = Mock()
+        bad.gather_facts.side_effect = RuntimeError('no bash')
+        self.ctx.cluster = Cluster(remotes=[(good, ['a']), (bad, ['b'])])
+        internal.connect(self.ctx, None)
+        for rem in (good, bad):
+            rem.connect.assert_called_once_with()
+            rem.gather_facts.assert_called_once_with()
@@ -1,5 +1,7 @@
 import pytest
 
+from unittest.mock import patch
+
 from teuthology import config
 
 
@@ -110,6 +112,32 @@ class TestTeuthologyConfig(TestYamlConfig):
         conf_obj.something = 'something else'
         assert conf_obj.something == 'something else'
 
+    def test_config_changed(self, tmp_path):
+        path = tmp_path / 'teuthology.yaml'
+        path.write_text('reserve_machines: 2\n')
+        conf_obj = self.test_class(str(path))
+        assert conf_obj.reserve_machines == 2
+        assert not conf_obj.config_changed()
+        path.write_text('reserve_machines: 30\n')
+        assert conf_obj.config_changed()
+        assert conf_obj.reload()
+        assert conf_obj.reserve_machines == 30
+        assert not conf_obj.config_changed()
+        path.unlink()
+        assert conf_obj.config_changed()
+
+    def test_reload_unchanged_discards_modifications(self, tmp_path):
+        path = tmp_path / 'teuthology.yaml'
+        path.write_text('openstack:\n  ip: 1.2.3.4\n')
+        conf_obj = self.test_class(str(path))
+        conf_obj.ceph_qa_suite_git_url = 'https://example.com/ceph.git'
+        conf_obj.openstack['ip'] = '5.6.7.8'
+        with patch('yaml.safe_load') as m_safe_load:
+            assert not conf_obj.reload()
+            m_safe_load.assert_not_called()
+        assert conf_obj.ceph_qa_suite_git_url is None
+        assert conf_obj.openstack['ip'] == '1.2.3.4'
+
 
 class TestJobConfig(TestYamlConfig):
     def setup_method(self):
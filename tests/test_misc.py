@@ -1,11 +1,16 @@
 import argparse
+import gevent
+import io
+import os
 import pytest
 import subprocess
+import tarfile
 
 from unittest.mock import Mock, patch
 
 from teuthology import misc
 from teuthology.config import config
+from teuthology.exceptions import MaxWhileTries
 from teuthology.orchestra import cluster
 from teuthology.orchestra.remote import Remote
 
@@ -249,6 +254,148 @@ def test_update_key():
     misc.update_key("sha", a, b)
     assert a == { "sha": "blah", "workunit": { "sha": "bar" }, "tasks": [{"task1": "ceph"}], "overrides": [{"sha": "foo"}] } 
 
+@patch('time.sleep')
+def test_reconnect(m_sleep):
+    flaky = Mock()
+    flaky.name = 'ubuntu@flaky'
+    flaky.reconnect.side_effect = [False, False, True]
+    steady = Mock()
+    steady.name = 'ubuntu@steady'
+    steady.reconnect.return_value = True
+    remotes = [flaky, steady]
+    misc.reconnect(None, timeout=60, remotes=remotes)
+    assert flaky.reconnect.call_count == 3
+    assert steady.reconnect.call_count == 1
+    # each remote backs off on its own
+    assert [c[0][0] for c in m_sleep.call_args_list] == [1, 2]
+    # the caller's list is left alone
+    assert remotes == [flaky, steady]
+
+
+@patch('teuthology.misc.time')
+def test_reconnect_timeout(m_time):
+    m_time.time.side_effect = [0, 61, 61]
+    dead = Mock()
+    dead.name = 'ubuntu@dead'
+    dead.reconnect.return_value = False
+    with pytest.raises(RuntimeError):
+        misc.reconnect(None, timeout=60, remotes=[dead])
+
+
+def make_tar_stream(files):
+    buf = io.BytesIO()
+    with tarfile.open(mode='w', fileobj=buf) as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    buf.seek(0)
+    return buf
+
+
+def test_pull_directory(tmp_path):
+    files = {'./ceph.log': b'x' * 4096, './sub/osd.0.log.gz': b'compressed'}
+    remote = Mock(shortname='node')
+    remote.get_tar_stream.return_value.stdout = make_tar_stream(files)
+    size = misc.pull_directory(remote, '/var/log/ceph',
+                               str(tmp_path / 'logs'))
+    assert size == 4096 + len(b'compressed')
+    remote.get_tar_stream.assert_called_once_with(
+        '/var/log/ceph', sudo=True, compress=False)
+    assert (tmp_path / 'logs' / 'ceph.log').read_bytes() == b'x' * 4096
+    assert (tmp_path / 'logs' / 'sub' / 'osd.0.log.gz').read_bytes() == \
+        b'compressed'
+
+
+def test_gzip_remote_files():
+    remote = Mock(shortname='node')
+    remote.run.return_value.returncode = 0
+    misc.gzip_remote_files(remote, '/home/ubuntu/cephtest/archive',
+                           min_size=1024, level=1)
+    args = remote.run.call_args[1]['args']
+    assert args[:11] == [
+        'sudo', 'find', '/home/ubuntu/cephtest/archive', '-type', 'f',
+        '!', '-name', '*.gz', '-size', '+1023c', '-print0',
+    ]
+    assert args[-3:] == ['gzip', '-1', '--']
+
+
+@patch('teuthology.contextutil.time.sleep')
+@patch('teuthology.misc.gevent.subprocess.Popen')
+def test_ssh_keyscan(m_popen, m_sleep):
+    node1, node2 = [misc.canonicalize_hostname(name, user=None)
+                    for name in ('node1', 'node2')]
+    m_popen.return_value.communicate.side_effect = [
+        (('%s ssh-rsa key1\n%s ecdsa-sha2-nistp256 key2\n' %
+          (node1, node1)).encode(),
+         ('# %s:22 SSH-2.0-OpenSSH_8.0\n' % node1).encode()),
+        (('%s ssh-ed25519 key3\n' % node2).encode(), b''),
+    ]
+    got = misc.ssh_keyscan(['node1', 'node2'])
+    assert got == {
+        node1: 'ecdsa-sha2-nistp256 key2',
+        node2: 'ssh-ed25519 key3',
+    }
+    assert [c[1]['args'] for c in m_popen.call_args_list] == [
+        ['ssh-keyscan', '-T', '1', node1, node2],
+        ['ssh-keyscan', '-T', '1', node2],
+    ]
+
+
+@patch('teuthology.contextutil.time.sleep')
+@patch('teuthology.misc.gevent.subprocess.Popen')
+def test_ssh_keyscan_missing(m_popen, m_sleep):
+    m_popen.return_value.communicate.return_value = (b'', b'')
+    assert misc.ssh_keyscan(['node1'], _raise=False) == {}
+    assert m_popen.call_count == 1
+    with pytest.raises(MaxWhileTries):
+        misc.ssh_keyscan(['node1'])
+
+
+def test_ssh_keyscan_yields(tmp_path, monkeypatch):
+    # A slow ssh-keyscan must not stop other greenlets from running
+    fake = tmp_path / 'ssh-keyscan'
+    fake.write_text(
+        '#!/bin/sh\necho "$3 ssh-rsa key"\nexec >&- 2>&-\nsleep 0.5\n')
+    fake.chmod(0o755)
+    monkeypatch.setenv('PATH', '%s:%s' % (tmp_path, os.environ['PATH']))
+    ticks = list()
+
+    def tick():
+        while True:
+            ticks.append(1)
+            gevent.sleep(0.05)
+
+    ticker = gevent.spawn(tick)
+    try:
+        assert misc._ssh_keyscan_many(['node1']) == {'node1': 'ssh-rsa key'}
+    finally:
+        ticker.kill()
+    assert len(ticks) > 3
+
+
+@pytest.mark.parametrize('codec, level, command', [
+    (None, None, 'gzip -5 --verbose --'),
+    ('zstd', 3, 'zstd --rm -q -3 --'),
+    ('xz', 0, 'xz -T1 -0 --verbose --'),
+])
+def test_compress_logs(codec, level, command):
+    ctx = argparse.Namespace(cluster=Mock())
+    ctx.cluster.run.return_value = []
+    misc.compress_logs(ctx, '/var/log/ceph', codec=codec, level=level)
+    args = ctx.cluster.run.call_args[1]['args']
+    assert args.startswith('sudo find /var/log/ceph -name *.log -print0 | ')
+    assert args.endswith(' -- ' + command)
+
+
+@pytest.mark.parametrize('codec, level', [('lz4', 1), ('gzip', 10)])
+def test_compress_logs_invalid(codec, level):
+    ctx = argparse.Namespace(cluster=Mock())
+    with pytest.raises(ValueError):
+        misc.compress_logs(ctx, '/var/log/ceph', codec=codec, level=level)
+    assert not ctx.cluster.run.called
+
+
 class TestHostnames(object):
     def setup_method(self):
         config._conf = dict()
@@ -278,7 +278,7 @@ class TestPackaging(object):
     def test_get_koji_task_result_package_name(self, input, expected):
         assert packaging._get_koji_task_result_package_name(input) == expected
 
-    @patch("requests.get")
+    @patch("teuthology.util.http.get")
     def test_get_response_success(self, m_get):
         resp = Mock()
         resp.ok = True
@@ -286,7 +286,7 @@ class TestPackaging(object):
         result = packaging._get_response("google.com")
         assert result == resp
 
-    @patch("requests.get")
+    @patch("teuthology.util.http.get")
     def test_get_response_failed_wait(self, m_get):
         resp = Mock()
         resp.ok = False
@@ -294,7 +294,7 @@ class TestPackaging(object):
         packaging._get_response("google.com", wait=True, sleep=1, tries=2)
         assert m_get.call_count == 2
 
-    @patch("requests.get")
+    @patch("teuthology.util.http.get")
     def test_get_response_failed_no_wait(self, m_get):
         resp = Mock()
         resp.ok = False
@@ -544,7 +544,7 @@ class TestShamanProject(TestBuilderProject):
             patch('teuthology.packaging._get_config_value_for_remote')
         self.m_get_config_value = self.p_get_config_value.start()
         self.m_get_config_value.return_value = None
-        self.p_get = patch('requests.get')
+        self.p_get = patch('teuthology.util.http.get')
         self.m_get = self.p_get.start()
 
     def teardown_method(self):
@@ -833,7 +833,7 @@ class TestPulpProject(TestBuilderProject):
             patch('teuthology.packaging._get_config_value_for_remote')
         self.m_get_config_value = self.p_get_config_value.start()
         self.m_get_config_value.return_value = None
-        self.p_get = patch('requests.get')
+        self.p_get = patch('teuthology.util.http.get')
         self.m_get = self.p_get.start()
 
         resp = Mock()
@@ -1,4 +1,8 @@
-from teuthology.parallel import parallel
+import gevent
+
+from pytest import raises
+
+from teuthology.parallel import parallel, parallel_map
 
 
 def identity(item, input_set=None, remove=False):
@@ -26,3 +30,77 @@ class TestParallel(object):
             for result in para:
                 in_set.remove(result)
 
+
+    def test_max_concurrency(self):
+        running = []
+        peak = []
+
+        def track(item):
+            running.append(item)
+            peak.append(len(running))
+            gevent.sleep(0.01)
+            running.remove(item)
+            return item
+        with parallel(max_concurrency=3) as para:
+            for i in range(10):
+                para.spawn(track, i)
+            assert sorted(para) == list(range(10))
+        assert max(peak) == 3
+
+    def test_max_concurrency_exception(self):
+        def fail(item):
+            raise RuntimeError(item)
+        with raises(RuntimeError):
+            with parallel(max_concurrency=2) as para:
+                for i in range(4):
+                    para.spawn(fail, i)
+
+    def test_timings(self):
+        def nap(name, seconds):
+            gevent.sleep(seconds)
+        with parallel() as para:
+            para.spawn(nap, 'slow', 0.05)
+            para.spawn(nap, 'fast', 0)
+        names = [name for name, _ in para.timings]
+        assert names == ["nap('fast')", "nap('slow')"]
+        assert para.timings[1][1] >= 0.05
+
+
+class TestParallelMap(object):
+    def test_ordered(self):
+        def delayed(item):
+            gevent.sleep(0.01 * (5 - item))
+            return item
+        assert parallel_map(delayed, range(5)) == list(range(5))
+
+    def test_args(self):
+        in_set = set(range(3))
+        got = parallel_map(identity, range(3), in_set, remove=True)
+        assert got == [0, 1, 2]
+        assert in_set == set()
+
+    def test_concurrency(self):
+        running = []
+        peak = []
+
+        def track(item):
+            running.append(item)
+            peak.append(len(running))
+            gevent.sleep(0.01)
+            running.remove(item)
+            return item
+        assert parallel_map(track, range(6), concurrency=2) == list(range(6))
+        assert max(peak) == 2
+
+    def test_exceptions(self):
+        def fail_odd(item):
+            if item % 2:
+                raise RuntimeError(item)
+            return item
+        with raises(RuntimeError) as exc:
+            parallel_map(fail_odd, range(4))
+        assert exc.value.args == (1,)
+        got = parallel_map(fail_odd, range(4), return_exceptions=True)
+        assert got[0] == 0 and got[2] == 2
+        assert isinstance(got[1], RuntimeError)
+        assert isinstance(got[3], RuntimeError)
@@ -0,0 +1,55 @@
+from unittest.mock import Mock, patch
+
+import pytest
+
+from teuthology.config import config
+from teuthology.util import http
+
+
+class TestHTTP(object):
+    def setup_method(self):
+        http._sessions.clear()
+
+    def teardown_method(self):
+        http._sessions.clear()
+
+    def test_session_per_server(self):
+        first = http.get_session('https://paddles.example.com/nodes/')
+        assert http.get_session('https://paddles.example.com/runs/x/') is first
+        assert http.get_session('https://shaman.example.com/api/') \
+            is not first
+        assert http.get_session('http://paddles.example.com/nodes/') \
+            is not first
+        adapter = first.get_adapter('https://paddles.example.com/')
+        assert adapter.max_retries.connect == http.CONNECT_RETRIES
+        assert adapter.max_retries.status == 0
+
+    @patch('requests.Session.request')
+    def test_request(self, m_request):
+        hook = Mock()
+        http.add_hook(hook)
+        try:
+            resp = http.put('http://paddles.example.com/nodes/x/', '{}')
+        finally:
+            http.remove_hook(hook)
+        assert resp is m_request.return_value
+        m_request.assert_called_once_with(
+            'PUT', 'http://paddles.example.com/nodes/x/', data='{}',
+            timeout=config.http_timeout)
+        hook.assert_called_once()
+        method, url, status_code, elapsed = hook.call_args[0]
+        assert (method, url) == ('PUT', 'http://paddles.example.com/nodes/x/')
+        assert status_code is m_request.return_value.status_code
+
+    @patch('requests.Session.request')
+    def test_request_error(self, m_request):
+        m_request.side_effect = http.requests.ConnectionError
+        hook = Mock()
+        http.add_hook(hook)
+        try:
+            with pytest.raises(http.requests.ConnectionError):
+                http.get('http://paddles.example.com/nodes/', timeout=5)
+        finally:
+            http.remove_hook(hook)
+        assert m_request.call_args[1]['timeout'] == 5
+        assert hook.call_args[0][2] is None
@@ -0,0 +1,48 @@
+from mock import Mock, patch
+from pytest import raises
+
+from teuthology.util.ttlcache import TTLCache
+
+
+class TestTTLCache(object):
+    def setup_method(self):
+        self.cache = TTLCache()
+
+    def test_get(self):
+        func = Mock(return_value='value')
+        assert self.cache.get('key', func, 10, 'arg', kwarg=1) == 'value'
+        assert self.cache.get('key', func, 10, 'arg', kwarg=1) == 'value'
+        func.assert_called_once_with('arg', kwarg=1)
+
+    def test_keys(self):
+        func = Mock(side_effect=['one', 'two'])
+        assert self.cache.get('key1', func, 10) == 'one'
+        assert self.cache.get('key2', func, 10) == 'two'
+        assert self.cache.get('key1', func, 10) == 'one'
+
+    def test_expiry(self):
+        func = Mock(side_effect=['old', 'new'])
+        with patch('teuthology.util.ttlcache.time.monotonic') as m_monotonic:
+            m_monotonic.return_value = 100
+            assert self.cache.get('key', func, 10) == 'old'
+            m_monotonic.return_value = 109
+            assert self.cache.get('key', func, 10) == 'old'
+            m_monotonic.return_value = 111
+            assert self.cache.get('key', func, 10) == 'new'
+
+    def test_disabled(self):
+        func = Mock(side_effect=['one', 'two'])
+        assert self.cache.get('key', func, 0) == 'one'
+        assert self.cache.get('key', func, 0) == 'two'
+
+    def test_exception_not_cached(self):
+        func = Mock(side_effect=[RuntimeError(), 'value'])
+        with raises(RuntimeError):
+            self.cache.get('key', func, 10)
+        assert self.cache.get('key', func, 10) == 'value'
+
+    def test_clear(self):
+        func = Mock(side_effect=['one', 'two'])
+        self.cache.get('key', func, 10)
+        self.cache.clear()
+        assert self.cache.get('key', func, 10) == 'two'
@@ -1,3 +1,4 @@
+import copy
 import os
 import yaml
 import logging
@@ -30,6 +31,10 @@ class YamlConfig(MutableMapping):
     variable or create a subclass.
     """
     _defaults = dict()
+    # The parsed contents of yaml_path and the stat signature of the file at
+    # the time it was parsed; see reload()
+    _file_conf = None
+    _file_stat = None
 
     def __init__(self, yaml_path=None):
         self.yaml_path = yaml_path
@@ -46,12 +51,53 @@ class YamlConfig(MutableMapping):
             elif conf:
                 self._conf = yaml.safe_load(conf)
                 return
-        if os.path.exists(self.yaml_path):
+        self._file_stat = self._stat_yaml_path()
+        if self._file_stat is not None:
             with open(self.yaml_path) as f:
                 self._conf = yaml.safe_load(f)
         else:
             log.debug("%s not found", self.yaml_path)
             self._conf = dict()
+        self._file_conf = copy.deepcopy(self._conf)
+
+    def _stat_yaml_path(self):
+        """
+        :returns: A tuple identifying the current version of yaml_path, or None
+                  if it does not exist
+        """
+        if not self.yaml_path:
+            return None
+        try:
+            st = os.stat(self.yaml_path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def config_changed(self):
+        """
+        Cheaply check whether yaml_path has been modified, replaced, created
+        or removed since it was last loaded. Only a stat() is performed.
+
+        :returns: True if the file has changed
+        """
+        if self._file_conf is None:
+            return True
+        return self._stat_yaml_path() != self._file_stat
+
+    def reload(self):
+        """
+        Reset the configuration to the contents of yaml_path, discarding any
+        in-memory modifications. The file is only re-parsed if
+        config_changed() says it was modified; otherwise the previously parsed
+        contents are reused.
+
+        :returns: True if the file was re-parsed
+        """
+        if self.config_changed():
+            self.load()
+            return True
+        self._conf = copy.deepcopy(self._file_conf)
+        return False
 
     def update(self, in_dict):
         """
@@ -116,7 +162,7 @@ class YamlConfig(MutableMapping):
         return self._conf.__contains__(name)
 
     def __setattr__(self, name, value):
-        if name.endswith('_conf') or name in ('yaml_path'):
+        if name.endswith('_conf') or name in ('yaml_path', '_file_stat'):
             object.__setattr__(self, name, value)
         else:
             self._conf[name] = value
@@ -151,12 +197,15 @@ class TeuthologyConfig(YamlConfig):
         'archive_upload_url': None,
         'automated_scheduling': False,
         'reserve_machines': 5,
+        'partial_lock_timeout': None,
         'ceph_git_base_url': 'https://github.com/ceph/',
         'ceph_git_url': None,
         'ceph_qa_suite_git_url': None,
         'ceph_cm_ansible_git_url': None,
         'teuthology_git_url': None,
         'use_conserver': False,
+        'use_supervisor_pool': False,
+        'supervisor_pool_idle_timeout': 3600,
         'conserver_master': 'conserver.front.sepia.ceph.com',
         'conserver_port': 3109,
         'gitbuilder_host': 'gitbuilder.ceph.com',
@@ -168,6 +217,11 @@ class TeuthologyConfig(YamlConfig):
         'job_threshold': 500,
         'lab_domain': 'front.sepia.ceph.com',
         'lock_server': 'https://paddles.front.sepia.ceph.com/',
+        'lock_cache_path': os.path.expanduser(
+            '~/.cache/teuthology/nodes.json'),
+        'lock_cache_max_age': 10,
+        'log_compression': 'gzip',
+        'log_compression_level': 5,
         'max_job_age': 1209600,  # 2 weeks
         'max_job_time': 259200,  # 3 days
         'nsupdate_url': 'https://nsupdate.front.sepia.ceph.com/update',
@@ -176,9 +230,13 @@ class TeuthologyConfig(YamlConfig):
         'results_sending_email': 'teuthology',
         'results_timeout': 43200,
         'src_base_path': os.path.expanduser('~/src'),
+        'systemd_status_max_age': 2,
         'verify_host_keys': True,
         'watchdog_interval': 120,
         'fog_reimage_timeout': 1800,
+        'image_cache_ttl': 300,
+        'http_timeout': 300,
+        'reimage_concurrency': 10,
         'fog_wait_for_ssh_timeout': 600,
         'kojihub_url': 'https://koji.fedoraproject.org/kojihub',
         'kojiroot_url': 'https://kojipkgs.fedoraproject.org/packages',
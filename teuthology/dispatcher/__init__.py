@@ -26,7 +26,7 @@ from teuthology import (
     repo_utils,
 )
 from teuthology.config import config as teuth_config
-from teuthology.dispatcher import supervisor
+from teuthology.dispatcher import pool, supervisor, watchdog
 from teuthology.exceptions import BranchNotFoundError, CommitNotFoundError, SkipJob, MaxWhileTries
 from teuthology.lock import ops as lock_ops
 from teuthology.util.time import parse_timestamp
@@ -40,7 +40,10 @@ def stop(_sig, _frame) -> None:
 
 
 def load_config(archive_dir=None):
-    teuth_config.load()
+    # Only re-parse the config file if it was modified; otherwise this just
+    # discards any in-memory changes made while preparing the previous job
+    if teuth_config.reload():
+        log.info("Loaded configuration from %s", teuth_config.yaml_path)
     if archive_dir is not None:
         if not os.path.isdir(archive_dir):
             sys.exit("{prog}: archive directory must exist: {path}".format(
@@ -79,7 +82,10 @@ def main(args):
     beanstalk.watch_tube(connection, args.tube)
 
     keep_running = True
-    job_procs = set()
+    job_procs = watchdog.JobWatcher()
+    if teuth_config.results_server:
+        job_procs.start()
+    supervisor_pools = dict()
     worst_returncode = 0
     loop_exit_count = 0
     max_loop_exits = 10  # Prevent infinite restart loops
@@ -87,11 +93,9 @@ def main(args):
     while keep_running:
         try:
             load_config()
-            for proc in list(job_procs):
-                rc = proc.poll()
-                if rc is not None:
-                    worst_returncode = max([worst_returncode, rc])
-                    job_procs.remove(proc)
+            for proc, rc in job_procs.reap():
+                worst_returncode = max([worst_returncode, rc])
+            prune_pools(supervisor_pools)
             job = connection.reserve(timeout=60)
             if job is None:
                 if args.exit_on_empty_queue and not job_procs:
@@ -177,16 +181,28 @@ def main(args):
             run_args.extend(["--job-config", job_config_path])
 
             try:
-                # Use start_new_session=True to ensure child processes are isolated
-                # from the dispatcher's process group. This prevents accidental
-                # termination if the dispatcher crashes or receives signals.
-                job_proc = subprocess.Popen(
-                    run_args,
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL,
-                    start_new_session=True,  # Isolate child process from parent
-                )
-                job_procs.add(job_proc)
+                job_proc = None
+                if teuth_config.use_supervisor_pool:
+                    job_proc = submit_to_pool(
+                        supervisor_pools,
+                        job_config_path,
+                        teuth_bin_path,
+                        archive_dir,
+                        job_config.get('teuthology_sha1'),
+                        args.verbose,
+                        log_path=log_file_path,
+                    )
+                if job_proc is None:
+                    # Use start_new_session=True to ensure child processes are isolated
+                    # from the dispatcher's process group. This prevents accidental
+                    # termination if the dispatcher crashes or receives signals.
+                    job_proc = subprocess.Popen(
+                        run_args,
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL,
+                        start_new_session=True,  # Isolate child process from parent
+                    )
+                job_procs.add(job_proc, job_config)
                 log.info('Job supervisor PID: %s', job_proc.pid)
             except Exception:
                 error_message = "Saw error while trying to spawn supervisor."
@@ -251,9 +267,78 @@ def main(args):
             # Child processes should be isolated via start_new_session=True
             continue
 
+    job_procs.stop()
     return worst_returncode
 
 
+def submit_to_pool(pools, job_config_path, teuth_bin_path, archive_dir,
+                   sha1=None, verbose=False, log_path=None):
+    """
+    Hand a job to the supervisor pool for its teuthology checkout and sha1,
+    starting the pool if needed. Each sha1 gets its own pool, since a pool
+    keeps running the code it imported at startup; prune_pools() stops the
+    ones that are no longer being used.
+
+    :param pools:    dict, mapping (teuth_bin_path, sha1) tuples to
+                     SupervisorPools. The pool is None if one could not be
+                     started for that sha1.
+    :param log_path: Where the pool process' stderr goes
+    :returns:        A PooledSupervisor, or None if the caller should start
+                     the supervisor itself
+    """
+    key = (teuth_bin_path, sha1)
+    current = pools.get(key)
+    if current is None and key in pools:
+        # Don't keep retrying a checkout whose supervisor doesn't support
+        # --pool
+        return None
+    if current is not None and not current.alive:
+        log.info("Replacing supervisor pool for %s at %s", teuth_bin_path, sha1)
+        current.close()
+        current = None
+    try:
+        if current is None:
+            current = pool.SupervisorPool(
+                teuth_bin_path, archive_dir, sha1=sha1, verbose=verbose,
+                log_path=log_path,
+            )
+            pools[key] = current
+        return current.submit(job_config_path)
+    except Exception:
+        log.exception(
+            "Could not use a supervisor pool for %s; starting the supervisor "
+            "directly", teuth_bin_path,
+        )
+        if current:
+            current.close()
+        pools[key] = None
+        return None
+
+
+def prune_pools(pools, idle_timeout=None):
+    """
+    Stop the supervisor pools which have had no running supervisors and no
+    new jobs for idle_timeout seconds, and forget about those which have
+    exited.
+
+    :param pools:        dict, as passed to submit_to_pool()
+    :param idle_timeout: Defaults to the supervisor_pool_idle_timeout config
+                         option
+    """
+    if idle_timeout is None:
+        idle_timeout = teuth_config.supervisor_pool_idle_timeout
+    for key, the_pool in list(pools.items()):
+        if the_pool is None:
+            continue
+        the_pool.reap()
+        if the_pool.closed:
+            if the_pool.proc.poll() is not None:
+                del pools[key]
+        elif not the_pool.alive or the_pool.idle_time() >= idle_timeout:
+            log.info("Stopping supervisor pool for %s at %s", *key)
+            the_pool.close()
+
+
 def find_dispatcher_processes() -> Dict[str, List[psutil.Process]]:
     def match(proc):
         try:
@@ -314,6 +399,7 @@ def prep_job(job_config):
             raise SkipJob()
         if teuth_config.teuthology_path is None:
             log.info('Using teuthology sha1 %s', teuthology_sha1)
+        job_config['teuthology_sha1'] = teuthology_sha1
 
     try:
         if teuth_config.teuthology_path is not None:
@@ -0,0 +1,336 @@
+"""
+Pre-forked teuthology-supervisor processes.
+
+Starting a supervisor means a cold interpreter start, which re-imports
+gevent, paramiko, requests, prometheus_client and the rest of teuthology for
+every job. When 'use_supervisor_pool' is set, the dispatcher instead starts
+one long-lived 'teuthology-supervisor --pool' process per teuthology checkout
+and sha1. That process imports everything once, then reads job config paths
+from its stdin and forks a supervisor for each one.
+
+Each forked supervisor calls setsid(), exactly like the supervisors the
+dispatcher starts with start_new_session=True. Its stdin and stdout are
+pointed at /dev/null, and its stderr is appended to the job's supervisor log,
+so that a supervisor which dies before it sets up logging still leaves a
+trace. The pool process reports the PID of each supervisor it forks, and
+later its exit code, on its stdout; the protocol is one message per line:
+
+    ready
+    started <pid>
+    exited <pid> <returncode>
+"""
+import argparse
+import logging
+import os
+import select
+import signal
+import subprocess
+import sys
+import time
+
+import yaml
+
+from teuthology.dispatcher.watchdog import pid_exists, pidfd_open
+
+log = logging.getLogger(__name__)
+
+# How long to wait for a pool process to start up, or to acknowledge a job
+STARTUP_TIMEOUT = 120
+# The exit code given to supervisors whose real one was lost along with their
+# pool process. It's non-zero so that they aren't counted as successes.
+LOST_RETURNCODE = 255
+
+
+class PoolError(Exception):
+    pass
+
+
+class PooledSupervisor(object):
+    """
+    A handle for a supervisor forked by a SupervisorPool. It provides the
+    subset of the subprocess.Popen interface that the dispatcher uses.
+    """
+    def __init__(self, pool, pid):
+        self.pool = pool
+        self.pid = pid
+        self.returncode = None
+
+    def poll(self):
+        if self.returncode is None:
+            self.pool.reap()
+        return self.returncode
+
+    def __repr__(self):
+        return '{cls}(pid={pid})'.format(
+            cls=self.__class__.__name__, pid=self.pid)
+
+
+class SupervisorPool(object):
+    """
+    The dispatcher's side of a 'teuthology-supervisor --pool' process.
+
+    The pool process' stderr is appended to log_path, if given, so that a
+    crash leaves a trace.
+    """
+    def __init__(self, teuth_bin_path, archive_dir, sha1=None, verbose=False,
+                 log_path=None):
+        self.teuth_bin_path = teuth_bin_path
+        self.sha1 = sha1
+        self.children = dict()
+        self.closed = False
+        self.last_used = time.monotonic()
+        self._buf = b''
+        self._eof = False
+        args = [
+            os.path.join(teuth_bin_path, 'teuthology-supervisor'),
+            '--pool',
+            '--bin-path', teuth_bin_path,
+            '--archive-dir', archive_dir,
+        ]
+        if verbose:
+            args.append('-v')
+        stderr = open(log_path, 'ab') if log_path else subprocess.DEVNULL
+        try:
+            self.proc = subprocess.Popen(
+                args,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=stderr,
+                start_new_session=True,
+            )
+        finally:
+            if log_path:
+                stderr.close()
+        log.info('Supervisor pool PID: %s', self.proc.pid)
+        try:
+            self._expect('ready')
+        except PoolError:
+            self.proc.kill()
+            self.proc.wait()
+            raise
+
+    @property
+    def alive(self):
+        return not self._eof and self.proc.poll() is None
+
+    def submit(self, job_config_path):
+        """
+        Ask the pool process to fork a supervisor for a job
+
+        :param job_config_path: The path to the job's config file
+        :returns:               A PooledSupervisor
+        """
+        if not self.alive:
+            raise PoolError('Supervisor pool is not running')
+        try:
+            self.proc.stdin.write(job_config_path.encode() + b'\n')
+            self.proc.stdin.flush()
+        except OSError as exc:
+            raise PoolError(
+                'Could not submit job to supervisor pool: %s' % exc)
+        pid = int(self._expect('started')[0])
+        child = PooledSupervisor(self, pid)
+        self.children[pid] = child
+        self.last_used = time.monotonic()
+        return child
+
+    def idle_time(self):
+        """
+        :returns: How long, in seconds, since the pool was last handed a job,
+                  or 0 if any of its supervisors are still running
+        """
+        if self.children:
+            return 0
+        return time.monotonic() - self.last_used
+
+    def reap(self):
+        """
+        Collect the exit codes the pool process has reported so far, without
+        blocking.
+        """
+        for msg in self._read_messages(timeout=0):
+            self._handle(msg)
+        if self._eof:
+            self._orphan_children()
+
+    def close(self):
+        """
+        Stop handing jobs to the pool process. It exits once the supervisors
+        it forked have finished; their exit codes are still collected by
+        reap().
+        """
+        self.closed = True
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+
+    def _expect(self, kind):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            remaining = deadline - time.monotonic()
+            if self._eof or remaining <= 0:
+                break
+            for msg in self._read_messages(timeout=remaining):
+                if msg[0] == kind:
+                    return msg[1:]
+                self._handle(msg)
+        raise PoolError(
+            "Supervisor pool (PID %s) did not report '%s'" %
+            (self.proc.pid, kind))
+
+    def _handle(self, msg):
+        if msg[0] != 'exited':
+            log.warning('Unexpected message from supervisor pool: %s', msg)
+            return
+        child = self.children.pop(int(msg[1]), None)
+        if child is not None:
+            child.returncode = int(msg[2])
+
+    def _orphan_children(self):
+        # The pool process went away without reporting on some supervisors.
+        # They keep running in their own sessions; we only lose track of their
+        # exit codes.
+        for pid, child in list(self.children.items()):
+            if not pid_exists(pid):
+                log.warning(
+                    "Lost the exit code of supervisor PID %s along with its "
+                    "pool (PID %s); assuming it failed", pid, self.proc.pid)
+                child.returncode = LOST_RETURNCODE
+                del self.children[pid]
+
+    def _read_messages(self, timeout):
+        msgs = []
+        if self._eof:
+            return msgs
+        fd = self.proc.stdout.fileno()
+        readable, _, _ = select.select([fd], [], [], timeout)
+        if readable:
+            data = os.read(fd, 65536)
+            if not data:
+                self._eof = True
+                self.proc.wait()
+            self._buf += data
+        *lines, self._buf = self._buf.split(b'\n')
+        for line in lines:
+            if line.strip():
+                msgs.append(line.decode().split())
+        return msgs
+
+
+def serve(args):
+    """
+    The main loop of 'teuthology-supervisor --pool'. By the time this is
+    called, teuthology.dispatcher.supervisor and everything it imports have
+    already been loaded, so forked supervisors start with a warm interpreter.
+
+    :param args: The parsed command-line arguments
+    :returns:    The exit code
+    """
+    in_fd = sys.stdin.fileno()
+    out_fd = sys.stdout.fileno()
+    # pid -> pidfd, which becomes readable when the child exits. Where pidfds
+    # aren't supported this is None, and we fall back to polling.
+    children = dict()
+    buf = b''
+    eof = False
+
+    def send(*words):
+        try:
+            os.write(out_fd, ' '.join(str(w) for w in words).encode() + b'\n')
+        except OSError:
+            # The dispatcher went away; our supervisors carry on regardless
+            pass
+
+    send('ready')
+    while not eof or children:
+        fds = [fd for fd in children.values() if fd is not None]
+        if not eof:
+            fds.append(in_fd)
+        timeout = 1 if None in children.values() else None
+        readable, _, _ = select.select(fds, [], [], timeout)
+        if in_fd in readable:
+            data = os.read(in_fd, 65536)
+            eof = not data
+            buf += data
+            *lines, buf = buf.split(b'\n')
+            for line in lines:
+                if not line.strip():
+                    continue
+                pidfds = [fd for fd in children.values() if fd is not None]
+                pid = _fork_supervisor(args, line.decode().strip(), pidfds)
+                children[pid] = pidfd_open(pid)
+                send('started', pid)
+        while children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            pidfd = children.pop(pid, None)
+            if pidfd is not None:
+                os.close(pidfd)
+            send('exited', pid, os.waitstatus_to_exitcode(status))
+    return 0
+
+
+def _job_log_path(job_config_path):
+    """
+    :returns: The path of the log the supervisor for a job writes to, or None
+              if the job's config can't be read
+    """
+    try:
+        with open(job_config_path) as f:
+            job_config = yaml.safe_load(f)
+        return os.path.join(job_config['archive_path'],
+                            f"supervisor.{job_config['job_id']}.log")
+    except Exception:
+        return None
+
+
+def _fork_supervisor(args, job_config_path, pidfds=()):
+    pid = os.fork()
+    if pid:
+        return pid
+    # In the child; from here on, mimic a freshly started teuthology-supervisor
+    returncode = 1
+    try:
+        for fd in pidfds:
+            os.close(fd)
+        os.setsid()
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1):
+            os.dup2(devnull, fd)
+        os.close(devnull)
+        # Without a job log, stderr stays the pool's, i.e. the dispatcher log
+        log_path = _job_log_path(job_config_path)
+        if log_path:
+            try:
+                stderr = os.open(
+                    log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            except OSError:
+                pass
+            else:
+                os.dup2(stderr, 2)
+                os.close(stderr)
+        # supervisor.main() logs to the same file; don't log everything twice
+        root_logger = logging.getLogger()
+        for handler in list(root_logger.handlers):
+            if getattr(handler, 'stream', None) is sys.stderr:
+                root_logger.removeHandler(handler)
+        from teuthology.config import config as teuth_config
+        from teuthology.dispatcher import supervisor
+        teuth_config.reload()
+        returncode = supervisor.main(argparse.Namespace(
+            verbose=args.verbose,
+            archive_dir=args.archive_dir,
+            bin_path=args.bin_path,
+            job_config=job_config_path,
+        )) or 0
+    except SystemExit as exc:
+        returncode = exc.code if isinstance(exc.code, int) else 1
+    except BaseException:
+        log.exception('Supervisor for %s failed', job_config_path)
+    finally:
+        logging.shutdown()
+        os._exit(returncode)
@@ -1,25 +1,28 @@
 import datetime
+import gevent
+import humanfriendly
 import logging
 import os
 import subprocess
 import time
 import yaml
-import requests
 
 from urllib.parse import urljoin
 
 from teuthology import exporter, dispatcher, kill, report, safepath
+from teuthology.dispatcher.watchdog import heartbeat_is_external, wait_for_exit
 from teuthology.config import config as teuth_config
 from teuthology.exceptions import SkipJob, MaxWhileTries
 from teuthology import setup_log_file, install_except_hook
 from teuthology.misc import get_user, archive_logs, compress_logs
+from teuthology.parallel import parallel, parallel_map
 from teuthology.config import FakeNamespace
 from teuthology.lock import ops as lock_ops
 from teuthology.task import internal
 from teuthology.task.ansible import FailureAnalyzer, FAILURE_LOG_NAME
 from teuthology.misc import decanonicalize_hostname as shortname
 from teuthology.lock import query
-from teuthology.util import sentry
+from teuthology.util import http, sentry
 
 log = logging.getLogger(__name__)
 
@@ -210,7 +213,7 @@ def check_for_reimage_failures_and_mark_down(targets, count=10):
             base_url,
             '/nodes/{0}/jobs/?count={1}'.format(machine, count)
         )
-        resp = requests.get(url)
+        resp = http.get(url)
         jobs = resp.json()
         if len(jobs) < count:
             continue
@@ -265,6 +268,7 @@ def check_for_ansible_failures_and_mark_down(job_config):
         log.exception("Failed to check %s for failures", failure_log)
         return marked_down
     targets = set(shortname(t) for t in job_config.get('targets', dict()))
+    to_mark = dict()
     for hostname, msg in sorted(failures.items()):
         machine_name = shortname(hostname)
         if machine_name not in targets:
@@ -274,15 +278,24 @@ def check_for_ansible_failures_and_mark_down(job_config):
             )
             continue
         log.error("Marking %s down: %s", machine_name, msg)
-        # Only the status is updated here. The job still holds the lock, and
-        # unlock_targets() refuses to unlock a node whose description no longer
-        # matches the job's archive path, so the reason is recorded later by
-        # describe_disabled_targets().
+        to_mark[machine_name] = msg
+
+    # Only the status is updated here. The job still holds the lock, and
+    # unlock_targets() refuses to unlock a node whose description no longer
+    # matches the job's archive path, so the reason is recorded later by
+    # describe_disabled_targets().
+    def mark_down(machine_name):
         try:
             lock_ops.update_lock(machine_name, status='down')
-            marked_down[machine_name] = msg
+            return True
         except Exception:
             log.exception("Failed to mark %s down", machine_name)
+            return False
+
+    names = list(to_mark)
+    for machine_name, ok in zip(names, parallel_map(mark_down, names)):
+        if ok:
+            marked_down[machine_name] = to_mark[machine_name]
     return marked_down
 
 
@@ -302,25 +315,30 @@ def describe_disabled_targets(failures):
         shortname(status['name']) for status in query.get_statuses(failures)
         if status['locked']
     )
-    for machine_name, msg in sorted(failures.items()):
-        if machine_name in still_locked:
-            # unlock_on_failure was probably set. Leave the description alone
-            # so the node can still be unlocked later.
-            log.warning(
-                "Not updating the description for %s; it is still locked",
-                machine_name,
-            )
-            continue
+    def describe(machine_name):
         try:
             lock_ops.update_lock(
                 machine_name,
-                description='ansible failure: {0}'.format(msg),
+                description='ansible failure: {0}'.format(failures[machine_name]),
             )
         except Exception:
             log.exception(
                 "Failed to update the description for %s", machine_name
             )
 
+    to_describe = list()
+    for machine_name in sorted(failures):
+        if machine_name in still_locked:
+            # unlock_on_failure was probably set. Leave the description alone
+            # so the node can still be unlocked later.
+            log.warning(
+                "Not updating the description for %s; it is still locked",
+                machine_name,
+            )
+            continue
+        to_describe.append(machine_name)
+    parallel_map(describe, to_describe)
+
 
 def reimage(job_config):
     # Reimage the targets specified in job config
@@ -359,7 +377,7 @@ def unlock_targets(job_config):
     :param job_config:      dict, job config data
     """
     machine_statuses = query.get_statuses(job_config['targets'].keys())
-    locked = []
+    locked = dict()
     for status in machine_statuses:
         name = shortname(status['name'])
         description = status['description']
@@ -371,12 +389,17 @@ def unlock_targets(job_config):
                 name, description
             )
             continue
-        locked.append(name)
+        locked[name] = status
     if not locked:
         return
     if job_config.get("unlock_on_failure", True):
         log.info('Unlocking machines...')
-        lock_ops.unlock_safe(locked, job_config["owner"], job_config["name"], job_config["job_id"])
+        # The statuses we just fetched are passed along, so that they aren't
+        # looked up again for each node
+        lock_ops.unlock_safe(
+            list(locked), job_config["owner"], job_config["name"],
+            job_config["job_id"], statuses=locked,
+        )
 
 
 def run_with_watchdog(process, job_config):
@@ -392,8 +415,9 @@ def run_with_watchdog(process, job_config):
         job_id=job_config['job_id'],
     )
 
-    # Sleep once outside of the loop to avoid double-posting jobs
-    time.sleep(teuth_config.watchdog_interval)
+    # Wait once outside of the loop to avoid double-posting jobs. We wake up
+    # as soon as the job exits rather than at the end of the interval.
+    wait_for_exit(process, teuth_config.watchdog_interval)
     hit_max_timeout = False
     max_seconds = teuth_config.max_job_time
     while process.poll() is None:
@@ -412,23 +436,28 @@ def run_with_watchdog(process, job_config):
                 log.exception('Failed to kill job')
 
             try:
+                # each node is unlocked as soon as its own logs are saved
                 transfer_archives(run_name, job_id,
-                                  teuth_config.archive_base, job_config)
+                                  teuth_config.archive_base, job_config,
+                                  owner=owner)
             except Exception:
                 log.exception('Could not save logs')
 
             try:
-                # this time remove everything and unlock the machines
+                # this time remove everything and unlock any remaining machines
                 kill.kill_job(run_name, job_id, owner)
             except Exception:
                 log.exception('Failed to kill job and unlock machines')
 
-        # calling this without a status just updates the jobs updated time
-        try:
-            report.try_push_job_info(job_info)
-        except MaxWhileTries:
-            log.exception("Failed to report job status; ignoring")
-        time.sleep(teuth_config.watchdog_interval)
+        # calling this without a status just updates the jobs updated time.
+        # The dispatcher does this for all of its jobs at once while it's
+        # running and keeping up.
+        if not heartbeat_is_external():
+            try:
+                report.try_push_job_info(job_info)
+            except MaxWhileTries:
+                log.exception("Failed to report job status; ignoring")
+        wait_for_exit(process, teuth_config.watchdog_interval)
 
     # we no longer support testing theses old branches
     assert(job_config.get('teuthology_branch') not in ('argonaut', 'bobtail',
@@ -464,7 +493,15 @@ def create_fake_context(job_config, block=False):
     return FakeNamespace(ctx_args)
 
 
-def transfer_archives(run_name, job_id, archive_base, job_config):
+def transfer_archives(run_name, job_id, archive_base, job_config, owner=None):
+    """
+    Compress and pull a job's logs from all of its nodes. Nodes are handled
+    concurrently, and each one independently of the others.
+
+    :param owner: If given, unlock each node as soon as its own logs have
+                  been pulled (or have failed to be), instead of leaving all of
+                  them locked until the slowest transfer is done.
+    """
     serializer = report.ResultsSerializer(archive_base)
     job_info = serializer.job_info(run_name, job_id, simple=True)
 
@@ -472,10 +509,48 @@ def transfer_archives(run_name, job_id, archive_base, job_config):
         ctx = create_fake_context(job_config)
         internal.add_remotes(ctx, job_config)
 
-        for log_type, log_path in job_info['archive'].items():
-            if log_type == 'init':
-                log_type = ''
-            compress_logs(ctx, log_path)
-            archive_logs(ctx, log_path, log_type)
+        with parallel() as p:
+            for remote in ctx.cluster.remotes.keys():
+                p.spawn(transfer_node_archives, ctx, remote,
+                        job_info['archive'], job_config, owner)
     else:
         log.info('No archives to transfer.')
+
+
+def transfer_node_archives(ctx, remote, archives, job_config, owner=None):
+    node_ctx = create_fake_context(job_config)
+    node_ctx.cluster = ctx.cluster.filter(lambda r: r is remote)
+    start = time.time()
+    compressing = dict()
+    try:
+        # Compress every log directory at once, and pull each of them as soon
+        # as it is compressed, while the rest are still being compressed
+        compressing = {
+            log_type: gevent.spawn(compress_logs, node_ctx, log_path)
+            for log_type, log_path in archives.items()
+        }
+        size = 0
+        for log_type, log_path in archives.items():
+            compressing[log_type].get()
+            size += archive_logs(
+                node_ctx, log_path, '' if log_type == 'init' else log_type)
+        elapsed = time.time() - start
+        log.info(
+            'Saved %s of logs from %s in %.1fs (%s/s)',
+            humanfriendly.format_size(size), remote.shortname, elapsed,
+            humanfriendly.format_size(size / max(elapsed, 0.001)),
+        )
+    except Exception:
+        log.exception('Could not save logs from %s', remote.shortname)
+    finally:
+        # Stop compressing whatever we aren't going to pull, before the node
+        # is unlocked
+        gevent.killall(list(compressing.values()))
+    if owner is not None:
+        try:
+            lock_ops.unlock_safe(
+                [remote.shortname], owner,
+                job_config['name'], job_config['job_id'],
+            )
+        except Exception:
+            log.exception('Failed to unlock %s', remote.shortname)
@@ -0,0 +1,261 @@
+"""
+Tracking of running job supervisors.
+
+Where the kernel supports it, exits are learned about through pidfds, which
+become readable as soon as a process terminates. This also works for
+processes that aren't our children, like supervisors forked by a
+SupervisorPool.
+
+The dispatcher also posts the paddles heartbeat for every job it started,
+from a single greenlet using a single HTTP session, rather than having each
+supervisor do it independently. After each round of heartbeats which all
+succeeded, it touches a file whose path it passes to the supervisors it
+starts. Supervisors post their own heartbeats again if the dispatcher goes
+away, or if that file hasn't been touched for watchdog_interval seconds,
+e.g. because the dispatcher's greenlets are held up behind something that
+blocks.
+"""
+import errno
+import logging
+import os
+import select
+import subprocess
+import tempfile
+import time
+
+import gevent
+import psutil
+
+from teuthology import report
+from teuthology.config import config as teuth_config
+from teuthology.exceptions import MaxWhileTries
+from teuthology.parallel import parallel_map
+from teuthology.util import http
+
+log = logging.getLogger(__name__)
+
+# The environment variable through which the dispatcher tells the
+# supervisors it starts that it is posting their jobs' heartbeats. The value
+# is the dispatcher's PID and its process' creation time, so that another
+# process reusing the PID isn't mistaken for it.
+HEARTBEAT_ENV = 'TEUTHOLOGY_HEARTBEAT_PROCESS'
+# The environment variable holding the path of the file the dispatcher
+# touches each time it has posted all of its jobs' heartbeats
+HEARTBEAT_FILE_ENV = 'TEUTHOLOGY_HEARTBEAT_FILE'
+
+
+def pid_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as exc:
+        return exc.errno == errno.EPERM
+    return True
+
+
+def pidfd_open(pid):
+    """
+    :returns: A pidfd for pid, or None if pidfds are not supported or the
+              process does not exist
+    """
+    try:
+        return os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        return None
+
+
+def wait_for_exit(process, timeout):
+    """
+    Wait until a process exits, or until timeout seconds pass, whichever
+    comes first.
+
+    :param process: A subprocess.Popen
+    :param timeout: How long to wait, in seconds
+    :returns:       process.poll()
+    """
+    pidfd = pidfd_open(process.pid)
+    if pidfd is None:
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            pass
+    else:
+        try:
+            select.select([pidfd], [], [], timeout)
+        finally:
+            os.close(pidfd)
+    return process.poll()
+
+
+def process_id(pid):
+    """
+    :returns: A string identifying the process with the given PID, or None
+              if there is no such process
+    """
+    try:
+        create_time = psutil.Process(pid).create_time()
+    except psutil.Error:
+        return None
+    return '{0}:{1:.2f}'.format(pid, create_time)
+
+
+def heartbeat_is_external(max_age=None):
+    """
+    :param max_age: How long ago, in seconds, the dispatcher may have last
+                    posted its jobs' heartbeats; defaults to watchdog_interval
+    :returns: True if the dispatcher that started this process is alive and
+              posting its jobs' heartbeats
+    """
+    value = os.environ.get(HEARTBEAT_ENV)
+    if not value:
+        return False
+    try:
+        pid = int(value.split(':')[0])
+    except ValueError:
+        return False
+    if not (pid_exists(pid) and process_id(pid) == value):
+        return False
+    if max_age is None:
+        max_age = teuth_config.watchdog_interval
+    try:
+        last_post = os.stat(os.environ[HEARTBEAT_FILE_ENV]).st_mtime
+    except (KeyError, OSError):
+        return False
+    return time.time() - last_post <= max_age
+
+
+class JobWatcher(object):
+    """
+    Tracks the supervisor processes started by a dispatcher.
+
+    Each process is registered along with its job config. reap() returns the
+    processes that have exited, checking only those whose pidfd has become
+    readable. heartbeat() updates paddles for all of the remaining jobs; it
+    first stops tracking the processes that have exited, keeping their exit
+    codes for the next reap().
+    """
+    def __init__(self):
+        self.jobs = dict()
+        self._pidfds = dict()
+        self._exited = list()
+        self._reporter = None
+        self._greenlet = None
+        self._heartbeat_path = None
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def add(self, proc, job_config):
+        """
+        Start tracking a supervisor
+
+        :param proc:       A subprocess.Popen or a PooledSupervisor
+        :param job_config: The job's config
+        """
+        self.jobs[proc] = dict(
+            name=job_config['name'],
+            job_id=job_config['job_id'],
+        )
+        pidfd = pidfd_open(proc.pid)
+        if pidfd is not None:
+            self._pidfds[pidfd] = proc
+
+    def reap(self):
+        """
+        Stop tracking any processes which have exited
+
+        :returns: A list of (proc, returncode) tuples
+        """
+        self._collect()
+        exited, self._exited = self._exited, list()
+        return exited
+
+    def _collect(self):
+        watched = set(self._pidfds.values())
+        candidates = [p for p in self.jobs if p not in watched]
+        if self._pidfds:
+            readable, _, _ = select.select(list(self._pidfds), [], [], 0)
+            candidates.extend(self._pidfds[fd] for fd in readable)
+        for proc in candidates:
+            rc = proc.poll()
+            if rc is None:
+                continue
+            self._exited.append((proc, rc))
+            self.remove(proc)
+
+    def remove(self, proc):
+        self.jobs.pop(proc, None)
+        for pidfd, fd_proc in list(self._pidfds.items()):
+            if fd_proc is proc:
+                del self._pidfds[pidfd]
+                os.close(pidfd)
+
+    def heartbeat(self):
+        """
+        Update the 'updated' time in paddles for every tracked job which is
+        still running. paddles has no bulk update, so the jobs are posted
+        concurrently over one HTTP session. If all of them succeed, the
+        heartbeat file is touched.
+        """
+        self._collect()
+        if self.jobs:
+            if self._reporter is None:
+                self._reporter = report.ResultsReporter()
+            if not self._reporter.base_uri:
+                return
+            log.debug("Posting heartbeats for %s jobs", len(self.jobs))
+            posted = parallel_map(
+                self._post_heartbeat,
+                list(self.jobs.values()),
+                concurrency=http.POOL_SIZE,
+            )
+            if not all(posted):
+                return
+        if self._heartbeat_path:
+            os.utime(self._heartbeat_path)
+
+    def _post_heartbeat(self, job_info):
+        try:
+            self._reporter.report_job(
+                job_info['name'], job_info['job_id'], job_info)
+        except (MaxWhileTries,) + report.report_exceptions:
+            log.exception(
+                "Failed to post heartbeat for job %s", job_info['job_id'])
+            return False
+        return True
+
+    def start(self, interval=None):
+        """
+        Post heartbeats every interval seconds from a greenlet. This stops
+        when the dispatcher exits. Supervisors started after this know not
+        to post their own heartbeats while this process is alive and its
+        heartbeats are up to date.
+
+        :param interval: Seconds between heartbeats; defaults to
+                         watchdog_interval
+        """
+        def loop():
+            while True:
+                gevent.sleep(interval or teuth_config.watchdog_interval)
+                try:
+                    self.heartbeat()
+                except Exception:
+                    log.exception("Failed to post heartbeats")
+        if self._greenlet is None:
+            fd, self._heartbeat_path = tempfile.mkstemp(
+                prefix='teuthology-heartbeat.')
+            os.close(fd)
+            self._greenlet = gevent.spawn(loop)
+            os.environ[HEARTBEAT_ENV] = process_id(os.getpid())
+            os.environ[HEARTBEAT_FILE_ENV] = self._heartbeat_path
+
+    def stop(self):
+        if self._greenlet is not None:
+            self._greenlet.kill()
+            self._greenlet = None
+            os.environ.pop(HEARTBEAT_ENV, None)
+            os.environ.pop(HEARTBEAT_FILE_ENV, None)
+            try:
+                os.remove(self._heartbeat_path)
+            except OSError:
+                pass
+            self._heartbeat_path = None
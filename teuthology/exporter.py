@@ -11,7 +11,7 @@ from pathlib import Path
 import teuthology.beanstalk as beanstalk
 import teuthology.dispatcher
 from teuthology.config import config
-from teuthology.lock.query import list_locks
+from teuthology.lock import cache
 
 log = logging.getLogger(__name__)
 
@@ -56,6 +56,10 @@ class TeuthologyExporter:
 
     def update(self):
         log.info("Updating...")
+        if config.config_changed():
+            config.reload()
+            log.info("Reloaded configuration from %s", config.yaml_path)
+            MACHINE_TYPES[:] = config.active_machine_types
         for metric in self.metrics:
             metric.update()
         log.info("Update finished.")
@@ -218,7 +222,9 @@ class Nodes(TeuthologyMetric):
 
     def _update(self):
         for machine_type in MACHINE_TYPES:
-            nodes = list_locks(machine_type=machine_type)
+            nodes = cache.list_locks(machine_type=machine_type)
+            if nodes is None:
+                continue
             for up, locked in itertools.product([True, False], [True, False]):
                 self.metric.labels(machine_type=machine_type, up=up, locked=locked).set(
                     len([n for n in nodes if n["up"] is up and n["locked"] is locked])
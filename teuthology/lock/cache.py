@@ -0,0 +1,135 @@
+"""
+A snapshot of every node's lock state, shared by all of the teuthology
+processes on this host.
+
+Dispatchers, supervisors and the exporter all poll the lock server for nearly
+the same node lists. Instead, the first process to need the list after the
+snapshot expires fetches it once and writes it to a file; everyone else reads
+the file until it expires again. Locking and unlocking still always go to the
+lock server; only polling reads the snapshot.
+"""
+import json
+import logging
+import os
+import time
+
+from typing import Dict, List, Union
+
+from teuthology.config import config
+from teuthology.lock import query
+from teuthology.util.flock import FileLock
+
+log = logging.getLogger(__name__)
+
+
+def _read_snapshot(path: str) -> Union[dict, None]:
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if snapshot.get('lock_server') != config.lock_server:
+        return None
+    return snapshot
+
+
+def _write_snapshot(path: str, nodes: List[Dict]) -> dict:
+    snapshot = dict(
+        lock_server=config.lock_server,
+        updated=time.time(),
+        nodes=nodes,
+    )
+    tmp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+    return snapshot
+
+
+def _is_fresh(snapshot: Union[dict, None], max_age: float) -> bool:
+    return snapshot is not None and \
+        time.time() - snapshot.get('updated', 0) <= max_age
+
+
+def _fetch_nodes(tries: int) -> Union[List[Dict], None]:
+    nodes = query.list_locks(tries=tries)
+    # query.list_locks() returns an empty dict if the lock server fails
+    return nodes if isinstance(nodes, list) else None
+
+
+def get_nodes(max_age: Union[float, None] = None,
+              tries: int = 10) -> Union[List[Dict], None]:
+    """
+    Get every node's lock state, from the snapshot if it is recent enough,
+    or from the lock server otherwise
+
+    :param max_age: The oldest snapshot, in seconds, to accept. Defaults to
+                    the lock_cache_max_age config option. If it is 0, the
+                    snapshot isn't used at all.
+    :param tries:   Passed to query.list_locks() when refreshing
+    :returns:       A list of node dicts, as returned by query.list_locks(),
+                    or None if the lock server couldn't be reached and there
+                    is no snapshot to fall back on
+    """
+    if max_age is None:
+        max_age = config.lock_cache_max_age
+    if not max_age:
+        return _fetch_nodes(tries)
+    path = os.path.expanduser(config.lock_cache_path)
+    snapshot = _read_snapshot(path)
+    if _is_fresh(snapshot, max_age):
+        return snapshot['nodes']
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock = FileLock(path + '.lock', blocking=False)
+    if not lock.acquire():
+        # Another process is refreshing the snapshot. Rather than wait for
+        # however long its lock server requests take, use the expired
+        # snapshot, or ask the lock server ourselves if there is none.
+        if snapshot:
+            return snapshot['nodes']
+        return _fetch_nodes(tries)
+    try:
+        # Another process may have refreshed it before we took the lock
+        snapshot = _read_snapshot(path) or snapshot
+        if _is_fresh(snapshot, max_age):
+            return snapshot['nodes']
+        nodes = _fetch_nodes(tries)
+        if nodes is None:
+            log.warning("Could not refresh the node snapshot in %s", path)
+            return snapshot['nodes'] if snapshot else None
+        _write_snapshot(path, nodes)
+    finally:
+        lock.release()
+    return nodes
+
+
+def list_locks(max_age: Union[float, None] = None, tries: int = 10,
+               **kwargs) -> Union[List[Dict], None]:
+    """
+    Like query.list_locks(), but filtering the snapshot from get_nodes()
+    instead of asking the lock server. Returns None if get_nodes() does.
+
+    :param max_age: Passed to get_nodes()
+    :param tries:   Passed to get_nodes()
+    :param kwargs:  Node fields to filter on. machine_type may list several
+                    types separated by ',' or '|', and count limits how many
+                    nodes are returned.
+    """
+    count = kwargs.pop('count', None)
+    machine_type = kwargs.pop('machine_type', None)
+    machine_types = None
+    if machine_type:
+        machine_types = machine_type.replace(',', '|').split('|')
+    all_nodes = get_nodes(max_age, tries)
+    if all_nodes is None:
+        return None
+    nodes = list()
+    for node in all_nodes:
+        if machine_types and node.get('machine_type') not in machine_types:
+            continue
+        if any(node.get(key) != value for key, value in kwargs.items()):
+            continue
+        nodes.append(node)
+        if count is not None and len(nodes) >= int(count):
+            break
+    return nodes
@@ -6,7 +6,7 @@ import time
 import yaml
 import requests
 
-from typing import List, Union
+from typing import Dict, List, Union
 
 import teuthology.orchestra.remote
 import teuthology.parallel
@@ -19,26 +19,30 @@ from teuthology.task import console_log
 from teuthology.misc import canonicalize_hostname
 from teuthology.job_status import set_status
 
-from teuthology.lock import util, query
+from teuthology.lock import cache, util, query
 from teuthology.orchestra import remote
+from teuthology.util import http
 
 log = logging.getLogger(__name__)
 
 
 def update_nodes(nodes, reset_os=False):
-    for node in nodes:
-        remote = teuthology.orchestra.remote.Remote(
-            canonicalize_hostname(node))
-        if reset_os:
-            log.info("Updating [%s]: reset os type and version on server", node)
-            inventory_info = dict()
-            inventory_info['os_type'] = ''
-            inventory_info['os_version'] = ''
-            inventory_info['name'] = remote.hostname
-        else:
-            log.info("Updating [%s]: set os type and version on server", node)
-            inventory_info = remote.inventory_info
-        update_inventory(inventory_info)
+    teuthology.parallel.parallel_map(update_node, list(nodes), reset_os)
+
+
+def update_node(node, reset_os=False):
+    remote = teuthology.orchestra.remote.Remote(
+        canonicalize_hostname(node))
+    if reset_os:
+        log.info("Updating [%s]: reset os type and version on server", node)
+        inventory_info = dict()
+        inventory_info['os_type'] = ''
+        inventory_info['os_version'] = ''
+        inventory_info['name'] = remote.hostname
+    else:
+        log.info("Updating [%s]: set os type and version on server", node)
+        inventory_info = remote.inventory_info
+    update_inventory(inventory_info)
 
 
 def lock_many_openstack(ctx, num, machine_type, user=None, description=None,
@@ -114,7 +118,7 @@ def lock_many(ctx, num, machine_type, user=None, description=None,
         if arch:
             data['arch'] = arch
         log.debug("lock_many request: %s", repr(data))
-        response = requests.post(
+        response = http.post(
             uri,
             data=json.dumps(data),
             headers={'content-type': 'application/json'},
@@ -167,7 +171,7 @@ def lock_one(name, user=None, description=None):
     request = dict(name=name, locked=True, locked_by=user,
                    description=description)
     uri = os.path.join(config.lock_server, 'nodes', name, 'lock', '')
-    response = requests.put(uri, json.dumps(request))
+    response = http.put(uri, json.dumps(request))
     success = response.ok
     if success:
         log.debug('locked %s as %s', name, user)
@@ -181,19 +185,47 @@ def lock_one(name, user=None, description=None):
     return response
 
 
-def unlock_safe(names: List[str], owner: str, run_name: str = "", job_id: str = ""):
+def unlock_safe(names: List[str], owner: str, run_name: str = "", job_id: str = "",
+                statuses: Union[Dict[str, dict], None] = None):
+    """
+    Unlock several nodes at once, each only if it is locked and its job isn't
+    still active
+
+    :param statuses: The nodes' statuses, as returned by
+                     query.get_status_many(), if the caller already has them
+    """
+    if statuses is None:
+        statuses = query.get_status_many(names)
+    # The nodes usually all belong to one run, so when several do, look up
+    # the run's jobs just once. A lone node's job is cheaper to fetch by
+    # itself than the whole run.
+    run_counts = dict()
+    for status in statuses.values():
+        description = status.get('description') or ''
+        if description.count('/') > 1:
+            run = description.split('/')[-2]
+            run_counts[run] = run_counts.get(run, 0) + 1
+    run_jobs = {run: query.get_run_jobs(run)
+                for run, count in run_counts.items() if count > 1}
     with teuthology.parallel.parallel() as p:
         for name in names:
-            p.spawn(unlock_one_safe, name, owner, run_name, job_id)
+            p.spawn(unlock_one_safe, name, owner, run_name, job_id,
+                    statuses.get(name), run_jobs)
         return all(p)
 
 
-def unlock_one_safe(name: str, owner: str, run_name: str = "", job_id: str = "") -> bool:
-    node_status = query.get_status(name)
+def unlock_one_safe(name: str, owner: str, run_name: str = "", job_id: str = "",
+                    status: Union[dict, None] = None,
+                    run_jobs: Union[Dict[str, dict], None] = None) -> bool:
+    node_status = status or query.get_status(name)
     if node_status.get("locked", False) is False:
         log.info(f"Refusing to unlock {name} since it is already unlocked")
         return False
-    maybe_job = query.node_active_job(name, node_status)
+    description = node_status.get("description") or ""
+    jobs = None
+    if run_jobs and description.count('/') > 1:
+        jobs = run_jobs.get(description.split('/')[-2])
+    maybe_job = query.node_active_job(name, node_status, run_jobs=jobs)
     if not maybe_job:
         return unlock_one(name, owner, node_status["description"], node_status)
     if run_name:
@@ -222,7 +254,7 @@ def unlock_many(names, user):
     with safe_while(
             sleep=1, increment=0.5, action=f'unlock_many {names}') as proceed:
         while proceed():
-            response = requests.post(
+            response = http.post(
                 uri,
                 data=json.dumps(data),
                 headers={'content-type': 'application/json'},
@@ -242,10 +274,10 @@ def unlock_one(name, user, description=None, status: Union[dict, None] = None) -
         log.error('destroy failed for %s', name)
         return False
     # we're trying to stop node before actual unlocking
-    status_info = teuthology.lock.query.get_status(name)
+    status_info = status or teuthology.lock.query.get_status(name)
     try:
         if not teuthology.lock.query.is_vm(status=status_info):
-            stop_node(name, status)
+            stop_node(name, status_info)
     except Exception:
         log.exception(f"Failed to stop {name}!")
     request = dict(name=name, locked=False, locked_by=user,
@@ -255,7 +287,7 @@ def unlock_one(name, user, description=None, status: Union[dict, None] = None) -
             sleep=1, increment=0.5, action="unlock %s" % name) as proceed:
         while proceed():
             try:
-                response = requests.put(uri, json.dumps(request))
+                response = http.put(uri, json.dumps(request))
                 if response.ok:
                     log.info('unlocked: %s', name)
                     return response.ok
@@ -289,7 +321,7 @@ def update_lock(name, description=None, status=None, ssh_pub_key=None):
         with safe_while(
                 sleep=1, increment=inc, action=f'update lock {name}') as proceed:
             while proceed():
-                response = requests.put(
+                response = http.put(
                     uri,
                     json.dumps(updated))
                 if response.ok:
@@ -314,7 +346,7 @@ def update_inventory(node_dict):
     with safe_while(
             sleep=1, increment=inc, action=f'update inventory {name}') as proceed:
         while proceed():
-            response = requests.put(
+            response = http.put(
                 uri,
                 json.dumps(node_dict),
                 headers={'content-type': 'application/json'},
@@ -322,7 +354,7 @@ def update_inventory(node_dict):
             if response.status_code == 404:
                 log.info("Creating new node %s on lock server", name)
                 uri = os.path.join(config.lock_server, 'nodes', '')
-                response = requests.post(
+                response = http.post(
                     uri,
                     json.dumps(node_dict),
                     headers={'content-type': 'application/json'},
@@ -362,19 +394,41 @@ def reimage_machines(ctx, machines, machine_type):
         remotes=[teuthology.orchestra.remote.Remote(machine)
                  for machine in machines],
     )
+    reference = query.list_locks(keyed_by_name=True)
     with console_log.task(ctx, console_log_conf):
-        with teuthology.parallel.parallel() as p:
+        with teuthology.parallel.parallel(
+                max_concurrency=config.reimage_concurrency) as p:
             for machine in machines:
-                log.info("Start node '%s' reimaging", machine)
-                update_nodes([machine], True)
-                p.spawn(teuthology.provision.reimage, ctx,
-                        machine, machine_type)
-                reimaged[machine] = machines[machine]
-    reimaged = do_update_keys(list(reimaged.keys()))[1]
-    update_nodes(reimaged)
+                p.spawn(reimage_machine, ctx, machine, machine_type,
+                        reference)
+            for result in p:
+                reimaged.update(result)
     return reimaged
 
 
+def reimage_machine(ctx, machine, machine_type, reference):
+    """
+    Take a single node through the whole reimaging process: reset its OS
+    on the lock server, reimage it, scan and publish its new host key, and
+    record its new OS. Each node does this independently, so that a node
+    which reimages quickly doesn't wait for the slowest one before its key
+    is published.
+
+    :param reference: The lock server's view of the nodes, as returned by
+                      list_locks(keyed_by_name=True)
+    :returns:         A dict mapping the node's hostname to its host key
+    """
+    log.info("Start node '%s' reimaging", machine)
+    update_nodes([machine], True)
+    teuthology.provision.reimage(ctx, machine, machine_type)
+    keys_dict = misc.ssh_keyscan([machine])
+    if push_new_keys(keys_dict, reference):
+        log.error("Failed to update the host key of %s", machine)
+    update_nodes(keys_dict)
+    log.info("Node '%s' is reimaged", machine)
+    return keys_dict
+
+
 def block_and_lock_machines(ctx, total_requested, machine_type, reimage=True, tries=10):
     # It's OK for os_type and os_version to be None here.  If we're trying
     # to lock a bare metal machine, we'll take whatever is available.  If
@@ -386,6 +440,9 @@ def block_and_lock_machines(ctx, total_requested, machine_type, reimage=True, tr
     reserved = config.reserve_machines
     assert isinstance(reserved, int), 'reserve_machines must be integer'
     assert (reserved >= 0), 'reserve_machines should >= 0'
+    partial_timeout = config.partial_lock_timeout
+    # When we first held some, but not all, of the nodes we need
+    partial_since = None
 
     log.info('Locking machines...')
     # change the status during the locking process
@@ -394,8 +451,10 @@ def block_and_lock_machines(ctx, total_requested, machine_type, reimage=True, tr
     all_locked = dict()
     requested = total_requested
     while True:
-        # get a candidate list of machines
-        machines = query.list_locks(
+        # get a candidate list of machines. This only decides whether to try
+        # locking yet, so the node snapshot shared with other local
+        # processes is recent enough.
+        machines = cache.list_locks(
             machine_type=machine_type,
             up=True,
             locked=False,
@@ -447,9 +506,10 @@ def block_and_lock_machines(ctx, total_requested, machine_type, reimage=True, tr
             )
         )
         if len(all_locked) == total_requested:
+            statuses = query.get_status_many(all_locked, machine_type)
             vmlist = []
             for lmach in all_locked:
-                if query.is_vm(lmach):
+                if query.is_vm(status=statuses.get(lmach, dict())):
                     vmlist.append(lmach)
             if vmlist:
                 log.info('Waiting for virtual machines to come up')
@@ -472,9 +532,9 @@ def block_and_lock_machines(ctx, total_requested, machine_type, reimage=True, tr
                 if do_update_keys(keys_dict)[0]:
                     log.info("Error in virtual machine keys")
                 newscandict = {}
+                statuses = query.get_status_many(all_locked, machine_type)
                 for dkey in all_locked.keys():
-                    stats = query.get_status(dkey)
-                    newscandict[dkey] = stats['ssh_pub_key']
+                    newscandict[dkey] = statuses[dkey]['ssh_pub_key']
                 ctx.config['targets'] = newscandict
             else:
                 ctx.config['targets'] = all_locked
@@ -492,6 +552,25 @@ def block_and_lock_machines(ctx, total_requested, machine_type, reimage=True, tr
             requested = requested - len(newly_locked)
             assert requested > 0, "lock_machines: requested counter went" \
                                   "negative, this shouldn't happen"
+            if all_locked and partial_timeout is not None:
+                if partial_since is None:
+                    partial_since = time.time()
+                if time.time() - partial_since >= partial_timeout:
+                    log.warning(
+                        'Releasing %d %s machines after waiting %ss for the '
+                        'other %d', len(all_locked), machine_type,
+                        partial_timeout, requested,
+                    )
+                    # Unlock them the usual way, so that any VMs we created
+                    # are destroyed and bare-metal nodes are stopped
+                    statuses = query.get_status_many(all_locked, machine_type)
+                    with teuthology.parallel.parallel() as p:
+                        for name in all_locked:
+                            p.spawn(unlock_one, name, ctx.owner,
+                                    status=statuses.get(name))
+                    all_locked = dict()
+                    requested = total_requested
+                    partial_since = None
 
         log.info(
             "{total} machines locked ({new} new); need {more} more".format(
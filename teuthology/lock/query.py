@@ -8,6 +8,8 @@ from typing import Dict, List, Union
 from teuthology import misc
 from teuthology.config import config
 from teuthology.contextutil import safe_while
+from teuthology.parallel import parallel_map
+from teuthology.util import http
 from teuthology.util.compat import urlencode
 from teuthology.util.time import parse_timestamp
 
@@ -21,7 +23,7 @@ def get_status(name) -> dict:
     with safe_while(
             sleep=1, increment=0.5, action=f'get_status {name}') as proceed:
         while proceed():
-            response = requests.get(uri)
+            response = http.get(uri)
             if response.ok:
                 return response.json()
             elif response.status_code == 404:
@@ -31,17 +33,51 @@ def get_status(name) -> dict:
     return dict()
 
 
+# get_status_many() asks about fewer nodes than this one at a time, since
+# listing every node in the lab costs more than a few small requests
+BULK_STATUS_MIN = 10
+
+
+def get_status_many(names, machine_type: Union[str, None] = None) -> Dict[str, dict]:
+    """
+    Get the status of several nodes from the lock server. Many nodes are
+    looked up with a single request listing all of the lab's nodes, narrowed
+    down to machine_type if it is given; a few are looked up one by one,
+    concurrently.
+
+    :param names:        A list of node names
+    :param machine_type: The nodes' machine type(s), if known, separated by
+                         ','
+    :returns:            A dict mapping each of the given names to its status.
+                         Nodes the lock server doesn't know about are left
+                         out.
+    """
+    names = list(names)
+    if len(names) < BULK_STATUS_MIN:
+        statuses = parallel_map(get_status, names, concurrency=http.POOL_SIZE)
+        return {name: status for name, status in zip(names, statuses)
+                if status}
+    filters = dict(machine_type=machine_type) if machine_type else dict()
+    nodes = list_locks(keyed_by_name=True, **filters)
+    statuses = dict()
+    for name in names:
+        status = nodes.get(misc.canonicalize_hostname(name, user=None))
+        if status:
+            statuses[name] = status
+    return statuses
+
+
 def get_statuses(machines):
     if machines:
         statuses = []
+        by_name = get_status_many(machines)
         for machine in machines:
-            machine = misc.canonicalize_hostname(machine)
-            status = get_status(machine)
+            status = by_name.get(machine)
             if status:
                 statuses.append(status)
             else:
                 log.error("Lockserver doesn't know about machine: %s" %
-                          machine)
+                          misc.canonicalize_hostname(machine))
     else:
         statuses = list_locks()
     return statuses
@@ -77,7 +113,7 @@ def list_locks(keyed_by_name=False, tries=10, **kwargs):
     ) as proceed:
         while proceed():
             try:
-                response = requests.get(uri)
+                response = http.get(uri)
                 if response.ok:
                     break
             except requests.ConnectionError:
@@ -124,25 +160,85 @@ def find_stale_locks(owner: str | None = None, machine_type: str | None = None)
     log.debug(f"Total locked nodes: {len(nodes)}")
     if owner is not None:
         nodes = [node for node in nodes if node['locked_by'] == owner]
-    nodes = filter(might_be_stale, nodes)
+    nodes = list(filter(might_be_stale, nodes))
+
+    # Fetch the jobs of every run with a candidate node once, instead of
+    # asking about each node's job separately. Don't send the results server
+    # more requests at once than we keep connections to it.
+    run_names = sorted(set(
+        node['description'].split('/')[-2] for node in nodes))
+    run_jobs = dict(zip(
+        run_names,
+        parallel_map(get_run_jobs, run_names, concurrency=http.POOL_SIZE),
+    ))
 
     # Here we build the list of of nodes that are locked, for a job (as opposed
     # to being locked manually for random monkeying), where the job is not
     # running
-    result = list()
-    for node in nodes:
-        if node_active_job(node["name"], grace_time=5):
-            continue
-        result.append(node)
-    return result
-
-def node_active_job(name: str, status: Union[dict, None] = None, grace_time: int = 0) -> Union[str, None]:
+    def is_stale(node):
+        run_name = node['description'].split('/')[-2]
+        return not node_active_job(
+            node["name"], status=node, grace_time=5,
+            run_jobs=run_jobs.get(run_name),
+        )
+
+    stale = parallel_map(is_stale, nodes, concurrency=http.POOL_SIZE)
+    return [node for node, node_is_stale in zip(nodes, stale)
+            if node_is_stale]
+
+
+def get_run_jobs(run_name: str) -> Union[Dict[str, dict], None]:
+    """
+    Fetch the status of every job in a run from the results server
+
+    :param run_name: The name of the run
+    :returns:        A dict mapping job IDs to dicts containing the jobs'
+                     'status' and 'updated' fields, or None if the run
+                     couldn't be fetched
+    """
+    url = (f"{config.results_server}/runs/{run_name}/jobs/"
+           "?fields=job_id,status,updated")
+    with safe_while(
+            sleep=1, increment=0.5, tries=5, _raise=False,
+            action=f'get_run_jobs {run_name}') as proceed:
+        while proceed():
+            try:
+                resp = http.get(url)
+            except requests.ConnectionError:
+                log.exception("Could not contact results server: %s",
+                              config.results_server)
+                continue
+            if resp.ok:
+                return {str(job['job_id']): job for job in resp.json()}
+            elif resp.status_code == 404:
+                return dict()
+            log.debug(f"Error {resp.status_code} listing jobs in {run_name}: {resp.text}")
+    return None
+
+
+def _job_is_active(job_obj: dict, grace_time: int, name: str) -> bool:
+    job_status = job_obj["status"]
+    active = job_status and job_status not in ('pass', 'fail', 'dead')
+    if active or not grace_time:
+        return active
+    job_updated = job_obj["updated"]
+    try:
+        delta = datetime.datetime.now(datetime.timezone.utc) - parse_timestamp(job_updated)
+        active = active or delta < datetime.timedelta(minutes=grace_time)
+    except Exception:
+        log.exception(f"{name} updated={job_updated}")
+    return active
+
+
+def node_active_job(name: str, status: Union[dict, None] = None, grace_time: int = 0,
+                    run_jobs: Union[Dict[str, dict], None] = None) -> Union[str, None]:
     """
     Is this node's job active (e.g. running or waiting)?
 
     :param node:  The node dict as returned from the lock server
-    :param cache: A set() used for caching results
     :param grace: A period of time (in mins) after job finishes before we consider the node inactive
+    :param run_jobs: The jobs of the node's run, as returned by
+                     get_run_jobs(), to avoid fetching the job again
     :returns:     A string if the node has an active job, or None if not
     """
     status = status or get_status(name)
@@ -158,27 +254,23 @@ def node_active_job(name: str, status: Union[dict, None] = None, grace_time: int
     if not run_name or job_id == '':
         # We thought this node might have a stale job, but no.
         return "node description does not contained scheduled job info"
+    if run_jobs is not None:
+        job_obj = run_jobs.get(job_id)
+        # A job the results server doesn't know about is treated as active,
+        # as below
+        if job_obj is None or _job_is_active(
+                job_obj, grace_time, f"{run_name}/{job_id}"):
+            return description
+        return None
     url = f"{config.results_server}/runs/{run_name}/jobs/{job_id}/"
-    job_status = ""
     active = True
     with safe_while(
             sleep=1, increment=0.5, action='node_is_active') as proceed:
         while proceed():
-            resp = requests.get(url)
+            resp = http.get(url)
             if resp.ok:
-                job_obj = resp.json()
-                job_status = job_obj["status"]
-                active = job_status and job_status not in ('pass', 'fail', 'dead')
-                if active:
-                    break
-                job_updated = job_obj["updated"]
-                if not grace_time:
-                    break
-                try:
-                    delta = datetime.datetime.now(datetime.timezone.utc) - parse_timestamp(job_updated)
-                    active = active or delta < datetime.timedelta(minutes=grace_time)
-                except Exception:
-                    log.exception(f"{run_name}/{job_id} updated={job_updated}")
+                active = _job_is_active(
+                    resp.json(), grace_time, f"{run_name}/{job_id}")
                 break
             elif resp.status_code == 404:
                 break
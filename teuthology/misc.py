@@ -18,6 +18,7 @@ import re
 from sys import stdin
 import pprint
 import datetime
+import gevent.subprocess
 
 from tarfile import ReadError
 
@@ -28,10 +29,10 @@ from teuthology.util.compat import urljoin, urlopen, HTTPError
 from netaddr.strategy.ipv4 import valid_str as _is_ipv4
 from netaddr.strategy.ipv6 import valid_str as _is_ipv6
 from teuthology import safepath
-from teuthology.exceptions import (CommandCrashedError, CommandFailedError,
-                                   ConnectionLostError)
+from teuthology.exceptions import CommandFailedError, MaxWhileTries
 from teuthology.orchestra import run
 from teuthology.config import config
+from teuthology.parallel import parallel, parallel_map
 from teuthology.contextutil import safe_while
 from teuthology.orchestra.opsys import DEFAULT_OS_VERSION
 
@@ -43,6 +44,9 @@ stamp = datetime.datetime.now().strftime("%y%m%d%H%M")
 is_arm = lambda x: x.startswith('tala') or x.startswith(
     'ubuntu@tala') or x.startswith('saya') or x.startswith('ubuntu@saya')
 
+# Buffer size used when writing files pulled from remotes
+COPY_BUFSIZE = 1024 * 1024
+
 hostname_expr_templ = '(?P<user>.*@)?(?P<shortname>.*){lab_domain}'
 
 def host_shortname(hostname):
@@ -711,7 +715,34 @@ def get_file(remote, path, sudo=False, dest_dir='/tmp'):
 
 def copy_fileobj(src, tarinfo, local_path):
     with open(local_path, 'wb') as dest:
-        shutil.copyfileobj(src, dest)
+        shutil.copyfileobj(src, dest, COPY_BUFSIZE)
+
+
+def gzip_remote_files(remote, remotedir, min_size=None, level=5):
+    """
+    Compress files in a remote directory in place, using as many gzip
+    processes as the remote has CPUs. Files which are already compressed
+    are left alone, as are any which gzip refuses to compress.
+
+    :param remote:    the remote object
+    :param remotedir: the directory on the remote host
+    :param min_size:  only compress files of at least this many bytes
+    :param level:     the gzip compression level
+    """
+    args = ['sudo', 'find', remotedir, '-type', 'f', '!', '-name', '*.gz']
+    if min_size:
+        args.extend(['-size', '+{}c'.format(min_size - 1)])
+    args.extend([
+        '-print0',
+        run.Raw('|'),
+        'sudo', 'xargs', '-0', '--no-run-if-empty', '--max-args=1',
+        '--max-procs=0', '--',
+        'gzip', '-{}'.format(level), '--',
+    ])
+    proc = remote.run(args=args, check_status=False)
+    if proc.returncode:
+        log.warning('Failed to compress some files in %s:%s',
+                    remote.shortname, remotedir)
 
 
 def pull_directory(remote, remotedir, localdir, write_to=copy_fileobj):
@@ -727,17 +758,19 @@ def pull_directory(remote, remotedir, localdir, write_to=copy_fileobj):
                      func(src: fileobj,
                           tarinfo: tarfile.TarInfo,
                           local_path: str)
+    :returns: the number of bytes in the files that were transferred
     """
     log.debug('Transferring archived files from %s:%s to %s',
               remote.shortname, remotedir, localdir)
     if not os.path.exists(localdir):
         os.mkdir(localdir)
     r = remote.get_tar_stream(remotedir, sudo=True, compress=False)
-    tar = tarfile.open(mode='r|', fileobj=r.stdout)
+    tar = tarfile.open(mode='r|', fileobj=r.stdout, bufsize=COPY_BUFSIZE)
+    size = 0
     while True:
         ti = tar.next()
         if ti is None:
-            break
+            return size
 
         if ti.isdir():
             # ignore silently; easier to just create leading dirs below
@@ -748,6 +781,7 @@ def pull_directory(remote, remotedir, localdir, write_to=copy_fileobj):
             safepath.makedirs(root=localdir, path=os.path.dirname(sub))
             with tar.extractfile(ti) as src:
                 write_to(src, ti, os.path.join(localdir, sub))
+            size += ti.size
         else:
             if ti.isdev():
                 type_ = 'device'
@@ -905,29 +939,37 @@ def reconnect(ctx, timeout, remotes=None):
     holding the ssh keys for each of them. As long as it
     contains this data, you can construct a context
     that is a subset of your full cluster.
+
+    All machines are reconnected to concurrently, each backing off
+    exponentially between its own attempts.
     """
     log.info('Re-opening connections...')
     starttime = time.time()
 
     if remotes:
-        need_reconnect = remotes
+        need_reconnect = list(remotes)
     else:
         need_reconnect = list(ctx.cluster.remotes.keys())
 
-    while need_reconnect:
-        for remote in need_reconnect:
+    def reconnect_one(remote):
+        delay = 1
+        while True:
             log.info('trying to connect to %s', remote.name)
-            success = remote.reconnect()
-            if not success:
-                if time.time() - starttime > timeout:
-                    raise RuntimeError("Could not reconnect to %s" %
-                                       remote.name)
-            else:
-                need_reconnect.remove(remote)
-
-        log.debug('waited {elapsed}'.format(
-            elapsed=str(time.time() - starttime)))
-        time.sleep(1)
+            if remote.reconnect():
+                log.info('reconnected to %s after %.1fs', remote.name,
+                         time.time() - starttime)
+                return
+            elapsed = time.time() - starttime
+            if elapsed > timeout:
+                raise RuntimeError("Could not reconnect to %s" %
+                                   remote.name)
+            log.debug('waited {elapsed}'.format(elapsed=str(elapsed)))
+            time.sleep(min(delay, timeout - elapsed))
+            delay = min(delay * 2, 30)
+
+    with parallel() as p:
+        for remote in need_reconnect:
+            p.spawn(reconnect_one, remote)
 
 
 def get_clients(ctx, roles):
@@ -1025,6 +1067,9 @@ def ssh_keyscan(hostnames, _raise=True):
     """
     Fetch the SSH public key of one or more hosts
 
+    All of the hosts are scanned at once. Those which don't answer are
+    retried together, until every key has been retrieved or we give up.
+
     :param hostnames: A list of hostnames, or a dict keyed by hostname
     :param _raise: Whether to raise an exception if not all keys are retrieved
     :returns: A dict keyed by hostname, with the host keys as values
@@ -1034,54 +1079,67 @@ def ssh_keyscan(hostnames, _raise=True):
     hostnames = [canonicalize_hostname(name, user=None) for name in
                  hostnames]
     keys_dict = dict()
-    for hostname in hostnames:
-        with safe_while(
-            sleep=1,
-            tries=15 if _raise else 1,
-            increment=1,
-            _raise=_raise,
-            action="ssh_keyscan " + hostname,
-        ) as proceed:
-            while proceed():
-                key = _ssh_keyscan(hostname)
-                if key:
-                    keys_dict[hostname] = key
-                    break
-    if len(keys_dict) != len(hostnames):
-        missing = set(hostnames) - set(keys_dict.keys())
-        msg = "Unable to scan these host keys: %s" % ' '.join(missing)
+    pending = list(hostnames)
+    with safe_while(
+        sleep=1,
+        tries=15 if _raise else 1,
+        increment=1,
+        _raise=False,
+        action="ssh_keyscan",
+    ) as proceed:
+        while pending and proceed():
+            keys_dict.update(_ssh_keyscan_many(pending))
+            pending = [name for name in pending if name not in keys_dict]
+    if pending:
+        msg = "Unable to scan these host keys: %s" % ' '.join(pending)
         if not _raise:
             log.warning(msg)
         else:
-            raise RuntimeError(msg)
+            raise MaxWhileTries(msg)
     return keys_dict
 
 
-def _ssh_keyscan(hostname):
+def _ssh_keyscan_many(hostnames):
     """
-    Fetch the SSH public key of one or more hosts
+    Fetch the SSH public keys of several hosts with one ssh-keyscan, which
+    contacts all of them concurrently
 
-    :param hostname: The hostname
-    :returns: The host key
+    :param hostnames: A list of hostnames
+    :returns: A dict keyed by hostname, with the host keys as values. Hosts
+              which didn't answer are left out.
     """
-    args = ['ssh-keyscan', '-T', '1', hostname]
-    p = subprocess.Popen(
+    args = ['ssh-keyscan', '-T', '1'] + list(hostnames)
+    # subprocess isn't monkey-patched; gevent's version lets other greenlets,
+    # e.g. other nodes' reimages, run while we wait
+    p = gevent.subprocess.Popen(
         args=args,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
     )
-    p.wait()
-    for line in p.stderr:
-        line = line.decode()
+    stdout, stderr = p.communicate()
+    for line in stderr.decode().splitlines():
         line = line.strip()
         if line and not line.startswith('#'):
             log.error(line)
-    keys = list()
-    for line in p.stdout:
-        host, key = line.strip().decode().split(' ', 1)
-        keys.append(key)
-    if len(keys) > 0:
-        return sorted(keys)[0]
+    keys = dict()
+    for line in stdout.decode().splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        host, key = line.split(' ', 1)
+        keys.setdefault(host, list()).append(key)
+    return {host: sorted(host_keys)[0] for host, host_keys in keys.items()
+            if host in hostnames}
+
+
+def _ssh_keyscan(hostname):
+    """
+    Fetch the SSH public key of one host
+
+    :param hostname: The hostname
+    :returns: The host key
+    """
+    return _ssh_keyscan_many([hostname]).get(hostname)
 
 
 def ssh_keyscan_wait(hostname):
@@ -1108,17 +1166,7 @@ def stop_daemons_of_type(ctx, type_, cluster='ceph', timeout=300):
     :param timeout: Timeout in seconds for stopping each daemon.
     """
     log.info('Shutting down %s daemons...' % type_)
-    exc = None
-    for daemon in ctx.daemons.iter_daemons_of_role(type_, cluster):
-        try:
-            daemon.stop(timeout)
-        except (CommandFailedError,
-                CommandCrashedError,
-                ConnectionLostError) as e:
-            exc = e
-            log.exception('Saw exception from %s.%s', daemon.role, daemon.id_)
-    if exc is not None:
-        raise exc
+    ctx.daemons.stop_all(type_, cluster, timeout)
 
 
 def get_system_type(remote, distro=False, version=False):
@@ -1289,29 +1337,57 @@ def archive_logs(ctx, remote_path, log_path):
     """
     Archive directories from all nodes in a cliuster. It pulls all files in
     remote_path dir to job's archive dir under log_path dir.
+
+    :returns: the number of bytes transferred
     """
     if ctx.archive is None:
-        return
+        return 0
     path = os.path.join(ctx.archive, 'remote')
     os.makedirs(path, exist_ok=True)
-    for remote in ctx.cluster.remotes.keys():
+
+    def pull(remote):
         sub = os.path.join(path, remote.shortname)
         os.makedirs(sub, exist_ok=True)
         try:
-            pull_directory(remote, remote_path, os.path.join(sub, log_path))
+            return pull_directory(remote, remote_path,
+                                  os.path.join(sub, log_path))
         except ReadError:
-            pass
+            return 0
+
+    return sum(parallel_map(pull, ctx.cluster.remotes.keys()))
 
 
-def compress_logs(ctx, remote_dir):
+# The commands used by compress_logs() for each supported codec, and the
+# range of compression levels each accepts
+LOG_CODECS = {
+    'gzip': ('gzip -{level} --verbose --', range(1, 10)),
+    'zstd': ('zstd --rm -q -{level} --', range(1, 20)),
+    'xz': ('xz -T1 -{level} --verbose --', range(0, 10)),
+}
+
+
+def compress_logs(ctx, remote_dir, codec=None, level=None):
     """
     Compress all files in remote_dir from all nodes in a cluster.
-    """
+
+    :param codec: one of LOG_CODECS; defaults to the log_compression setting
+    :param level: the compression level; defaults to the
+                  log_compression_level setting
+    """
+    codec = codec or config.log_compression
+    if level is None:
+        level = config.log_compression_level
+    if codec not in LOG_CODECS:
+        raise ValueError(f"Unknown log compression codec: {codec}")
+    command, levels = LOG_CODECS[codec]
+    if level not in levels:
+        raise ValueError(f"Invalid compression level for {codec}: {level}")
     log.info('Compressing logs...')
     run.wait(
         ctx.cluster.run(
             args=(f"sudo find {remote_dir} -name *.log -print0 | "
-                  f"sudo xargs --max-args=1 --max-procs=0 --verbose -0 --no-run-if-empty -- gzip -5 --verbose --"),
+                  f"sudo xargs --max-args=1 --max-procs=0 --verbose -0 --no-run-if-empty -- "
+                  f"{command.format(level=level)}"),
             wait=False,
         ),
     )
@@ -3,6 +3,7 @@ Cluster definition
 part of context, Cluster is used to save connection information.
 """
 from teuthology.orchestra import run
+from teuthology.parallel import parallel, parallel_map
 
 class Cluster(object):
     """
@@ -91,36 +92,73 @@ class Cluster(object):
             run.wait(procs)
         return procs
 
-    def sh(self, script, **kwargs):
+    def sh(self, script, concurrency=None, return_exceptions=False,
+           **kwargs):
         """
-        Run a command on all the nodes in this cluster.
+        Run a command on all the nodes in this cluster, in parallel.
 
-        Goes through nodes in alphabetical order.
+        :param concurrency:       The most nodes to run on at once; defaults
+                                  to all of them
+        :param return_exceptions: If True, a node's exception is put in place
+                                  of its output instead of being raised. See
+                                  teuthology.parallel.parallel_map().
 
-        Returns a list of the command outputs correspondingly.
+        Returns a list of the command outputs, with nodes in alphabetical
+        order.
         """
         remotes = sorted(self.remotes.keys(), key=lambda rem: rem.name)
-        return [remote.sh(script, **kwargs) for remote in remotes]
+        return parallel_map(
+            lambda remote: remote.sh(script, **kwargs),
+            remotes,
+            concurrency=concurrency,
+            return_exceptions=return_exceptions,
+        )
+
+    def run_batch(self, commands, **kwargs):
+        """
+        Run a batch of commands on all the nodes in this cluster, in
+        parallel. See Remote.run_batch().
+
+        Returns a dict mapping each remote to its list of `BatchResult`.
+        """
+        results = dict()
 
-    def write_file(self, file_name, content, sudo=False, perms=None, owner=None):
+        def _run_batch(remote):
+            results[remote] = remote.run_batch(commands, **kwargs)
+
+        with parallel() as p:
+            for remote in self.remotes.keys():
+                p.spawn(_run_batch, remote)
+        return results
+
+    def write_file(self, file_name, content, sudo=False, perms=None, owner=None,
+                   concurrency=None):
         """
-        Write text to a file on each node.
+        Write text to a file on each node, in parallel.
 
         :param file_name: file name
         :param content: file content
         :param sudo: use sudo
         :param perms: file permissions (passed to chmod) ONLY if sudo is True
+        :param concurrency: the most nodes to write to at once; defaults to
+                            all of them
         """
-        remotes = sorted(self.remotes.keys(), key=lambda rem: rem.name)
-        for remote in remotes:
+        if not sudo and (perms is not None or owner is not None):
+            raise ValueError("To specify perms or owner, sudo must be True")
+        if hasattr(content, 'read'):
+            # Every node needs the whole of the file
+            content = content.read()
+
+        def _write_file(remote):
             if sudo:
                 remote.write_file(file_name, content,
                                   sudo=True, mode=perms, owner=owner)
             else:
-                if perms is not None or owner is not None:
-                    raise ValueError("To specify perms or owner, sudo must be True")
                 remote.write_file(file_name, content)
 
+        remotes = sorted(self.remotes.keys(), key=lambda rem: rem.name)
+        parallel_map(_write_file, remotes, concurrency=concurrency)
+
     def only(self, *roles):
         """
         Return a cluster with only the remotes that have all of given roles.
@@ -1,6 +1,7 @@
 """
 Connection utilities
 """
+import gevent.lock
 import paramiko
 import os
 import logging
@@ -11,6 +12,16 @@ from paramiko.hostkeys import HostKeyEntry
 
 log = logging.getLogger(__name__)
 
+# Parsed ssh_config files: path -> (mtime, paramiko.SSHConfig)
+_ssh_configs = dict()
+# Connections which may be shared by every Remote in this process:
+# (user_at_host, host_key, key_filename) -> paramiko.SSHClient
+_clients = dict()
+# cache key -> number of connect(reuse=True) calls not yet release()d
+_client_refs = dict()
+# cache key -> lock held while connecting; dropped along with the connection
+_client_locks = dict()
+
 
 def split_user(user_at_host):
     """
@@ -36,8 +47,109 @@ def create_key(keytype, key):
     return ke.key
 
 
+def get_ssh_config(path):
+    """
+    Parse an ssh_config file, reusing the result of the previous parse if
+    the file hasn't been modified since.
+
+    :param path: The path to the file
+    :returns:    A paramiko.SSHConfig, or None if the file doesn't exist
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _ssh_configs.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    ssh_config = paramiko.SSHConfig()
+    with open(path) as f:
+        ssh_config.parse(f)
+    _ssh_configs[path] = (mtime, ssh_config)
+    return ssh_config
+
+
+def is_alive(client):
+    """
+    Check whether an SSHClient's transport is still usable, without running
+    anything on the remote host.
+    """
+    transport = client.get_transport()
+    if transport is None or not transport.is_active():
+        return False
+    try:
+        transport.send_ignore()
+    except Exception:
+        return False
+    return True
+
+
+def responds(client, timeout=10):
+    """
+    Check whether a trivial command completes over an SSHClient within
+    timeout seconds. Unlike is_alive(), this notices a transport whose peer has
+    gone away without closing the TCP connection, e.g. after a hard reboot.
+    """
+    if not is_alive(client):
+        return False
+    try:
+        channel = client.get_transport().open_session(timeout=timeout)
+        try:
+            channel.settimeout(timeout)
+            channel.exec_command('true')
+            if not channel.status_event.wait(timeout):
+                return False
+            return channel.recv_exit_status() == 0
+        finally:
+            channel.close()
+    except Exception:
+        return False
+
+
+def is_shared(client):
+    """
+    :returns: True if client is in the connection cache, and so may be in use
+              by more than one Remote
+    """
+    return any(c is client for c in _clients.values())
+
+
+def forget(client):
+    """
+    Remove a connection from the connection cache, if it is there
+    """
+    for key, cached in list(_clients.items()):
+        if cached is client:
+            _drop(key)
+
+
+def release(client):
+    """
+    Give back a connection returned by connect(). A cached connection is
+    closed once everything which asked for it has released it; any other
+    connection is closed immediately.
+    """
+    for key, cached in list(_clients.items()):
+        if cached is client:
+            _client_refs[key] -= 1
+            if _client_refs[key] > 0:
+                return
+            _drop(key)
+            break
+    client.close()
+
+
+def _drop(key):
+    del _clients[key]
+    del _client_refs[key]
+    lock = _client_locks.get(key)
+    if lock is not None and not lock.locked():
+        del _client_locks[key]
+
+
 def connect(user_at_host, host_key=None, keep_alive=False, timeout=60,
-            _SSHClient=None, _create_key=None, retry=True, key_filename=None):
+            _SSHClient=None, _create_key=None, retry=True, key_filename=None,
+            reuse=False):
     """
     ssh connection routine.
 
@@ -50,8 +162,47 @@ def connect(user_at_host, host_key=None, keep_alive=False, timeout=60,
     :param retry:       Whether or not to retry failed connection attempts
                         (eventually giving up if none succeed). Default is True
     :param key_filename:  Optionally override which private key to use.
+    :param reuse:       If a live connection to the same user@host, with the
+                        same host key and private key, was previously made with
+                        reuse=True, return it instead of making a new one.
+                        Connections made this way are shared by everything in
+                        this process, and so must be given back with release()
+                        rather than closed by callers.
     :return: ssh connection.
     """
+    if not reuse:
+        return _connect(user_at_host, host_key, keep_alive, timeout,
+                        _SSHClient, _create_key, retry, key_filename)
+    key_files = key_filename or config.ssh_key
+    if isinstance(key_files, list):
+        key_files = tuple(key_files)
+    cache_key = (user_at_host, host_key, key_files)
+    lock = _client_locks.setdefault(cache_key, gevent.lock.BoundedSemaphore())
+    try:
+        with lock:
+            cached = _clients.get(cache_key)
+            if cached is not None:
+                if responds(cached, timeout=min(timeout or 10, 10)):
+                    log.debug("Reusing connection to %s", user_at_host)
+                    _client_refs[cache_key] += 1
+                    return cached
+                log.debug("Discarding dead connection to %s", user_at_host)
+                del _clients[cache_key]
+                del _client_refs[cache_key]
+                cached.close()
+            ssh = _connect(user_at_host, host_key, keep_alive, timeout,
+                           _SSHClient, _create_key, retry, key_filename)
+            _clients[cache_key] = ssh
+            _client_refs[cache_key] = 1
+            return ssh
+    finally:
+        # Don't keep a lock for a host we failed to connect to
+        if cache_key not in _clients and not lock.locked():
+            _client_locks.pop(cache_key, None)
+
+
+def _connect(user_at_host, host_key, keep_alive, timeout, _SSHClient,
+             _create_key, retry, key_filename):
     user, host = split_user(user_at_host)
     if _SSHClient is None:
         _SSHClient = paramiko.SSHClient
@@ -82,9 +233,8 @@ def connect(user_at_host, host_key=None, keep_alive=False, timeout=60,
     key_filename = key_filename or config.ssh_key
     ssh_config_path = config.ssh_config_path or "~/.ssh/config"
     ssh_config_path = os.path.expanduser(ssh_config_path)
-    if os.path.exists(ssh_config_path):
-        ssh_config = paramiko.SSHConfig()
-        ssh_config.parse(open(ssh_config_path))
+    ssh_config = get_ssh_config(ssh_config_path)
+    if ssh_config is not None:
         opts = ssh_config.lookup(host)
         if not key_filename and 'identityfile' in opts:
             key_filename = opts['identityfile']
@@ -1,7 +1,14 @@
+import logging
+
 from teuthology import misc
+from teuthology.exceptions import CommandFailedError
 from teuthology.orchestra.daemon.state import DaemonState
-from teuthology.orchestra.daemon.systemd import SystemDState
+from teuthology.orchestra.daemon.systemd import (SystemDState,
+                                                 get_status_cache, show_units)
 from teuthology.orchestra.daemon.cephadmunit import CephadmUnit
+from teuthology.parallel import parallel_map
+
+log = logging.getLogger(__name__)
 
 
 class DaemonGroup(object):
@@ -95,6 +102,135 @@ class DaemonGroup(object):
         role = cluster + '.' + type_
         return self.daemons.get(role, {}).values()
 
+    def _daemons_by_remote(self, type_=None, cluster='ceph'):
+        """
+        :param type_: type of daemon (osd, mds, mon, rgw,  for example), or
+                      None for all of them
+        :returns: A dict mapping each remote to a list of its daemons
+        """
+        by_remote = dict()
+        for role, daemons in self.daemons.items():
+            role_cluster, role_type = role.split('.')[0:2]
+            if role_cluster != cluster:
+                continue
+            if type_ is not None and role_type != type_:
+                continue
+            for daemon in daemons.values():
+                if daemon is None:
+                    continue
+                by_remote.setdefault(daemon.remote, []).append(daemon)
+        return by_remote
+
+    def _on_each_remote(self, func, type_, cluster):
+        """
+        Call func(remote, daemons) for every remote with daemons of type_,
+        in parallel. If any of the calls fail, the exception is raised once
+        all of them have finished.
+
+        :returns: A list of the return values of func
+        """
+        by_remote = self._daemons_by_remote(type_, cluster)
+        remotes = list(by_remote.keys())
+        results = parallel_map(
+            lambda remote: func(remote, by_remote[remote]),
+            remotes,
+            return_exceptions=True,
+        )
+        exc = None
+        for remote, result in zip(remotes, results):
+            if isinstance(result, Exception):
+                log.error('Error on %s: %r', remote.shortname, result)
+                exc = result
+        if exc is not None:
+            raise exc
+        return results
+
+    def stop_all(self, type_=None, cluster='ceph', timeout=300):
+        """
+        Stop all daemons of a type. Hosts are handled in parallel, and all of
+        the systemd-managed daemons on a host are stopped with a single
+        systemctl command.
+
+        :param type_: type of daemon (osd, mds, mon, rgw,  for example), or
+                      None for every type
+        :param cluster: Cluster name
+        :param timeout: timeout for each daemon not managed by systemd
+        """
+        def stop(remote, daemons):
+            units = [d for d in daemons if isinstance(d, SystemDState)]
+            if units:
+                remote.run(args=['sudo', 'systemctl', 'stop', '--'] +
+                           [d.unit for d in units])
+                get_status_cache(remote).invalidate()
+                log.info('Stopped %s on %s',
+                         ', '.join(d.unit for d in units), remote.shortname)
+            for daemon in daemons:
+                if daemon not in units:
+                    daemon.stop(timeout)
+
+        self._on_each_remote(stop, type_, cluster)
+
+    def restart_all(self, type_=None, cluster='ceph'):
+        """
+        Restart (or start) all daemons of a type, in the same way as
+        stop_all(). systemd-managed daemons which fail to come up cause a
+        CommandFailedError, as SystemDState.restart() would.
+
+        :param type_: type of daemon (osd, mds, mon, rgw,  for example), or
+                      None for every type
+        :param cluster: Cluster name
+        """
+        def restart(remote, daemons):
+            units = [d for d in daemons if isinstance(d, SystemDState)]
+            if units:
+                remote.run(args=['sudo', 'systemctl', 'restart', '--'] +
+                           [d.unit for d in units])
+                get_status_cache(remote).invalidate()
+                states = show_units(remote, [d.unit for d in units])
+                for daemon in units:
+                    state = states.get(daemon.unit, {})
+                    if state.get('ActiveState') == 'active':
+                        continue
+                    status = int(state.get('ExecMainStatus') or 0)
+                    if status:
+                        raise CommandFailedError(
+                            daemon.start_cmd, status, remote)
+            for daemon in daemons:
+                if daemon not in units:
+                    daemon.restart()
+
+        self._on_each_remote(restart, type_, cluster)
+
+    def status_all(self, type_=None, cluster='ceph'):
+        """
+        Find out which daemons of a type are running, with one query per
+        host for systemd-managed daemons.
+
+        :param type_: type of daemon (osd, mds, mon, rgw,  for example), or
+                      None for every type
+        :param cluster: Cluster name
+        :returns: A dict mapping each daemon to the value its running()
+                  method would return: for systemd, the main PID or None
+        """
+        def status(remote, daemons):
+            units = [d for d in daemons if isinstance(d, SystemDState)]
+            states = show_units(remote, [d.unit for d in units])
+            result = dict()
+            for daemon in daemons:
+                if daemon in units:
+                    state = states.get(daemon.unit, {})
+                    pid = int(state.get('MainPID') or 0)
+                    active = state.get('ActiveState') == 'active'
+                    result[daemon] = pid if active and pid > 0 else None
+                else:
+                    result[daemon] = daemon.running()
+            return result
+
+        statuses = dict()
+        for result in self._on_each_remote(status, type_, cluster):
+            statuses.update(result)
+        return statuses
+
     def resolve_role_list(self, roles, types, cluster_aware=False):
         """
         Resolve a configuration setting that may be None or contain wildcards
@@ -1,6 +1,9 @@
 import logging
-import re
+import threading
+import time
+import weakref
 
+from teuthology.config import config
 from teuthology.exceptions import CommandFailedError
 from teuthology.orchestra import run
 from teuthology.orchestra.daemon.state import DaemonState
@@ -9,6 +12,111 @@ log = logging.getLogger(__name__)
 
 systemd_cmd_templ = 'sudo systemctl {action} {daemon}@{id_}'
 
+# The unit properties show_units() fetches by default
+SHOW_PROPERTIES = ('ActiveState', 'SubState', 'MainPID', 'ExecMainStatus')
+
+
+def show_units(remote, units, properties=SHOW_PROPERTIES):
+    """
+    Get properties of several systemd units with a single 'systemctl show'
+
+    :param remote:     The remote to query
+    :param units:      A list of unit names
+    :param properties: The properties to fetch
+    :returns:          A dict mapping each unit name to a dict of its
+                       properties
+    """
+    if not units:
+        return dict()
+    output = remote.sh(
+        ['sudo', 'systemctl', 'show',
+         '--property=' + ','.join(properties), '--'] + list(units))
+    # systemctl prints one block per unit, in the order they were given,
+    # separated by blank lines
+    blocks = output.strip('\n').split('\n\n')
+    result = dict()
+    for unit, block in zip(units, blocks):
+        props = dict()
+        for line in block.split('\n'):
+            if '=' in line:
+                key, value = line.split('=', 1)
+                props[key.strip()] = value.strip()
+        result[unit] = props
+    return result
+
+
+class UnitStatusCache(object):
+    """
+    The states of all of the systemd units on one host that we know about.
+    They are all refreshed with a single 'systemctl show' whenever one of them
+    is asked for and the last refresh is older than max_age seconds.
+    """
+    def __init__(self, remote, max_age=None):
+        """
+        :param remote:  The remote to query
+        :param max_age: The longest, in seconds, that a state is served for
+                        before being refreshed. Defaults to the
+                        systemd_status_max_age config option.
+        """
+        # Weak, so that the cache doesn't keep its key in _status_caches alive
+        self._remote = weakref.ref(remote)
+        self.max_age = max_age
+        self.units = []
+        self._states = dict()
+        self._updated = None
+        self._lock = threading.Lock()
+
+    @property
+    def remote(self):
+        return self._remote()
+
+    def add(self, unit):
+        """
+        Include a unit in subsequent refreshes
+        """
+        with self._lock:
+            if unit not in self.units:
+                self.units.append(unit)
+
+    def invalidate(self):
+        """
+        Make the next get() refresh every unit's state
+        """
+        self._updated = None
+
+    def _is_stale(self):
+        if self._updated is None:
+            return True
+        max_age = self.max_age
+        if max_age is None:
+            max_age = config.systemd_status_max_age
+        return time.monotonic() - self._updated > max_age
+
+    def get(self, unit):
+        """
+        :returns: A dict of the unit's properties, as returned by show_units()
+        """
+        self.add(unit)
+        with self._lock:
+            if self._is_stale() or unit not in self._states:
+                self._states = show_units(self.remote, self.units)
+                self._updated = time.monotonic()
+            return self._states.get(unit, dict())
+
+
+# remote -> UnitStatusCache. An entry goes away along with its remote.
+_status_caches = weakref.WeakKeyDictionary()
+
+
+def get_status_cache(remote):
+    """
+    :returns: The UnitStatusCache shared by all daemons on remote
+    """
+    cache = _status_caches.get(remote)
+    if cache is None:
+        cache = _status_caches.setdefault(remote, UnitStatusCache(remote))
+    return cache
+
 
 class SystemDState(DaemonState):
     def __init__(self, remote, role, id_, *command_args,
@@ -24,6 +132,14 @@ class SystemDState(DaemonState):
             return 'radosgw'
         return self.type_
 
+    @property
+    def unit(self):
+        """
+        The name of this daemon's systemd unit
+        """
+        return '%s-%s@%s' % (
+            self.cluster, self.daemon_type, self.id_.replace('client.', ''))
+
     def _get_systemd_cmd(self, action):
         cmd = systemd_cmd_templ.format(
             action=action,
@@ -50,6 +166,15 @@ class SystemDState(DaemonState):
                 syslog_id,
             )
 
+    @property
+    def status_cache(self):
+        """
+        The UnitStatusCache for this daemon's remote
+        """
+        cache = get_status_cache(self.remote)
+        cache.add(self.unit)
+        return cache
+
     def check_status(self):
         """
         Check to see if the process has exited.
@@ -58,35 +183,13 @@ class SystemDState(DaemonState):
         :raises:  CommandFailedError, if the process was run with
                   check_status=True
         """
-        output = self.remote.sh(self.show_cmd + ' | grep -i state')
-
-        def parse_line(line):
-            key, value = line.strip().split('=', 1)
-            return {key.strip(): value.strip()}
-
-        show_dict = dict()
-
-        for line in output.split('\n'):
-            # skip empty and commented string
-            if not line or line.startswith("#"):
-                continue
-            show_dict.update(parse_line(line))
-
-        active_state = show_dict['ActiveState']
-        sub_state = show_dict['SubState']
+        state = self.status_cache.get(self.unit)
+        active_state = state.get('ActiveState')
+        sub_state = state.get('SubState')
         if active_state == 'active':
             return None
         self.log.info("State is: %s/%s", active_state, sub_state)
-        out = self.remote.sh(
-            # This will match a line like:
-            #    Main PID: 13394 (code=exited, status=1/FAILURE)
-            # Or (this is wrapped):
-            #    Apr 26 21:29:33 ovh083 systemd[1]: ceph-osd@1.service:
-            #    Main process exited, code=exited, status=1/FAILURE
-            self.status_cmd + " | grep 'Main.*code=exited'",
-        )
-        line = out.strip().split('\n')[-1]
-        exit_code = int(re.match(r'.*status=(\d+).*', line).groups()[0])
+        exit_code = int(state.get('ExecMainStatus') or 0)
         if exit_code:
             self.remote.run(
                 args=self.output_cmd
@@ -142,11 +245,15 @@ class SystemDState(DaemonState):
         :param kwargs: keyword arguments passed to remote.run
         """
         self.log.info('Restarting daemon using systemd')
+        # Only read-only queries are answered from the cache; what to do here
+        # depends on the unit's current state
+        self.status_cache.invalidate()
         if not self.running():
             self.log.info('starting a non-running daemon')
             self.remote.run(args=[run.Raw(self.start_cmd)])
         else:
             self.remote.run(args=[run.Raw(self.restart_cmd)])
+        self.status_cache.invalidate()
         # check status will also fail if the process hasn't restarted
         self.check_status()
 
@@ -166,10 +273,11 @@ class SystemDState(DaemonState):
         Are we running?
         :return: The PID if remote run command value is set, False otherwise.
         """
-        pid = self.pid
-        if pid is None:
+        state = self.status_cache.get(self.unit)
+        if state.get('ActiveState') != 'active':
             return None
-        elif pid <= 0:
+        pid = int(state.get('MainPID') or 0)
+        if pid <= 0:
             return None
         else:
             return pid
@@ -181,20 +289,24 @@ class SystemDState(DaemonState):
         :param sig: signal to send
         """
         self.log.warning("systemd may restart daemons automatically")
+        self.status_cache.invalidate()
         pid = self.pid
         self.log.info("Sending signal %s to process %s", sig, pid)
         sig = '-' + str(sig)
         self.remote.run(args=['sudo', 'kill', str(sig), str(pid)])
+        self.status_cache.invalidate()
 
     def start(self, timeout=300):
         """
         Start this daemon instance.
         """
+        self.status_cache.invalidate()
         if self.running():
             self.log.warning('Restarting a running daemon')
             self.restart()
             return
         self.remote.run(args=[run.Raw(self.start_cmd)])
+        self.status_cache.invalidate()
 
     def stop(self, timeout=300):
         """
@@ -205,10 +317,12 @@ class SystemDState(DaemonState):
 
         :param timeout: timeout to pass to orchestra.run.wait()
         """
+        self.status_cache.invalidate()
         if not self.running():
             self.log.error('tried to stop a non-running daemon')
             return
         self.remote.run(args=[run.Raw(self.stop_cmd)])
+        self.status_cache.invalidate()
         self.log.info('Stopped')
 
     # FIXME why are there two wait methods?
@@ -17,16 +17,85 @@ from teuthology.misc import host_shortname
 import errno
 import re
 import logging
+import shutil
 from io import BytesIO
 from io import StringIO
 import os
 import pwd
 import tempfile
+import uuid
 import netaddr
 
 log = logging.getLogger(__name__)
 
 
+class BatchResult(object):
+    """
+    The outcome of one of the commands passed to RemoteShell.run_batch()
+    """
+    def __init__(self, args, returncode, stdout, stderr):
+        self.args = args
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+
+    def __repr__(self):
+        return '{classname}(args={args!r}, returncode={rc!r})'.format(
+            classname=self.__class__.__name__,
+            args=self.args,
+            rc=self.returncode,
+        )
+
+
+def _batch_script(commands, boundary):
+    """
+    Build a shell script which runs each command in turn, and after each one
+    writes a header line with the boundary, exit status, and the lengths of
+    the command's stdout and stderr, followed by the stdout and stderr
+    themselves.
+    """
+    lines = [
+        'd=$(mktemp -d) || exit 1',
+        'trap \'rm -rf "$d"\' EXIT',
+    ]
+    for command in commands:
+        lines.extend([
+            '( {cmd} ) </dev/null >"$d/o" 2>"$d/e"; rc=$?'.format(
+                cmd=run.quote(command)),
+            'printf \'%s %d %d %d\\n\' {boundary} "$rc" '
+            '"$(wc -c <"$d/o")" "$(wc -c <"$d/e")"'.format(boundary=boundary),
+            'cat "$d/o" "$d/e"',
+        ])
+    lines.append('exit 0')
+    return '\n'.join(lines)
+
+
+def _parse_batch_output(data, boundary):
+    """
+    Split the output of a script built by _batch_script()
+
+    :returns: A list of (returncode, stdout, stderr) tuples
+    """
+    results = []
+    marker = boundary.encode()
+    pos = 0
+    while True:
+        start = data.find(marker, pos)
+        if start == -1:
+            break
+        end = data.index(b'\n', start)
+        _, rc, out_len, err_len = data[start:end].split()
+        out_start = end + 1
+        err_start = out_start + int(out_len)
+        pos = err_start + int(err_len)
+        results.append((
+            int(rc),
+            data[out_start:err_start].decode(errors='replace'),
+            data[err_start:pos].decode(errors='replace'),
+        ))
+    return results
+
+
 class RemoteShell(object):
     """
     Contains methods to run miscellaneous shell commands on remote machines.
@@ -101,6 +170,47 @@ class RemoteShell(object):
         else:
             return out
 
+    def run_batch(self, commands, check_status=True, **kwargs):
+        """
+        Run several commands using a single remote process, instead of
+        paying for a channel and a round trip per command.
+
+        Usage:
+            uname, uptime = remote.run_batch(['uname -r', ['cat', '/proc/uptime']])
+            uname.stdout, uname.stderr, uname.returncode
+
+        :param commands:     A list of commands, each a string or a list as
+                             accepted by run(). They are run in order, each
+                             with stdin closed, whether or not the previous
+                             ones succeeded.
+        :param check_status: If True, raise CommandFailedError for the first
+                             command that exited non-zero, after all of them
+                             have run.
+        :returns:            A list of BatchResult objects, one per command
+        """
+        boundary = 'teuthology-batch-{}'.format(uuid.uuid4().hex)
+        kwargs['args'] = ['bash', '-c', _batch_script(commands, boundary)]
+        kwargs['stdout'] = BytesIO()
+        proc = self.run(**kwargs)
+        parsed = _parse_batch_output(proc.stdout.getvalue(), boundary)
+        if len(parsed) != len(commands):
+            raise RuntimeError(
+                "Batch of {n} commands only produced {m} results".format(
+                    n=len(commands), m=len(parsed)))
+        results = [
+            BatchResult(command, rc, out, err)
+            for command, (rc, out, err) in zip(commands, parsed)
+        ]
+        if check_status:
+            for result in results:
+                if result.returncode != 0:
+                    raise CommandFailedError(
+                        command=run.quote(result.args),
+                        exitstatus=result.returncode,
+                        node=getattr(self, 'shortname', None),
+                    )
+        return results
+
     def sh_file(self, script, label="script", sudo=False, **kwargs):
         """
         Run shell script after copying its contents to a remote file
@@ -378,13 +488,16 @@ class Remote(RemoteShell):
         self.keep_alive = keep_alive
         self._console = console
         self.ssh = ssh
+        self._sftp = None
+        self._sftp_ssh = None
 
         if self._reimage_types is None:
             Remote._reimage_types = teuthology.provision.get_reimage_types()
 
     def connect(self, timeout=None, create_key=None, context='connect'):
         args = dict(user_at_host=self.name, host_key=self._host_key,
-                    keep_alive=self.keep_alive, _create_key=create_key)
+                    keep_alive=self.keep_alive, _create_key=create_key,
+                    reuse=True)
         if context == 'reconnect':
             # The reason for the 'context' workaround is not very
             # clear from the technical side.
@@ -392,19 +505,41 @@ class Remote(RemoteShell):
             # there are no open tcp(ssh) connections.
             # When connecting without keepalive, host_key and _create_key 
             # set, it will proceed.
-            args = dict(user_at_host=self.name, _create_key=False, host_key=None)
+            args = dict(user_at_host=self.name, _create_key=False, host_key=None,
+                        reuse=True)
         if timeout:
             args['timeout'] = timeout
 
-        self.ssh = connection.connect(**args)
+        old_ssh, self.ssh = self.ssh, connection.connect(**args)
+        if old_ssh is not None:
+            connection.release(old_ssh)
         return self.ssh
 
+    def close(self):
+        """
+        Give back this Remote's SSH connection. A connection shared with other
+        Remotes stays open until the last of them is closed.
+        """
+        self._close_sftp()
+        if self.ssh is not None:
+            connection.release(self.ssh)
+            self.ssh = None
+
     def reconnect(self, timeout=30, socket_timeout=None):
         """
         Attempts to re-establish connection. Returns True for success; False
-        for failure.
+        for failure. A connection which is still healthy is kept.
         """
         if self.ssh is not None:
+            # After a hard reboot the old transport may still look alive, and
+            # a command on it would hang until TCP gives up; don't wait for
+            # it longer than the caller was willing to wait for a reconnect
+            probe_timeout = min(timeout, 10) if timeout else 10
+            if connection.is_alive(self.ssh) and \
+                    self._responds(timeout=probe_timeout):
+                return True
+            self._close_sftp()
+            connection.forget(self.ssh)
             self.ssh.close()
         if not timeout:
             return self._reconnect(timeout=socket_timeout)
@@ -559,6 +694,17 @@ class Remote(RemoteShell):
             return False
         return self.ssh.get_transport().is_active()
 
+    def _responds(self, timeout):
+        """
+        :returns: Whether a trivial command completes over the current
+                  connection within timeout seconds
+        """
+        try:
+            self.run(args="true", timeout=timeout)
+        except Exception:
+            return False
+        return self.ssh.get_transport().is_active()
+
     def ensure_online(self):
         if self.is_online:
             return
@@ -611,24 +757,51 @@ class Remote(RemoteShell):
             raise exc
         return r
 
+    @property
+    def sftp(self):
+        """
+        A paramiko.SFTPClient for this remote. It is opened on first use and
+        reused until the SSH connection changes or the channel is closed.
+        """
+        sftp = self._sftp
+        if sftp is None or self._sftp_ssh is not self.ssh or \
+                sftp.sock.closed:
+            self._close_sftp()
+            self._sftp = sftp = self.ssh.open_sftp()
+            self._sftp_ssh = self.ssh
+        return sftp
+
+    def _close_sftp(self):
+        if self._sftp is not None:
+            try:
+                self._sftp.close()
+            except Exception:
+                log.debug("Failed to close SFTP session to %s",
+                          self.shortname, exc_info=True)
+        self._sftp = None
+        self._sftp_ssh = None
+
     def _sftp_put_file(self, local_path, remote_path):
         """
         Use the paramiko.SFTPClient to put a file. Returns the remote filename.
+        Writes are pipelined, so large files don't wait for each block to be
+        acknowledged.
         """
-        sftp = self.ssh.open_sftp()
-        sftp.put(local_path, remote_path)
+        self.sftp.put(local_path, remote_path)
         return
 
     def _sftp_get_file(self, remote_path, local_path):
         """
         Use the paramiko.SFTPClient to get a file. Returns the local filename.
+        The whole file is prefetched, so reads of large files are pipelined.
         """
-        file_size = self._format_size(
-            self._sftp_get_size(remote_path)
-        ).strip()
-        log.debug("{}:{} is {}".format(self.shortname, remote_path, file_size))
-        sftp = self.ssh.open_sftp()
-        sftp.get(remote_path, local_path)
+        with self.sftp.open(remote_path, 'rb') as remote_file:
+            size = remote_file.stat().st_size
+            log.debug("{}:{} is {}".format(
+                self.shortname, remote_path, self._format_size(size).strip()))
+            remote_file.prefetch(size)
+            with open(local_path, 'wb') as local_file:
+                shutil.copyfileobj(remote_file, local_file, 32768)
         return local_path
 
     def _sftp_open_file(self, remote_path, mode=None):
@@ -636,7 +809,7 @@ class Remote(RemoteShell):
         Use the paramiko.SFTPClient to open a file. Returns a
         paramiko.SFTPFile object.
         """
-        sftp = self.ssh.open_sftp()
+        sftp = self.sftp
         if mode:
             return sftp.open(remote_path, mode)
         return sftp.open(remote_path)
@@ -808,9 +981,60 @@ class Remote(RemoteShell):
                 self._init_system = 'systemd'
         return self._init_system
 
+    @property
+    def is_uefi(self):
+        """
+        Whether the remote booted in UEFI mode
+        """
+        if not hasattr(self, '_is_uefi'):
+            self._is_uefi = not bool(self.run(
+                args=['test', '-d', '/sys/firmware/efi'],
+                check_status=False,
+            ).returncode)
+        return self._is_uefi
+
+    def gather_facts(self):
+        """
+        Find out the remote's OS, architecture, kernel, boot mode, init system
+        and whether it is a container, all in one round trip. The os, arch,
+        is_container, init_system and is_uefi properties won't need to run
+        anything afterward.
+
+        :returns: A dict with those values, plus 'kernel' (the running
+                  kernel's release)
+        """
+        os_release, arch, kernel, container, systemctl, efi = self.run_batch(
+            [
+                'cat /etc/os-release || lsb_release -a',
+                ['uname', '-m'],
+                ['uname', '-r'],
+                'test -f /run/.containerenv -o -f /.dockerenv',
+                ['which', 'systemctl'],
+                ['test', '-d', '/sys/firmware/efi'],
+            ],
+            check_status=False,
+        )
+        if os_release.stdout.lstrip().startswith('Distributor ID'):
+            self._os = OS.from_lsb_release(os_release.stdout.strip())
+        else:
+            self._os = OS.from_os_release(os_release.stdout.strip())
+        self._arch = arch.stdout.strip()
+        self._is_container = container.returncode == 0
+        self._init_system = 'systemd' if systemctl.returncode == 0 else None
+        self._is_uefi = efi.returncode == 0
+        return dict(
+            os=self._os,
+            arch=self._arch,
+            kernel=kernel.stdout.strip(),
+            is_container=self._is_container,
+            init_system=self._init_system,
+            is_uefi=self._is_uefi,
+        )
+
     def __del__(self):
-        if self.ssh is not None:
-            self.ssh.close()
+        if getattr(self, '_sftp', None) is not None or \
+                getattr(self, 'ssh', None) is not None:
+            self.close()
 
 
 def getRemoteConsole(name, ipmiuser=None, ipmipass=None, ipmidomain=None,
@@ -2,9 +2,11 @@
 Paramiko run support
 """
 
+import codecs
 import io
 
 from paramiko import ChannelFile
+from paramiko.channel import ChannelStderrFile
 
 import gevent
 import gevent.event
@@ -13,9 +15,8 @@ import shlex
 import logging
 import shutil
 
-from teuthology.contextutil import safe_while
 from teuthology.exceptions import (CommandCrashedError, CommandFailedError,
-                                   ConnectionLostError)
+                                   ConnectionLostError, MaxWhileTries)
 
 log = logging.getLogger(__name__)
 
@@ -114,7 +115,8 @@ class RemoteProcess(object):
             # FIXME: Is this actually true?
             raise RuntimeError(self.deadlock_warning % 'stdin')
 
-    def setup_output_stream(self, stream_obj, stream_name, quiet=False):
+    def setup_output_stream(self, stream_obj, stream_name, quiet=False,
+                            raw=None):
         if stream_obj is not PIPE:
             # Log the stream
             host_log = self.logger.getChild(self.hostname)
@@ -126,6 +128,7 @@ class RemoteProcess(object):
                     stream_log,
                     stream_obj,
                     quiet,
+                    raw,
                 )
             )
             setattr(self, stream_name, stream_obj)
@@ -265,21 +268,105 @@ def quote(args):
         return args
 
 
-def copy_to_log(f, logger, loglevel=logging.INFO, capture=None, quiet=False):
+# The most bytes copy_to_log() reads from a stream at once
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+def _read_chunks(f, size=COPY_CHUNK_SIZE):
+    """
+    Get an iterator over whatever data is available from f, up to size bytes
+    at a time, without waiting for a full chunk to arrive.
+
+    :returns: None if f can't be read this way
+    """
+    # BufferedFile.read(size) waits until it has size bytes, so read from
+    # the channel itself, a single recv() at a time. This bypasses the
+    # ChannelFile's buffer, so it must not have been read from already.
+    if isinstance(f, ChannelStderrFile):
+        read = f.channel.recv_stderr
+    elif isinstance(f, ChannelFile):
+        read = f.channel.recv
+    elif hasattr(f, 'read1') and not isinstance(f, io.TextIOBase):
+        read = f.read1
+    else:
+        return None
+
+    def chunks():
+        while True:
+            chunk = read(size)
+            if not chunk:
+                return
+            yield chunk
+    return chunks()
+
+
+def copy_to_log(f, logger, loglevel=logging.INFO, capture=None, quiet=False,
+                raw=None):
     """
     Copy line by line from file in f to the log from logger
 
+    Binary streams are read in chunks of up to COPY_CHUNK_SIZE bytes, which
+    are split into lines and decoded all at once. This is much cheaper for
+    commands with a lot of output than handling one line at a time.
+
     :param f: source stream object
     :param logger: the destination logger object
     :param loglevel: the level of logging data
     :param capture: an optional stream object for data copy
     :param quiet: suppress `logger` usage if True, this is useful only
                   in combination with `capture`, defaults False
+    :param raw: an optional binary file object which receives the output
+                exactly as it was read, e.g. a per-host log file. Channel
+                files must not have been read from before.
     """
     # Work-around for http://tracker.ceph.com/issues/8313
     if isinstance(f, ChannelFile):
         f._flags += ChannelFile.FLAG_BINARY
+    chunks = _read_chunks(f)
+    if chunks is None:
+        _copy_lines_to_log(f, logger, loglevel, capture, quiet, raw)
+        return
+    decoder = None
+    if isinstance(capture, io.StringIO):
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    log_lines = not quiet and logger.isEnabledFor(loglevel)
+    partial = b''
+    for chunk in chunks:
+        if raw is not None:
+            raw.write(chunk)
+        if decoder is not None:
+            capture.write(decoder.decode(chunk))
+        elif isinstance(capture, io.BytesIO):
+            capture.write(chunk)
+        if not log_lines:
+            continue
+        lines = (partial + chunk).split(b'\n')
+        partial = lines.pop()
+        if lines:
+            _log_lines(logger, loglevel, b'\n'.join(lines))
+    if decoder is not None:
+        capture.write(decoder.decode(b'', final=True))
+    if log_lines and partial:
+        _log_lines(logger, loglevel, partial)
+
+
+def _log_lines(logger, loglevel, data):
+    """
+    Log each line of data as its own record. The records are created
+    directly, because finding the caller for each one, as Logger.log()
+    does, is most of the cost of logging; our log format doesn't use it.
+    """
+    for line in data.decode('utf-8', 'replace').split('\n'):
+        logger.handle(logger.makeRecord(
+            logger.name, loglevel, '(unknown file)', 0, line.rstrip(),
+            None, None,
+        ))
+
+
+def _copy_lines_to_log(f, logger, loglevel, capture, quiet, raw):
     for line in f:
+        if raw is not None:
+            raw.write(line if isinstance(line, bytes) else line.encode())
         if capture:
             if isinstance(capture, io.StringIO):
                 if isinstance(line, str):
@@ -316,7 +403,7 @@ def copy_and_close(src, fdst):
     fdst.close()
 
 
-def copy_file_to(src, logger, stream=None, quiet=False):
+def copy_file_to(src, logger, stream=None, quiet=False, raw=None):
     """
     Copy file
     :param src: file to be copied.
@@ -325,8 +412,10 @@ def copy_file_to(src, logger, stream=None, quiet=False):
                    a copy of src.
     :param quiet: disable logger usage if True, useful in combination
                   with `stream` parameter, defaults False.
+    :param raw: an optional binary file object which receives the output
+                unchanged
     """
-    copy_to_log(src, logger, capture=stream, quiet=quiet)
+    copy_to_log(src, logger, capture=stream, quiet=quiet, raw=raw)
 
 def spawn_asyncresult(fn, *args, **kwargs):
     """
@@ -338,6 +427,16 @@ def spawn_asyncresult(fn, *args, **kwargs):
     gevent, even when ``.link_exception`` has been called. Using an
     AsyncResult avoids this.
     """
+    return _spawn_asyncresult(fn, *args, **kwargs)[1]
+
+
+def _spawn_asyncresult(fn, *args, **kwargs):
+    """
+    Like spawn_asyncresult(), but also return the Greenlet, so that the
+    caller can kill it.
+
+    :returns: A (Greenlet, AsyncResult) tuple
+    """
     r = gevent.event.AsyncResult()
 
     def wrapper():
@@ -350,9 +449,8 @@ def spawn_asyncresult(fn, *args, **kwargs):
             r.set_exception(e)
         else:
             r.set(value)
-    gevent.spawn(wrapper)
 
-    return r
+    return gevent.spawn(wrapper), r
 
 
 class Sentinel(object):
@@ -400,6 +498,7 @@ def run(
     quiet=False,
     timeout=None,
     cwd=None,
+    raw_output=None,
     # omit_sudo is used by vstart_runner.py
     omit_sudo=False
 ):
@@ -435,6 +534,9 @@ def run(
     :param timeout: timeout value for args to complete on remote channel of
                     paramiko
     :param cwd: Directory in which the command should be executed.
+    :param raw_output: A binary file object, e.g. a per-host log file, which
+                       also receives the command's stdout and stderr exactly
+                       as they are read, unless they are `PIPE`.
     """
     try:
         transport = client.get_transport()
@@ -455,31 +557,52 @@ def run(
                       cwd=cwd)
     r.execute()
     r.setup_stdin(stdin)
-    r.setup_output_stream(stderr, 'stderr', quiet)
-    r.setup_output_stream(stdout, 'stdout', quiet)
+    r.setup_output_stream(stderr, 'stderr', quiet, raw_output)
+    r.setup_output_stream(stdout, 'stdout', quiet, raw_output)
     if wait:
         r.wait()
     return r
 
 
-def wait(processes, timeout=None):
+def wait(processes, timeout=None, fail_fast=False):
     """
     Wait for all given processes to exit.
 
-    Raise if any one of them fails.
+    Raise if any one of them fails. Unless fail_fast is set, that happens
+    once all of them have exited, and the exception raised is that of the
+    first failed process in the order given.
+
+    Each process is waited for in its own greenlet, so this returns as soon
+    as the last one exits.
 
-    Optionally, timeout after 'timeout' seconds.
+    Optionally, timeout after 'timeout' seconds, raising MaxWhileTries.
+
+    :param fail_fast: Raise as soon as any process fails, without waiting
+                      for the rest
     """
+    processes = list(processes)
     if timeout:
         log.info("waiting for %d", timeout)
-    if timeout and timeout > 0:
-        with safe_while(tries=(timeout // 6)) as check_time:
-            not_ready = list(processes)
-            while len(not_ready) > 0:
-                check_time()
-                for proc in list(not_ready):
-                    if proc.finished:
-                        not_ready.remove(proc)
-
+    if not timeout or timeout < 0:
+        timeout = None
+    greenlets, results = [], []
     for proc in processes:
-        proc.wait()
+        greenlet, result = _spawn_asyncresult(proc.wait)
+        greenlets.append(greenlet)
+        results.append(result)
+    pending = set(results)
+    try:
+        for result in gevent.iwait(results, timeout=timeout):
+            pending.discard(result)
+            if fail_fast and not result.successful():
+                result.get()
+        if pending:
+            raise MaxWhileTries(
+                "{n} of {total} processes still running after {timeout}s"
+                .format(n=len(pending), total=len(processes),
+                        timeout=timeout))
+    finally:
+        # Don't leave anything waiting on the processes we gave up on
+        gevent.killall(greenlets)
+    for result in results:
+        result.get()
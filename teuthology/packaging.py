@@ -20,6 +20,7 @@ from teuthology.exceptions import (VersionNotFoundError, CommitNotFoundError,
 from teuthology.misc import sudo_write_file
 from teuthology.orchestra.opsys import OS, DEFAULT_OS_VERSION
 from teuthology.orchestra.run import Raw
+from teuthology.util import http
 
 log = logging.getLogger(__name__)
 
@@ -451,7 +452,7 @@ def _get_config_value_for_remote(ctx, remote, config, key):
 def _get_response(url, wait=False, sleep=15, tries=10):
     with safe_while(sleep=sleep, tries=tries, _raise=False) as proceed:
         while proceed():
-            resp = requests.get(url)
+            resp = http.get(url)
             if resp.ok:
                 log.info('Package found...')
                 break
@@ -805,7 +806,7 @@ class GitbuilderProject(object):
         """
         url = "{0}/sha1".format(self.base_url)
         log.info("Looking for package sha1: {0}".format(url))
-        resp = requests.get(url)
+        resp = http.get(url)
         sha1 = None
         if not resp.ok:
             # TODO: maybe we should have this retry a few times?
@@ -930,7 +931,7 @@ class ShamanProject(GitbuilderProject):
     def _search(self):
         uri = self._search_uri
         log.debug("Querying %s", uri)
-        resp = requests.get(
+        resp = http.get(
             uri,
             headers={'content-type': 'application/json'},
         )
@@ -1049,7 +1050,7 @@ class ShamanProject(GitbuilderProject):
         build_url = urljoin(self.query_url, path)
 
         try:
-            resp = requests.get(build_url)
+            resp = http.get(build_url)
             resp.raise_for_status()
         except requests.HttpError:
             return False
@@ -1070,7 +1071,7 @@ class ShamanProject(GitbuilderProject):
         return False
 
     def _get_repo(self):
-        resp = requests.get(self.repo_url)
+        resp = http.get(self.repo_url)
         resp.raise_for_status()
         return str(resp.text)
 
@@ -1221,7 +1222,7 @@ class PulpProject(GitbuilderProject):
     def _search(self):
         """Search for the package in the pulp api"""
         labels = self._search_labels
-        resp = requests.get(
+        resp = http.get(
             self._search_uri,
             params={'pulp_label_select': labels},
             auth=(self.pulp_username, self.pulp_password)
@@ -1,5 +1,6 @@
 import logging
 import sys
+import time
 
 import gevent
 import gevent.pool
@@ -58,21 +59,50 @@ class parallel(object):
     At the end of the with block, the main thread waits until all
     spawned functions have completed, or, if one exited with an exception,
     kills the rest and raises the exception.
+
+    To limit how many of the functions run at once, pass max_concurrency;
+    spawn() then blocks until one of the running functions finishes::
+
+        with parallel(max_concurrency=10) as p:
+            ...
+
+    How long each function took is logged, and kept in the timings list as
+    (name, seconds) tuples, in the order the functions finished.
     """
 
-    def __init__(self):
-        self.group = gevent.pool.Group()
+    def __init__(self, max_concurrency=None):
+        if max_concurrency:
+            self.group = gevent.pool.Pool(max_concurrency)
+        else:
+            self.group = gevent.pool.Group()
         self.results = gevent.queue.Queue()
         self.count = 0
         self.any_spawned = False
         self.iteration_stopped = False
+        self.timings = list()
 
     def spawn(self, func, *args, **kwargs):
         self.count += 1
         self.any_spawned = True
-        greenlet = self.group.spawn(capture_traceback, func, *args, **kwargs)
+        greenlet = self.group.spawn(
+            self._timed, func, *args, **kwargs)
         greenlet.link(self._finish)
 
+    def _timed(self, func, *args, **kwargs):
+        # Only string arguments (usually hostnames or roles) are included;
+        # anything else may be expensive to repr()
+        name = '{}({})'.format(
+            getattr(func, '__name__', repr(func)),
+            ', '.join(repr(a) for a in args if isinstance(a, str)),
+        )
+        start = time.monotonic()
+        try:
+            return capture_traceback(func, *args, **kwargs)
+        finally:
+            elapsed = time.monotonic() - start
+            self.timings.append((name, elapsed))
+            log.debug('%s finished in %.2fs', name, elapsed)
+
     def __enter__(self):
         return self
 
@@ -113,3 +143,40 @@ class parallel(object):
         self.count -= 1
         if self.count <= 0:
             self.results.put(StopIteration())
+
+
+def parallel_map(func, items, *args, concurrency=None,
+                 return_exceptions=False, **kwargs):
+    """
+    Call func(item, *args, **kwargs) for each item concurrently, and return
+    the results in the same order as items::
+
+        outputs = parallel_map(lambda rem: rem.sh('uptime'), remotes)
+
+    :param concurrency:       The most calls to run at once. The default is
+                              to run all of them at once.
+    :param return_exceptions: If True, the exception raised by a call is
+                              put in place of its result. Otherwise, once all
+                              calls have finished, the exception from the
+                              first failed call (in the order of items) is
+                              raised.
+    :returns:                 A list of results
+    """
+    if concurrency:
+        pool = gevent.pool.Pool(concurrency)
+    else:
+        pool = gevent.pool.Group()
+    greenlets = [
+        pool.spawn(capture_traceback, func, item, *args, **kwargs)
+        for item in items
+    ]
+    gevent.joinall(greenlets)
+    results = list()
+    for greenlet in greenlets:
+        result = greenlet.value
+        if isinstance(result, ExceptionHolder):
+            if not return_exceptions:
+                resurrect_traceback(result)
+            result = result.exc_info[1]
+        results.append(result)
+    return results
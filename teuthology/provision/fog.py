@@ -1,7 +1,6 @@
 import datetime
 import json
 import logging
-import requests
 import socket
 import re
 
@@ -15,9 +14,14 @@ from teuthology.contextutil import safe_while
 from teuthology.exceptions import MaxWhileTries
 from teuthology.orchestra.opsys import OS
 from teuthology import misc
+from teuthology.util import http
+from teuthology.util.ttlcache import TTLCache
 
 log = logging.getLogger(__name__)
 
+# Image lookups, shared by all of the nodes being reimaged by this process
+_image_cache = TTLCache()
+
 
 def enabled(warn=False):
     """
@@ -114,13 +118,11 @@ class FOG(object):
         )
         if data is not None:
             req_kwargs['data'] = data
-        req = requests.Request(
+        resp = http.request(
             method,
             config.fog['endpoint'] + url_suffix,
             **req_kwargs
         )
-        prepped = req.prepare()
-        resp = requests.Session().send(prepped)
         if not resp.ok:
             self.log.error(f"Got status {resp.status_code} from {url_suffix}: '{resp.text}'")
         if verify:
@@ -148,9 +150,25 @@ class FOG(object):
     def get_image_data(self):
         """
         Locate the image we want to use, and return the FOG object which
-        represents it
+        represents it. The result is shared with every other FOG object in
+        this process deploying the same image, for image_cache_ttl seconds.
         :returns: A dict describing the image
         """
+        key = (
+            config.fog['endpoint'],
+            self.remote.machine_type,
+            self.os_type.lower(),
+            self.os_version,
+        )
+        image, self.resolved_os_version = _image_cache.get(
+            key, self._find_image, config.image_cache_ttl)
+        return image
+
+    def _find_image(self):
+        """
+        Ask FOG for the image get_image_data() should return
+        :returns: A tuple of the image dict and the resolved OS version
+        """
         def do_get(name):
             resp = self.do_request(
                 '/image',
@@ -164,7 +182,7 @@ class FOG(object):
         os_version = self.os_version
         name = f"{self.remote.machine_type}_{os_type}_{os_version}"
         if image := do_get(name):
-            return image
+            return image, self.resolved_os_version
         if os_type == 'centos' and not os_version.endswith('.stream'):
             image = do_get(f"{name}.stream")
         elif '.' not in os_version:
@@ -172,7 +190,7 @@ class FOG(object):
             # image for; the deploy is verified against that exact minor
             image = self._latest_minor_image(name)
         if image:
-            return image
+            return image, self.resolved_os_version
         raise RuntimeError(
             "Fog has no %s image. Available %s images: %s" %
             (name, self.remote.machine_type, self.suggest_image_names()))
@@ -13,10 +13,18 @@ from teuthology.config import config
 from teuthology.contextutil import safe_while
 from teuthology.orchestra.opsys import OS
 from teuthology import misc
+from teuthology.util import http
+from teuthology.util.ttlcache import TTLCache
 from requests.exceptions import HTTPError
 
 log = logging.getLogger(__name__)
 
+# MAAS API key -> OAuth1Session, shared by every MAAS object in this process
+_sessions = dict()
+# The MAAS server's boot resources, shared by all of the nodes being
+# reimaged by this process
+_image_cache = TTLCache()
+
 
 def enabled(warn: bool = False) -> bool:
     """Check for required MAAS settings
@@ -69,7 +77,8 @@ def get_types() -> List[str]:
 
 
 def get_session() -> OAuth1Session:
-    """Create an OAuth1Session for communicating with the MAAS server
+    """Get the OAuth1Session for communicating with the MAAS server, creating
+    it on first use
 
     :returns: OAuth1Session: An authenticated session object configured with the
                 MAAS API key credentials
@@ -77,13 +86,17 @@ def get_session() -> OAuth1Session:
     if not enabled():
         raise RuntimeError("MAAS is not configured!")
 
-    key, token, secret = config.maas["api_key"].split(":")
-    return OAuth1Session(
-        key,
-        resource_owner_key=token,
-        resource_owner_secret=secret,
-        signature_method=SIGNATURE_PLAINTEXT
-    )
+    api_key = config.maas["api_key"]
+    session = _sessions.get(api_key)
+    if session is None:
+        key, token, secret = api_key.split(":")
+        session = _sessions[api_key] = http.configure_session(OAuth1Session(
+            key,
+            resource_owner_key=token,
+            resource_owner_secret=secret,
+            signature_method=SIGNATURE_PLAINTEXT
+        ))
+    return session
 
 
 class MAAS(object):
@@ -137,6 +150,7 @@ class MAAS(object):
         args["data"] = json.dumps(data) if data else None
         args["params"] = params if params else None
         args["files"] = files if files else None
+        args["timeout"] = config.http_timeout
 
         resp: Optional[Response] = None
         method_upper = method.upper()
@@ -204,13 +218,15 @@ class MAAS(object):
         return f"{self.os_type}/{self.os_version}"
 
     def get_image_data(self) -> Dict[str, Any]:
-        """Locate the image we want to use
+        """Locate the image we want to use. The list of images is shared with
+        every other MAAS object in this process for image_cache_ttl seconds.
 
         :returns: The image data as a dictionary
         """
-        resp = self.do_request("/boot-resources/").json()
-        if len(resp) == 0:
-            raise RuntimeError("MaaS has no images available")
+        resp = _image_cache.get(
+            config.maas["api_url"], self._get_boot_resources,
+            config.image_cache_ttl,
+        )
 
         name = self.get_image_name()
         for image in resp:
@@ -218,6 +234,16 @@ class MAAS(object):
                 return image
         raise RuntimeError(f"MaaS has no {name} image available")
 
+    def _get_boot_resources(self) -> List[Dict[str, Any]]:
+        """Fetch the list of images from the MAAS server
+
+        :returns: A list of image data dictionaries
+        """
+        resp = self.do_request("/boot-resources/").json()
+        if len(resp) == 0:
+            raise RuntimeError("MaaS has no images available")
+        return resp
+
     def lock_machine(self) -> None:
         """Lock the machine"""
         resp = self.do_request(
@@ -2,7 +2,6 @@ import copy
 import functools
 import logging
 import os
-import requests
 import smtplib
 import socket
 from subprocess import Popen, PIPE, DEVNULL
@@ -22,6 +21,7 @@ from teuthology.orchestra.opsys import OS, DEFAULT_OS_VERSION
 from teuthology.packaging import get_builder_project, VersionNotFoundError
 from teuthology.repo_utils import build_git_url
 from teuthology.task.install import get_flavor
+from teuthology.util import http
 
 log = logging.getLogger(__name__)
 
@@ -183,7 +183,7 @@ def git_validate_sha1(project, sha1, project_owner='ceph'):
             'git_validate_sha1: how do I check %s for a sha1?' % url
         )
 
-    resp = requests.head(url)
+    resp = http.head(url)
     if resp.ok:
         return sha1
     return None
@@ -218,7 +218,7 @@ def get_branch_info(project, branch, project_owner='ceph'):
     url_templ = 'https://api.github.com/repos/{project_owner}/{project}/git/refs/heads/{branch}'  # noqa
     url = url_templ.format(project_owner=project_owner, project=project,
                            branch=branch)
-    resp = requests.get(url)
+    resp = http.get(url)
     if resp.ok:
         return resp.json()
 
@@ -350,7 +350,7 @@ def find_git_parents(project: str, sha1: str, count=1):
     def refresh():
         url = f"{base_url}/{project}.git/refresh"
         log.info(f"Forcing refresh of git mirror: {url}")
-        resp = requests.get(url)
+        resp = http.get(url)
         if not resp.ok:
             log.error('git refresh failed for %s: %s',
                       project, resp.content.decode())
@@ -358,7 +358,7 @@ def find_git_parents(project: str, sha1: str, count=1):
     def get_sha1s(project, committish, count):
         url = f"{base_url}/{project}.git/history?committish={committish}&count={count}"
         log.info(f"Looking for parent commits: {url}")
-        resp = requests.get(url)
+        resp = http.get(url)
         resp.raise_for_status()
         sha1s = resp.json()['sha1s']
         if len(sha1s) != count:
@@ -23,6 +23,7 @@ from teuthology.config import config as teuth_config
 from teuthology.exceptions import ConfigError, VersionNotFoundError
 from teuthology.job_status import get_status, set_status
 from teuthology.orchestra import cluster, remote, run
+from teuthology.parallel import parallel, parallel_map
 # the below import with noqa is to workaround run.py which does not support multilevel submodule import
 from teuthology.task.internal.redhat import (setup_cdn_repo, setup_base_repo,            # noqa
                                              setup_additional_repo,                      # noqa
@@ -30,6 +31,9 @@ from teuthology.task.internal.redhat import (setup_cdn_repo, setup_base_repo,
 
 log = logging.getLogger(__name__)
 
+# The most nodes to transfer archived logs from at once
+ARCHIVE_CONCURRENCY = 10
+
 
 @contextlib.contextmanager
 def base(ctx, config):
@@ -175,23 +179,37 @@ def connect(ctx, config):
     Connect to all remotes in ctx.cluster
     """
     log.info('Opening connections...')
-    for rem in ctx.cluster.remotes.keys():
+
+    def connect_one(rem):
         log.debug('connecting to %s', rem.name)
+        start = time.time()
         rem.connect()
+        log.info('connected to %s in %.1fs', rem.name, time.time() - start)
+        # Later tasks ask each remote for its OS, architecture and so on
+        # many times; find all of that out now, in one round trip
+        try:
+            rem.gather_facts()
+        except Exception:
+            log.warning('Could not gather facts from %s', rem.name,
+                        exc_info=True)
+
+    with parallel() as p:
+        for rem in ctx.cluster.remotes.keys():
+            p.spawn(connect_one, rem)
 
 
 def push_inventory(ctx, config):
     if not teuth_config.lock_server:
         return
 
-    def push():
-        for rem in ctx.cluster.remotes.keys():
-            info = rem.inventory_info
-            teuthology.lock.ops.update_inventory(info)
-    try:
-        push()
-    except Exception:
-        log.exception("Error pushing inventory")
+    def push(rem):
+        teuthology.lock.ops.update_inventory(rem.inventory_info)
+
+    remotes = list(ctx.cluster.remotes.keys())
+    results = parallel_map(push, remotes, return_exceptions=True)
+    for rem, result in zip(remotes, results):
+        if isinstance(result, Exception):
+            log.error("Error pushing inventory for %s: %r", rem, result)
 
 BUILDPACKAGES_FIRST = 0
 BUILDPACKAGES_OK = 1
@@ -365,7 +383,7 @@ def fetch_binaries_for_coredumps(path, remote):
 
 
 def gzip_if_too_large(compress_min_size, src, tarinfo, local_path):
-    if tarinfo.size >= compress_min_size:
+    if tarinfo.size >= compress_min_size and not local_path.endswith('.gz'):
         with gzip.open(local_path + '.gz', 'wb') as dest:
             shutil.copyfileobj(src, dest)
     else:
@@ -403,23 +421,39 @@ def archive(ctx, config):
             logdir = os.path.join(ctx.archive, 'remote')
             if (not os.path.exists(logdir)):
                 os.mkdir(logdir)
-            for rem in ctx.cluster.remotes.keys():
+            min_size_option = ctx.config.get('log-compress-min-size',
+                                             '128MB')
+            try:
+                compress_min_size_bytes = \
+                    humanfriendly.parse_size(min_size_option)
+            except humanfriendly.InvalidSize:
+                msg = 'invalid "log-compress-min-size": {}'.format(min_size_option)
+                log.error(msg)
+                raise ConfigError(msg)
+            maybe_compress = functools.partial(gzip_if_too_large,
+                                               compress_min_size_bytes)
+
+            def transfer(rem):
                 path = os.path.join(logdir, rem.shortname)
-                min_size_option = ctx.config.get('log-compress-min-size',
-                                                 '128MB')
-                try:
-                    compress_min_size_bytes = \
-                        humanfriendly.parse_size(min_size_option)
-                except humanfriendly.InvalidSize:
-                    msg = 'invalid "log-compress-min-size": {}'.format(min_size_option)
-                    log.error(msg)
-                    raise ConfigError(msg)
-                maybe_compress = functools.partial(gzip_if_too_large,
-                                                   compress_min_size_bytes)
-                misc.pull_directory(rem, archive_dir, path, maybe_compress)
+                # Compress large files on the remote, where there are
+                # usually idle CPUs, so they cross the network compressed;
+                # anything left over is compressed locally.
+                start = time.time()
+                misc.gzip_remote_files(rem, archive_dir,
+                                       min_size=compress_min_size_bytes)
+                size = misc.pull_directory(rem, archive_dir, path,
+                                           maybe_compress)
+                elapsed = time.time() - start
+                log.info('Transferred %s from %s in %.1fs (%s/s)',
+                         humanfriendly.format_size(size), rem.shortname,
+                         elapsed,
+                         humanfriendly.format_size(size / max(elapsed, 0.001)))
                 # Check for coredumps and pull binaries
                 fetch_binaries_for_coredumps(path, rem)
 
+            parallel_map(transfer, ctx.cluster.remotes.keys(),
+                         concurrency=ARCHIVE_CONCURRENCY)
+
         log.info('Removing archive directory...')
         run.wait(
             ctx.cluster.run(
@@ -511,10 +545,16 @@ def coredump(ctx, config):
 
         # set status = 'fail' if the dir is still there = coredumps were
         # seen
-        for rem in cluster.remotes.keys():
-            try:
-                rem.sh("test -e " + archive_dir + "/coredump")
-            except run.CommandFailedError:
+        remotes = list(cluster.remotes.keys())
+        found = parallel_map(
+            lambda rem: rem.run(
+                args=['test', '-e', archive_dir + '/coredump'],
+                check_status=False,
+            ).returncode == 0,
+            remotes,
+        )
+        for rem, has_coredumps in zip(remotes, found):
+            if not has_coredumps:
                 continue
             log.warning('Found coredumps on %s, flagging run as failed', rem)
             set_status(ctx.summary, 'fail')
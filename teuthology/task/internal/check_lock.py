@@ -16,10 +16,12 @@ def check_lock(ctx, config, check_up=True):
         log.info('Lock checking disabled.')
         return
     log.info('Checking locks...')
+    statuses = teuthology.lock.query.get_status_many(
+        ctx.config['targets'].keys(), ctx.config.get('machine_type'))
     for machine in ctx.config['targets'].keys():
-        status = teuthology.lock.query.get_status(machine)
+        status = statuses.get(machine)
         log.debug('machine status is %s', repr(status))
-        assert status is not None, \
+        assert status, \
             'could not read lock status for {name}'.format(name=machine)
         if check_up:
             assert status['up'], 'machine {name} is marked down'.format(
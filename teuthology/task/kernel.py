@@ -903,8 +903,7 @@ def update_grub_rpm(remote, newversion):
 def _kernel_is_uefi(remote):
     """Return True if the remote is booted in UEFI mode."""
     try:
-        remote.run(args=['test', '-d', '/sys/firmware/efi'])
-        return True
+        return remote.is_uefi
     except Exception:
         return False
 
@@ -1,22 +1,49 @@
+import errno
 import fcntl
 
 
 class FileLock(object):
-    def __init__(self, filename, noop=False):
+    def __init__(self, filename, noop=False, blocking=True):
         self.filename = filename
         self.file = None
         self.noop = noop
+        self.blocking = blocking
 
-    def __enter__(self):
-        if not self.noop:
-            assert self.file is None
-            self.file = open(self.filename, 'w')
-            fcntl.lockf(self.file, fcntl.LOCK_EX)
-        return self
+    def acquire(self):
+        """
+        :returns: True if the lock was taken. If blocking is False and
+                  another process holds the lock, returns False instead of
+                  waiting for it.
+        """
+        if self.noop:
+            return True
+        assert self.file is None
+        self.file = open(self.filename, 'w')
+        flags = fcntl.LOCK_EX
+        if not self.blocking:
+            flags |= fcntl.LOCK_NB
+        try:
+            fcntl.lockf(self.file, flags)
+        except OSError as e:
+            self.file.close()
+            self.file = None
+            if e.errno in (errno.EACCES, errno.EAGAIN):
+                return False
+            raise
+        return True
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
+    def release(self):
         if not self.noop:
             assert self.file is not None
             fcntl.lockf(self.file, fcntl.LOCK_UN)
             self.file.close()
             self.file = None
+
+    def __enter__(self):
+        if not self.acquire():
+            raise BlockingIOError(
+                errno.EAGAIN, "Lock is held", self.filename)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
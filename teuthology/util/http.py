@@ -0,0 +1,143 @@
+"""
+Shared HTTP sessions for talking to the lock server, paddles, shaman, FOG and
+the like.
+
+Requests made through this module to the same scheme://host:port all use one
+requests.Session, so connections are kept alive and reused instead of paying
+for a new TCP connection and TLS handshake every time. Requests which fail
+to connect are retried with a backoff, and every request gets a timeout
+unless the caller passes its own.
+"""
+import logging
+import threading
+import time
+
+import requests
+
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+from urllib3.util.retry import Retry
+
+from teuthology.config import config
+
+log = logging.getLogger(__name__)
+
+# The most connections to keep open to a single server
+POOL_SIZE = 32
+# How many times to retry a request which could not connect. Requests which
+# reached the server are never retried here; a POST may not be idempotent.
+CONNECT_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+
+# scheme://host:port -> requests.Session
+_sessions = dict()
+_sessions_lock = threading.Lock()
+_hooks = list()
+
+
+def base_url(url):
+    """
+    :returns: The scheme://host:port part of url
+    """
+    parts = urlsplit(url)
+    return '{0}://{1}'.format(parts.scheme, parts.netloc)
+
+
+def make_session():
+    """
+    :returns: A new requests.Session with our pooling and retry settings
+    """
+    return configure_session(requests.Session())
+
+
+def configure_session(session):
+    """
+    Apply our pooling and retry settings to an existing session, e.g. one
+    which handles authentication
+
+    :returns: session
+    """
+    retry = Retry(
+        total=CONNECT_RETRIES,
+        connect=CONNECT_RETRIES,
+        read=False,
+        status=0,
+        backoff_factor=BACKOFF_FACTOR,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=POOL_SIZE,
+        max_retries=retry,
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session(url):
+    """
+    :returns: The requests.Session shared by every request to url's server
+    """
+    key = base_url(url)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = make_session()
+    return session
+
+
+def add_hook(func):
+    """
+    Call func(method, url, status_code, seconds) after every request made
+    through this module, e.g. to record metrics. status_code is None if the
+    request raised an exception.
+    """
+    _hooks.append(func)
+
+
+def remove_hook(func):
+    _hooks.remove(func)
+
+
+def request(method, url, **kwargs):
+    """
+    Like requests.request(), but using the shared session for url's server.
+    The timeout defaults to the http_timeout config option.
+
+    :returns: A requests.Response
+    """
+    kwargs.setdefault('timeout', config.http_timeout)
+    status_code = None
+    start = time.monotonic()
+    try:
+        response = get_session(url).request(method, url, **kwargs)
+        status_code = response.status_code
+        return response
+    finally:
+        elapsed = time.monotonic() - start
+        for hook in list(_hooks):
+            try:
+                hook(method, url, status_code, elapsed)
+            except Exception:
+                log.exception("HTTP hook %r failed", hook)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def head(url, **kwargs):
+    kwargs.setdefault('allow_redirects', False)
+    return request('HEAD', url, **kwargs)
+
+
+def post(url, data=None, **kwargs):
+    return request('POST', url, data=data, **kwargs)
+
+
+def put(url, data=None, **kwargs):
+    return request('PUT', url, data=data, **kwargs)
+
+
+def delete(url, **kwargs):
+    return request('DELETE', url, **kwargs)
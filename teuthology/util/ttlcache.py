@@ -0,0 +1,40 @@
+import collections
+import threading
+import time
+
+
+class TTLCache(object):
+    """
+    A per-process cache whose entries expire a given number of seconds after
+    they are stored.
+
+    When several callers ask for the same missing key at once, e.g. parallel
+    reimages looking up the same image, only the first one computes it; the
+    others wait for and share its result. Exceptions aren't cached.
+    """
+    def __init__(self):
+        # key -> (expiry time, value)
+        self._entries = dict()
+        self._locks = collections.defaultdict(threading.Lock)
+
+    def get(self, key, func, ttl, *args, **kwargs):
+        """
+        :param key:  The key to look up
+        :param func: Called with args and kwargs to compute the value if the
+                     key is missing or expired
+        :param ttl:  How long, in seconds, to keep a computed value. If 0,
+                     nothing is cached.
+        :returns:    The cached or computed value
+        """
+        if not ttl:
+            return func(*args, **kwargs)
+        with self._locks[key]:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            value = func(*args, **kwargs)
+            self._entries[key] = (time.monotonic() + ttl, value)
+            return value
+
+    def clear(self):
+        self._entries.clear()